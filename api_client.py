@@ -0,0 +1,258 @@
+import asyncio
+import logging
+import time
+
+import httpx
+
+# Read timeouts (seconds) per backend endpoint. The longest matching prefix
+# wins; anything not listed uses DEFAULT_TIMEOUT.
+ENDPOINT_TIMEOUTS = {
+    "/products/all": 15.0,
+    "/admin/products/bulk": 30.0,
+    "/checkout": 15.0,
+    "/users/check/": 3.0,
+    "/cart/": 5.0,
+}
+DEFAULT_TIMEOUT = 8.0
+CONNECT_TIMEOUT = 2.0
+PROBE_TIMEOUT = 2.0
+PROBE_ENDPOINT = "/health"
+
+# Startup readiness polling: first retry delay and the cap it doubles up to
+READY_INITIAL_DELAY = 0.1
+READY_MAX_DELAY = 2.0
+
+# Circuit breaker states
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+def wait_until_ready(base_urls, deadline=60.0, initial_delay=READY_INITIAL_DELAY, max_delay=READY_MAX_DELAY,
+                     clock=time.monotonic, sleep=time.sleep):
+    """
+    Block until one of `base_urls` answers PROBE_ENDPOINT with a 2xx, retrying
+    with exponential backoff, or until `deadline` seconds have passed.
+    Returns (ready, attempts, seconds waited).
+    """
+    started = clock()
+    delay = initial_delay
+    attempts = 0
+    with httpx.Client(timeout=httpx.Timeout(PROBE_TIMEOUT, connect=CONNECT_TIMEOUT)) as client:
+        while True:
+            attempts += 1
+            for base_url in base_urls:
+                try:
+                    if client.get(f"{base_url}{PROBE_ENDPOINT}").is_success:
+                        return True, attempts, clock() - started
+                except httpx.HTTPError:
+                    pass
+            remaining = deadline - (clock() - started)
+            if remaining <= 0:
+                return False, attempts, clock() - started
+            sleep(min(delay, remaining))
+            delay = min(delay * 2, max_delay)
+
+
+class EndpointHealth:
+    """Health, latency and breaker state of one backend base URL."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.latency_ewma = None
+        self.successes = 0
+        self.failures = 0
+        self.last_error = None
+
+    def snapshot(self, now):
+        return {
+            "baseUrl": self.base_url,
+            "state": self.state,
+            "consecutiveFailures": self.consecutive_failures,
+            "latencyMs": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            "successes": self.successes,
+            "failures": self.failures,
+            "openFor": round(now - self.opened_at, 1) if self.state != CLOSED else 0,
+            "lastError": self.last_error
+        }
+
+
+class EndpointRouter:
+    """
+    Picks which base URLs a request should try, in priority order.
+
+    Each base URL has a circuit breaker: after `failure_threshold` consecutive
+    failures it opens and is skipped entirely, so requests go straight to the
+    healthy target instead of paying the dead one's timeout every time. Once
+    `reset_timeout` has passed it goes half-open and a single out-of-band
+    probe decides whether it closes again or stays open for another round.
+    """
+
+    def __init__(self, base_urls, failure_threshold=3, reset_timeout=30.0, ewma_alpha=0.2, clock=time.monotonic):
+        self.endpoints = [EndpointHealth(url) for url in base_urls]
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.ewma_alpha = ewma_alpha
+        self.clock = clock
+
+    def route(self):
+        """Endpoints to try for one request. Never empty."""
+        healthy = [h for h in self.endpoints if h.state == CLOSED]
+        # Everything tripped: try them all anyway rather than failing outright.
+        # A success on this path closes the breaker without waiting for a probe.
+        return healthy or list(self.endpoints)
+
+    def due_probes(self):
+        """Open endpoints whose cooldown has elapsed; marks them half-open."""
+        now = self.clock()
+        due = []
+        for h in self.endpoints:
+            if h.state == OPEN and now - h.opened_at >= self.reset_timeout:
+                self._transition(h, HALF_OPEN)
+                due.append(h)
+        return due
+
+    def record_success(self, health, elapsed):
+        health.successes += 1
+        health.consecutive_failures = 0
+        if health.latency_ewma is None:
+            health.latency_ewma = elapsed
+        else:
+            health.latency_ewma += self.ewma_alpha * (elapsed - health.latency_ewma)
+        if health.state != CLOSED:
+            self._transition(health, CLOSED)
+
+    def record_failure(self, health, error):
+        health.failures += 1
+        health.consecutive_failures += 1
+        health.last_error = str(error)
+        if health.state == HALF_OPEN or (health.state == CLOSED and health.consecutive_failures >= self.failure_threshold):
+            self._transition(health, OPEN)
+        if health.state == OPEN:
+            health.opened_at = self.clock()
+
+    def _transition(self, health, state):
+        logging.warning(f"[Router] {health.base_url}: {health.state} -> {state}")
+        health.state = state
+
+    def snapshot(self):
+        now = self.clock()
+        return [h.snapshot(now) for h in self.endpoints]
+
+
+class BackendClient:
+    """
+    Shared async client for the Express backend.
+
+    One keep-alive connection pool is reused for every call, and a semaphore
+    bounds how many backend calls are in flight at once so a rush of scans
+    queues up instead of stalling the event loop or flooding the server.
+    Base URLs are tried in the order the router gives; a 5xx or network error
+    counts against that endpoint's breaker and moves on to the next one.
+    `metrics`, if given, is told about every call (see metrics.BackendMetrics).
+    """
+
+    def __init__(self, base_urls, max_connections=20, max_concurrency=16, timeouts=None, default_timeout=DEFAULT_TIMEOUT,
+                 failure_threshold=3, reset_timeout=30.0, metrics=None):
+        # Dedupe while keeping order (API_BASE often *is* localhost)
+        self.base_urls = list(dict.fromkeys(base_urls))
+        self.router = EndpointRouter(self.base_urls, failure_threshold=failure_threshold, reset_timeout=reset_timeout)
+        self.timeouts = dict(ENDPOINT_TIMEOUTS if timeouts is None else timeouts)
+        self.default_timeout = default_timeout
+        self.max_connections = max_connections
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._client = None
+        self._probes = set()
+        self.metrics = metrics
+
+    def _get_client(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=30.0
+                ),
+                timeout=httpx.Timeout(self.default_timeout, connect=CONNECT_TIMEOUT)
+            )
+        return self._client
+
+    def timeout_for(self, endpoint):
+        best = None
+        for prefix in self.timeouts:
+            if endpoint.startswith(prefix) and (best is None or len(prefix) > len(best)):
+                best = prefix
+        return self.timeouts[best] if best else self.default_timeout
+
+    async def request(self, method, endpoint, timeout=None, **kwargs):
+        if self.metrics is None:
+            res, _ = await self._request(method, endpoint, timeout, **kwargs)
+            return res
+        self.metrics.started()
+        started = time.perf_counter()
+        try:
+            res, served_by = await self._request(method, endpoint, timeout, **kwargs)
+        except BaseException:
+            self.metrics.finished(method, endpoint, "error", time.perf_counter() - started)
+            raise
+        self.metrics.finished(
+            method, endpoint, f"{res.status_code // 100}xx", time.perf_counter() - started,
+            fallback=served_by != self.base_urls[0]
+        )
+        return res
+
+    async def _request(self, method, endpoint, timeout, **kwargs):
+        """(response, base URL that produced it)."""
+        client = self._get_client()
+        timeout = httpx.Timeout(timeout or self.timeout_for(endpoint), connect=CONNECT_TIMEOUT)
+        last_error = None
+        self._schedule_probes()
+
+        async with self._slots:
+            targets = self.router.route()
+            for i, health in enumerate(targets):
+                is_last = i == len(targets) - 1
+                started = time.monotonic()
+                try:
+                    res = await client.request(method, f"{health.base_url}{endpoint}", timeout=timeout, **kwargs)
+                except httpx.HTTPError as e:
+                    self.router.record_failure(health, repr(e))
+                    last_error = e
+                    continue
+                if res.status_code >= 500:
+                    self.router.record_failure(health, f"HTTP {res.status_code}")
+                    if is_last: return res, health.base_url
+                    continue
+                self.router.record_success(health, time.monotonic() - started)
+                return res, health.base_url
+
+        logging.error(f"Network Error for {endpoint}: {last_error!r}")
+        raise last_error
+
+    def _schedule_probes(self):
+        for health in self.router.due_probes():
+            task = asyncio.create_task(self._probe(health))
+            self._probes.add(task)
+            task.add_done_callback(self._probes.discard)
+
+    async def _probe(self, health):
+        started = time.monotonic()
+        try:
+            res = await self._get_client().get(f"{health.base_url}{PROBE_ENDPOINT}", timeout=PROBE_TIMEOUT)
+            if res.status_code >= 500:
+                raise httpx.HTTPStatusError(f"HTTP {res.status_code}", request=res.request, response=res)
+        except httpx.HTTPError as e:
+            self.router.record_failure(health, f"probe: {e!r}")
+        else:
+            self.router.record_success(health, time.monotonic() - started)
+
+    def health_snapshot(self):
+        return self.router.snapshot()
+
+    async def aclose(self):
+        for task in list(self._probes):
+            task.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
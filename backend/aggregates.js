@@ -0,0 +1,136 @@
+// --- Running sales aggregates ---
+// Totals, per-outlet figures, per-day and per-hour buckets and the
+// best-selling products, updated as each sale is recorded instead of being
+// recomputed from the whole order history on every request. Built once from
+// history at startup, then fed by checkout. Buckets are UTC.
+
+const HOUR_MS = 3600 * 1000;
+const DAY_MS = 24 * HOUR_MS;
+const HOURLY_RETENTION_HOURS = 7 * 24;
+const TOP_PRODUCTS = 10;
+
+// Buckets are keyed by whole days / hours since the epoch
+const dayLabel = (day) => new Date(day * DAY_MS).toISOString().slice(0, 10);     // 2024-05-01
+const hourLabel = (hour) => new Date(hour * HOUR_MS).toISOString().slice(0, 13); // 2024-05-01T14
+
+const bump = (map, key, amount, extra) => {
+  let bucket = map.get(key);
+  if (!bucket) {
+    bucket = { sales: 0, orders: 0, ...extra };
+    map.set(key, bucket);
+  }
+  bucket.sales += amount;
+  bucket.orders += 1;
+  return bucket;
+};
+
+class SalesAggregates {
+  // `amountOf` / `timeOf` read a record's value and timestamp, so the same
+  // class serves db.orders (total, createdAt) and db.transactions
+  // (totalAmount, timestamp)
+  constructor({ amountOf, timeOf, now = () => new Date() }) {
+    this.amountOf = amountOf;
+    this.timeOf = timeOf;
+    this.now = now;
+    this.reset();
+  }
+
+  reset() {
+    this.totalSales = 0;
+    this.totalOrders = 0;
+    this.byOutlet = new Map();  // outletId -> { sales, orders, name }
+    this.byDay = new Map();     // day number -> { sales, orders }
+    this.byHour = new Map();    // hour number -> { sales, orders }, last 7 days only
+    this.products = new Map();  // barcode -> { barcode, name, quantity, revenue }
+    this.top = [];              // the TOP_PRODUCTS entries of `products` with the most units, best first
+  }
+
+  rebuild(records = []) {
+    this.reset();
+    for (const record of records) this.record(record);
+    return this;
+  }
+
+  record(sale) {
+    const amount = Number(this.amountOf(sale)) || 0;
+    const when = new Date(this.timeOf(sale) || this.now()).getTime();
+    this.totalSales += amount;
+    this.totalOrders += 1;
+    bump(this.byOutlet, sale.outletId || 'unknown', amount, { name: sale.outletName || sale.outletId || 'Unknown' });
+    for (const item of sale.items || []) this._countProduct(item);
+    if (isNaN(when)) return;
+    bump(this.byDay, Math.floor(when / DAY_MS), amount);
+    const oldestHour = Math.floor(this.now() / HOUR_MS) - HOURLY_RETENTION_HOURS + 1;
+    const hour = Math.floor(when / HOUR_MS);
+    if (hour >= oldestHour) {
+      bump(this.byHour, hour, amount);
+      for (const key of this.byHour.keys()) {
+        if (key >= oldestHour) break; // keys arrive in time order
+        this.byHour.delete(key);
+      }
+    }
+  }
+
+  // Unit counts only ever grow, so a product can only enter the top list at
+  // the moment its own count goes up: comparing it then keeps `top` exact
+  _countProduct(item) {
+    const barcode = String(item.barcode).trim();
+    let entry = this.products.get(barcode);
+    if (!entry) {
+      entry = { barcode, name: item.name, quantity: 0, revenue: 0 };
+      this.products.set(barcode, entry);
+    }
+    const qty = Number(item.quantity) || 1;
+    entry.quantity += qty;
+    entry.revenue += (Number(item.price) || 0) * qty;
+
+    if (!this.top.includes(entry)) {
+      if (this.top.length >= TOP_PRODUCTS && entry.quantity <= this.top[this.top.length - 1].quantity) return;
+      this.top.push(entry);
+    }
+    this.top.sort((a, b) => b.quantity - a.quantity);
+    if (this.top.length > TOP_PRODUCTS) this.top.pop();
+  }
+
+  // Sales per day for the last `days` days (oldest first, today included)
+  daily(days) {
+    const today = Math.floor(this.now() / DAY_MS);
+    const out = [];
+    for (let day = today - days + 1; day <= today; day++) {
+      const bucket = this.byDay.get(day);
+      out.push({ day: dayLabel(day), sales: bucket ? bucket.sales : 0, orders: bucket ? bucket.orders : 0 });
+    }
+    return out;
+  }
+
+  // Sales per hour for the last `hours` hours (oldest first, at most 7 days)
+  hourly(hours) {
+    const current = Math.floor(this.now() / HOUR_MS);
+    const out = [];
+    for (let hour = current - Math.min(hours, HOURLY_RETENTION_HOURS) + 1; hour <= current; hour++) {
+      const bucket = this.byHour.get(hour);
+      out.push({ hour: hourLabel(hour), sales: bucket ? bucket.sales : 0, orders: bucket ? bucket.orders : 0 });
+    }
+    return out;
+  }
+
+  window(days) {
+    const buckets = this.daily(days);
+    return {
+      days,
+      sales: buckets.reduce((sum, b) => sum + b.sales, 0),
+      orders: buckets.reduce((sum, b) => sum + b.orders, 0),
+      daily: buckets
+    };
+  }
+
+  outlets() {
+    return [...this.byOutlet].map(([outletId, b]) => ({ outletId, ...b })).sort((a, b) => b.sales - a.sales);
+  }
+
+  topProducts(limit = TOP_PRODUCTS) {
+    return this.top.slice(0, limit).map(p => ({ ...p }));
+  }
+}
+
+module.exports = { SalesAggregates };
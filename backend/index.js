@@ -2,6 +2,11 @@ const express = require('express');
 const cors = require('cors');
 const fs = require('fs');
 const path = require('path');
+const crypto = require('crypto');
+const { Journal } = require('./journal');
+const { createIndexes, rebuildIndexes } = require('./indexes');
+const { SalesAggregates } = require('./aggregates');
+const { OrderFeed } = require('./orderfeed');
 require('dotenv').config();
 
 const app = express();
@@ -58,40 +63,109 @@ const initialDb = {
   orders: []
 };
 
-let db = initialDb;
+// DB_FILE holds the last snapshot; changes since then are in DB_FILE.journal
+// (see journal.js) and are folded into a new snapshot every
+// DB_COMPACT_EVERY changes
+const journal = new Journal(DB_FILE, { compactEvery: parseInt(process.env.DB_COMPACT_EVERY) || 50000 });
 
-// Load DB from file if exists
-if (fs.existsSync(DB_FILE)) {
-  try {
-    const data = fs.readFileSync(DB_FILE, 'utf8');
-    db = JSON.parse(data);
-    console.log(`[Database] Loaded ${db.products.length} products from ${DB_FILE}`);
-    // Ensure Super Admin is always there
-    if (!db.staff.find(s => s.username === 'origichidiah')) {
-      db.staff.push({ username: 'origichidiah', role: 'SUPER_ADMIN', name: 'Original Chidiah' });
-    }
-  } catch (err) {
-    console.error(`[Database] Error loading DB file: ${err.message}`);
-    console.log("[Database] Falling back to initial memory DB");
+let db = initialDb;
+// barcode -> product, userId -> user, username -> staff, id -> outlet (see indexes.js)
+const indexes = createIndexes();
+
+try {
+  db = journal.load(initialDb);
+  console.log(`[Database] Loaded ${db.products.length} products from ${DB_FILE} (${journal.stats.replayed} journal entries replayed)`);
+  // Ensure Super Admin is always there
+  if (!db.staff.find(s => s.username === 'origichidiah')) {
+    db.staff.push({ username: 'origichidiah', role: 'SUPER_ADMIN', name: 'Original Chidiah' });
   }
+} catch (err) {
+  console.error(`[Database] Error loading DB file: ${err.message}`);
+  console.log("[Database] Falling back to initial memory DB");
+  db = initialDb;
+  journal.reset();
 }
-
-const saveDb = () => {
+rebuildIndexes(indexes, db);
+
+// Running sales figures for /admin/stats (orders) and /admin/analytics
+// (transactions); see aggregates.js. Checkout records into both.
+const orderStats = new SalesAggregates({ amountOf: o => o.total, timeOf: o => o.createdAt }).rebuild(db.orders);
+const transactionStats = new SalesAggregates({ amountOf: t => t.totalAmount, timeOf: t => t.timestamp }).rebuild(db.transactions);
+// Newest-first pages of db.orders for /api/orders/feed (see orderfeed.js)
+const orderFeed = new OrderFeed().rebuild(db.orders);
+// Orders by the Idempotency-Key they were placed with: a repeated checkout
+// (the bot's checkout worker retrying, or a request resent over the public
+// fallback URL) gets the original order back instead of a second one.
+const ordersByKey = new Map();
+for (const order of db.orders || []) if (order.idempotencyKey) ordersByKey.set(order.idempotencyKey, order);
+
+// ?days=N for the windowed breakdown, 1..366 (default 7)
+const statsWindow = (req) => Math.min(Math.max(parseInt(req.query.days) || 7, 1), 366);
+
+// Persist changes already made to `db`, described by the ops below. Only
+// the changed records are written, never the whole database.
+const saveDb = (...ops) => {
   try {
-    const absolutePath = path.resolve(DB_FILE);
-    fs.writeFileSync(absolutePath, JSON.stringify(db, null, 2));
-    console.log(`[Database] Successfully saved to: ${absolutePath}`);
-    console.log(`[Database] Current products count: ${db.products.length}`);
+    journal.append(db, ops);
   } catch (err) {
     console.error(`[Database] CRITICAL ERROR saving DB: ${err.message}`);
   }
 };
 
+const dbPut = (coll, key, record, id = record[key]) => ({ op: 'put', coll, key, id, value: record });
+const dbDel = (coll, key, id) => ({ op: 'del', coll, key, id });
+const dbPush = (coll, value) => ({ op: 'push', coll, value });
+const dbSet = (dbPath, value) => ({ op: 'set', path: dbPath.map(String), value });
+
+const saveCart = (userId) => dbSet(['carts', userId], db.carts[userId] || []);
+
+const shutdown = () => {
+  journal.close().catch(err => console.error(`[Database] Error closing journal: ${err.message}`)).finally(() => process.exit(0));
+};
+process.on('SIGINT', shutdown);
+process.on('SIGTERM', shutdown);
+
+// --- Catalog Change Tracking ---
+// Every product add/update/delete bumps catalogVersion, so clients (the bot's
+// catalog mirror) can ask for "changes since version N" instead of
+// re-downloading /products/all. The epoch changes on every restart, which
+// forces clients holding an old cursor to do one full sync.
+const catalogEpoch = String(Date.now());
+let catalogVersion = 0;
+const productVersions = new Map(); // barcode -> { version, deleted }
+
+const markProductChanged = (barcode, deleted = false) => {
+  productVersions.set(String(barcode).trim(), { version: ++catalogVersion, deleted });
+};
+
+// --- Staff Roster Version ---
+// Every staff add/remove bumps staffVersion. It is the ETag of the staff
+// list and of single-user role lookups, so clients caching roles (the bot)
+// revalidate with a bodiless 304 and notice any change to the roster.
+const staffEpoch = String(Date.now());
+let staffVersion = 0;
+const staffEtag = () => `"${staffEpoch}:${staffVersion}"`;
+
 // --- Middleware ---
 
+// The bot's own credential (start.js hands both processes the same one), for
+// routes it calls as itself rather than on behalf of a staff member
+const BOT_SERVICE_TOKEN = process.env.BOT_SERVICE_TOKEN || '';
+
+const isBotService = (req) => {
+  const token = Buffer.from(String(req.headers['x-service-token'] || ''));
+  const expected = Buffer.from(BOT_SERVICE_TOKEN);
+  return expected.length > 0 && token.length === expected.length && crypto.timingSafeEqual(token, expected);
+};
+
+// Roles may include 'BOT' to also admit the bot's service credential
 const checkRole = (allowedRoles) => (req, res, next) => {
+  if (allowedRoles.includes('BOT') && isBotService(req)) {
+    req.admin = { username: 'bot', role: 'BOT' };
+    return next();
+  }
   const adminId = req.headers['x-admin-username']; // For dev, we use username header
-  const staffMember = db.staff.find(s => s.username === adminId);
+  const staffMember = indexes.staff.get(adminId);
 
   if (staffMember && allowedRoles.includes(staffMember.role)) {
     req.admin = staffMember;
@@ -123,10 +197,56 @@ app.get('/api/products/all', (req, res) => {
   res.json(db.products);
 });
 
+// Incremental catalog sync: ?since=<cursor> from a previous response.
+// Returns 304 when nothing changed, a delta when the cursor is current,
+// and the full catalog (full: true) when there is no usable cursor.
+app.get('/api/products/changes', (req, res) => {
+  const [epoch, version] = String(req.query.since || '').split(':');
+  const since = parseInt(version);
+  const cursor = `${catalogEpoch}:${catalogVersion}`;
+
+  if (epoch !== catalogEpoch || isNaN(since) || since > catalogVersion) {
+    return res.json({ cursor, full: true, products: db.products, deleted: [] });
+  }
+  if (since === catalogVersion) return res.status(304).end();
+
+  const changed = new Set();
+  const deleted = [];
+  for (const [barcode, change] of productVersions) {
+    if (change.version <= since) continue;
+    if (change.deleted) deleted.push(barcode);
+    else changed.add(barcode);
+  }
+  const products = [...changed].map(barcode => indexes.products.get(barcode)).filter(Boolean);
+  res.json({ cursor, full: false, products, deleted });
+});
+
+// Batch scans resolve many barcodes at once
+const MAX_BATCH_ITEMS = 200;
+
+const findProducts = (barcodes) => {
+  const found = new Map();
+  for (const barcode of barcodes) {
+    const product = indexes.products.get(barcode);
+    if (product) found.set(String(barcode).trim(), product);
+  }
+  return found;
+};
+
+app.post('/api/products/lookup', (req, res) => {
+  const { barcodes } = req.body;
+  if (!Array.isArray(barcodes)) return res.status(400).json({ error: 'barcodes must be an array' });
+  if (barcodes.length > MAX_BATCH_ITEMS) return res.status(400).json({ error: `At most ${MAX_BATCH_ITEMS} barcodes per lookup` });
+
+  const found = findProducts(barcodes);
+  const missing = [...new Set(barcodes.map(b => String(b).trim()))].filter(b => !found.has(b));
+  res.json({ products: Object.fromEntries(found), missing });
+});
+
 app.get('/api/products/:barcode', (req, res) => {
   const searchBarcode = String(req.params.barcode).trim();
   console.log(`[Lookup] Searching for barcode: "${searchBarcode}"`);
-  const product = db.products.find(p => String(p.barcode).trim() === searchBarcode);
+  const product = indexes.products.get(searchBarcode);
   if (product) {
     res.json(product);
   } else {
@@ -139,8 +259,7 @@ app.get('/api/products/:barcode', (req, res) => {
 app.post('/api/admin/products', (req, res) => {
   const { barcode, name, price, category, description } = req.body;
   const bcode = String(barcode).trim();
-  const existing = db.products.find(p => String(p.barcode).trim() === bcode);
-  if (existing) return res.status(400).json({ error: 'Barcode already exists' });
+  if (indexes.products.get(bcode)) return res.status(400).json({ error: 'Barcode already exists' });
 
   const product = {
     barcode: bcode,
@@ -152,20 +271,23 @@ app.post('/api/admin/products', (req, res) => {
     createdAt: new Date()
   };
   db.products.push(product);
-  saveDb();
+  indexes.products.add(product);
+  markProductChanged(bcode);
+  saveDb(dbPut('products', 'barcode', product));
   res.status(201).json(product);
 });
 
 // Admin endpoint to upload/update product image
 app.post('/api/admin/products/:barcode/image', (req, res) => {
   const barcode = String(req.params.barcode).trim();
-  const index = db.products.findIndex(p => String(p.barcode).trim() === barcode);
+  const product = indexes.products.get(barcode);
 
-  if (index !== -1) {
-    if (!db.products[index].images) db.products[index].images = [];
-    db.products[index].images.push(req.body.image);
-    saveDb();
-    res.json({ message: 'Image added successfully', barcode, count: db.products[index].images.length });
+  if (product) {
+    if (!product.images) product.images = [];
+    product.images.push(req.body.image);
+    markProductChanged(barcode);
+    saveDb(dbPut('products', 'barcode', product));
+    res.json({ message: 'Image added successfully', barcode, count: product.images.length });
   } else {
     res.status(404).json({ error: 'Product not found' });
   }
@@ -183,6 +305,7 @@ app.post('/api/admin/products/bulk', (req, res) => {
 
   let added = 0;
   let updated = 0;
+  const ops = [];
 
   products.forEach((p, idx) => {
     const barcode = String(p.barcode || '').trim();
@@ -192,49 +315,51 @@ app.post('/api/admin/products/bulk', (req, res) => {
     }
 
     const price = parseInt(p.price) || 0;
-    const index = db.products.findIndex(existing => String(existing.barcode).trim() === barcode);
+    const existing = indexes.products.get(barcode);
 
-    if (index !== -1) {
-      db.products[index] = {
-        ...db.products[index],
-        ...p,
-        barcode,
-        price,
-        updatedAt: new Date()
-      };
+    if (existing) {
+      // Updated in place, so the index keeps pointing at it
+      Object.assign(existing, p, { barcode, price, updatedAt: new Date() });
       updated++;
+      markProductChanged(barcode);
+      ops.push(dbPut('products', 'barcode', existing));
     } else {
-      db.products.push({
+      const product = {
         ...p,
         barcode,
         price,
         createdAt: new Date()
-      });
+      };
+      db.products.push(product);
+      indexes.products.add(product);
       added++;
+      markProductChanged(barcode);
+      ops.push(dbPut('products', 'barcode', product));
     }
   });
 
   console.log(`[BulkUpload] Processed: ${added} added, ${updated} updated. Total DB size: ${db.products.length}`);
-  saveDb();
+  saveDb(...ops);
   res.json({ message: 'Bulk upload successful', added, updated });
 });
 
 app.put('/api/admin/products/:barcode', (req, res) => {
   const oldBarcode = String(req.params.barcode).trim();
-  const index = db.products.findIndex(p => String(p.barcode).trim() === oldBarcode);
+  const product = indexes.products.get(oldBarcode);
 
-  if (index !== -1) {
+  if (product) {
     const { barcode, name, price, category, description } = req.body;
     const bcode = String(barcode || oldBarcode).trim();
-
-    db.products[index] = {
-      ...db.products[index],
-      ...req.body,
-      barcode: bcode,
-      updatedAt: new Date()
-    };
-    saveDb();
-    res.json(db.products[index]);
+    // Renaming onto another product's barcode would leave one of them unreachable
+    const holder = indexes.products.get(bcode);
+    if (holder && holder !== product) return res.status(409).json({ error: 'Barcode already exists' });
+
+    Object.assign(product, req.body, { barcode: bcode, updatedAt: new Date() });
+    indexes.products.rekey(product, oldBarcode, db.products);
+    if (bcode !== oldBarcode) markProductChanged(oldBarcode, true);
+    markProductChanged(bcode);
+    saveDb(dbPut('products', 'barcode', product, oldBarcode));
+    res.json(product);
   } else {
     res.status(404).json({ error: 'Product not found' });
   }
@@ -242,10 +367,12 @@ app.put('/api/admin/products/:barcode', (req, res) => {
 
 app.delete('/api/admin/products/:barcode', checkRole(['SUPER_ADMIN']), (req, res) => {
   const delBarcode = String(req.params.barcode).trim();
-  const index = db.products.findIndex(p => String(p.barcode).trim() === delBarcode);
-  if (index !== -1) {
-    const deleted = db.products.splice(index, 1);
-    saveDb();
+  const product = indexes.products.get(delBarcode);
+  if (product) {
+    const deleted = db.products.splice(db.products.indexOf(product), 1);
+    indexes.products.remove(product, db.products);
+    markProductChanged(delBarcode, true);
+    saveDb(dbDel('products', 'barcode', delBarcode));
     res.json(deleted);
   } else {
     res.status(404).json({ error: 'Product not found' });
@@ -254,6 +381,45 @@ app.delete('/api/admin/products/:barcode', checkRole(['SUPER_ADMIN']), (req, res
 
 // Redundant app.post('/api/orders') removed in favor of consolidated /api/checkout
 
+// Order line items for the bot's recommendation index, paged by position
+// in db.orders (append-only). `reset` tells the client its cursor is past
+// the end of history (db was reset) and it should rebuild from scratch.
+app.get('/api/orders/baskets', (req, res) => {
+  const orders = db.orders || [];
+  const after = Math.max(parseInt(req.query.after) || 0, 0);
+  const limit = Math.min(Math.max(parseInt(req.query.limit) || 1000, 1), 5000);
+  const reset = after > orders.length;
+  const start = reset ? 0 : after;
+  const page = orders.slice(start, start + limit);
+
+  res.json({
+    next: start + page.length,
+    reset,
+    done: start + page.length >= orders.length,
+    baskets: page.map(o => (o.items || []).map(item => String(item.barcode).trim()))
+  });
+});
+
+// Recent orders for staff, newest first, optionally by ?outletId, ?status
+// and ?since / ?until (ISO or ms). Page with the `next` (?before=) and
+// `prev` (?after=) cursors each page returns.
+app.get('/api/orders/feed', checkRole(['SUPER_ADMIN', 'BILLING_STAFF']), (req, res) => {
+  const cursor = (v) => (v == null || isNaN(parseInt(v)) ? undefined : parseInt(v));
+  const time = (v) => {
+    const t = v == null ? NaN : new Date(isNaN(v) ? v : Number(v)).getTime();
+    return isNaN(t) ? undefined : t;
+  };
+  res.json(orderFeed.page({
+    outletId: req.query.outletId,
+    status: req.query.status,
+    before: cursor(req.query.before),
+    after: cursor(req.query.after),
+    since: time(req.query.since),
+    until: time(req.query.until),
+    limit: Math.min(Math.max(parseInt(req.query.limit) || 20, 1), 100)
+  }));
+});
+
 app.get('/api/orders/user/:userId', (req, res) => {
   const userId = String(req.params.userId);
   const userOrders = db.orders.filter(o => String(o.userId) === userId);
@@ -263,16 +429,15 @@ app.get('/api/orders/user/:userId', (req, res) => {
 // --- Admin Analytics & Details ---
 
 app.get('/api/admin/stats', checkRole(['SUPER_ADMIN']), (req, res) => {
-  const totalSales = db.orders.reduce((sum, order) => sum + (order.total || 0), 0);
-  const totalOrders = db.orders.length;
-  const staffCount = db.staff.length;
-  const userCount = db.users.length;
-
   res.json({
-    totalSales,
-    totalOrders,
-    staffCount,
-    userCount
+    totalSales: orderStats.totalSales,
+    totalOrders: orderStats.totalOrders,
+    staffCount: db.staff.length,
+    userCount: db.users.length,
+    today: orderStats.window(1),
+    window: orderStats.window(statsWindow(req)),
+    outlets: orderStats.outlets(),
+    topProducts: orderStats.topProducts(parseInt(req.query.top) || 5)
   });
 });
 
@@ -307,28 +472,46 @@ app.get('/api/admin/users', checkRole(['SUPER_ADMIN']), (req, res) => {
   res.json(usersList);
 });
 
+// One user's staff role, from the username index: 404 if not staff.
+// Clients cache the answer and revalidate with If-None-Match (see staffEtag).
+app.get('/api/staff/:username', checkRole(['SUPER_ADMIN', 'BOT']), (req, res) => {
+  const etag = staffEtag();
+  res.set('ETag', etag);
+  if (req.get('If-None-Match') === etag) return res.status(304).end();
+  const member = indexes.staff.get(req.params.username);
+  if (!member) return res.status(404).json({ error: 'Staff not found' });
+  res.json({ username: member.username, role: member.role, name: member.name });
+});
+
 // --- Staff Endpoints (Admin Only) ---
 
 app.get('/api/admin/staff', checkRole(['SUPER_ADMIN']), (req, res) => {
+  const etag = staffEtag();
+  res.set('ETag', etag);
+  if (req.get('If-None-Match') === etag) return res.status(304).end();
   res.json(db.staff);
 });
 
 app.post('/api/admin/staff', checkRole(['SUPER_ADMIN']), (req, res) => {
   const newStaff = req.body;
-  if (db.staff.find(s => s.username === newStaff.username)) {
+  if (indexes.staff.get(newStaff.username)) {
     return res.status(400).json({ error: 'Staff already exists' });
   }
   db.staff.push(newStaff);
-  saveDb();
+  indexes.staff.add(newStaff);
+  staffVersion++;
+  saveDb(dbPut('staff', 'username', newStaff));
   res.status(201).json(newStaff);
 });
 
 app.delete('/api/admin/staff/:username', checkRole(['SUPER_ADMIN']), (req, res) => {
   if (req.params.username === 'origichidiah') return res.status(403).json({ error: "Cannot delete the Super Admin" });
-  const index = db.staff.findIndex(s => s.username === req.params.username);
-  if (index !== -1) {
-    db.staff.splice(index, 1);
-    saveDb();
+  const member = indexes.staff.get(req.params.username);
+  if (member) {
+    db.staff.splice(db.staff.indexOf(member), 1);
+    indexes.staff.remove(member, db.staff);
+    staffVersion++;
+    saveDb(dbDel('staff', 'username', req.params.username));
     res.json({ message: 'Staff removed' });
   } else res.status(404).json({ error: 'Staff not found' });
 });
@@ -336,20 +519,23 @@ app.delete('/api/admin/staff/:username', checkRole(['SUPER_ADMIN']), (req, res)
 // --- analytics ---
 
 app.get('/api/admin/analytics', checkRole(['SUPER_ADMIN', 'BILLING_STAFF']), (req, res) => {
-  const totalSales = db.transactions.reduce((sum, t) => sum + t.totalAmount, 0);
   res.json({
-    totalSales,
-    totalOrders: db.transactions.length,
+    totalSales: transactionStats.totalSales,
+    totalOrders: transactionStats.totalOrders,
     totalProducts: db.products.length,
     totalUsers: db.users.length,
-    recentTransactions: db.transactions.slice(-10).reverse()
+    recentTransactions: db.transactions.slice(-10).reverse(),
+    window: transactionStats.window(statsWindow(req)),
+    hourly: transactionStats.hourly(parseInt(req.query.hours) || 24),
+    outlets: transactionStats.outlets(),
+    topProducts: transactionStats.topProducts()
   });
 });
 
 // --- User Identity Endpoints ---
 
 app.get('/api/users/check/:userId', (req, res) => {
-  const user = db.users.find(u => u.userId == req.params.userId);
+  const user = indexes.users.get(req.params.userId);
   if (user) {
     res.json({ registered: true, name: user.name, loggedIn: !!user.sessionActive });
   } else {
@@ -364,14 +550,13 @@ app.get('/api/admin/settings', checkRole(['SUPER_ADMIN']), (req, res) => {
 
 app.post('/api/admin/settings', checkRole(['SUPER_ADMIN']), (req, res) => {
   db.settings = { ...db.settings, ...req.body };
-  saveDb();
+  saveDb(dbSet(['settings'], db.settings));
   res.json(db.settings);
 });
 
 app.post('/api/users/register', (req, res) => {
   const { userId, name, email, phone } = req.body;
-  const existing = db.users.find(u => u.userId == userId);
-  if (existing) return res.status(400).json({ error: 'User already registered' });
+  if (indexes.users.get(userId)) return res.status(400).json({ error: 'User already registered' });
 
   const loginCode = Math.floor(100000 + Math.random() * 900000).toString();
   const newUser = {
@@ -385,14 +570,15 @@ app.post('/api/users/register', (req, res) => {
   };
 
   db.users.push(newUser);
-  saveDb();
+  indexes.users.add(newUser);
+  saveDb(dbPut('users', 'userId', newUser));
   res.status(201).json({ message: 'Registration successful', loginCode });
 });
 
 // --- Wallet Endpoints ---
 
 app.get('/api/users/:userId/wallet', (req, res) => {
-  const user = db.users.find(u => String(u.userId) === String(req.params.userId));
+  const user = indexes.users.get(req.params.userId);
   if (!user) return res.status(404).json({ error: 'User not found' });
 
   res.json({
@@ -403,7 +589,7 @@ app.get('/api/users/:userId/wallet', (req, res) => {
 
 app.post('/api/users/:userId/wallet/fund', (req, res) => {
   const { amount, method, reference } = req.body;
-  const user = db.users.find(u => String(u.userId) === String(req.params.userId));
+  const user = indexes.users.get(req.params.userId);
 
   if (!user) return res.status(404).json({ error: 'User not found' });
   if (!amount || amount <= 0) return res.status(400).json({ error: 'Invalid amount' });
@@ -422,18 +608,18 @@ app.post('/api/users/:userId/wallet/fund', (req, res) => {
     date: new Date()
   });
 
-  saveDb();
+  saveDb(dbPut('users', 'userId', user));
   res.json({ message: 'Wallet funded successfully', balance: user.walletBalance });
 });
 
 app.post('/api/users/login', (req, res) => {
   const { userId, code } = req.body;
-  const userIndex = db.users.findIndex(u => u.userId == userId);
+  const user = indexes.users.get(userId);
 
-  if (userIndex !== -1 && db.users[userIndex].loginCode === code) {
-    db.users[userIndex].sessionActive = true;
-    saveDb();
-    res.json({ message: 'Login successful', name: db.users[userIndex].name });
+  if (user && user.loginCode === code) {
+    user.sessionActive = true;
+    saveDb(dbPut('users', 'userId', user));
+    res.json({ message: 'Login successful', name: user.name });
   } else {
     res.status(401).json({ error: 'Invalid security code' });
   }
@@ -441,10 +627,10 @@ app.post('/api/users/login', (req, res) => {
 
 app.post('/api/users/logout', (req, res) => {
   const { userId } = req.body;
-  const userIndex = db.users.findIndex(u => u.userId == userId);
-  if (userIndex !== -1) {
-    db.users[userIndex].sessionActive = false;
-    saveDb();
+  const user = indexes.users.get(userId);
+  if (user) {
+    user.sessionActive = false;
+    saveDb(dbPut('users', 'userId', user));
   }
   res.json({ message: 'Logged out' });
 });
@@ -453,7 +639,23 @@ app.post('/api/users/logout', (req, res) => {
 // (Ensure carts exist in initial db structure if not already there, but we can initialize them on the fly)
 if (!db.carts) db.carts = {};
 
+// Every cart change bumps that user's cart version, so clients (the bot's
+// cart cache) can tell whether their copy is still current. The epoch makes
+// versions from before a restart never match.
+const cartEpoch = String(Date.now());
+const cartVersions = new Map(); // userId -> version
+
+const cartVersion = (userId) => `${cartEpoch}:${cartVersions.get(String(userId)) || 0}`;
+const bumpCartVersion = (userId) => {
+  const key = String(userId);
+  cartVersions.set(key, (cartVersions.get(key) || 0) + 1);
+  return cartVersion(key);
+};
+
 app.get('/api/cart/:userId', (req, res) => {
+  const etag = `"${cartVersion(req.params.userId)}"`;
+  res.set('ETag', etag);
+  if (req.get('If-None-Match') === etag) return res.status(304).end();
   res.json(db.carts[req.params.userId] || []);
 });
 
@@ -467,7 +669,7 @@ app.post('/api/cart/add', (req, res) => {
   }
 
   const bcode = String(barcode).trim();
-  const product = db.products.find(p => String(p.barcode).trim() === bcode);
+  const product = indexes.products.get(bcode);
   if (!product) {
     console.log(`[Cart] ERROR: Product not found for barcode: ${bcode}`);
     return res.status(404).json({ error: 'Product not found' });
@@ -479,27 +681,72 @@ app.post('/api/cart/add', (req, res) => {
 
   // Check if product already in cart
   const existingIndex = db.carts[userId].findIndex(item => String(item.barcode).trim() === bcode);
+  let item;
 
   if (existingIndex !== -1) {
-    db.carts[userId][existingIndex].quantity = (db.carts[userId][existingIndex].quantity || 1) + qty;
+    item = db.carts[userId][existingIndex];
+    item.quantity = (item.quantity || 1) + qty;
     console.log(`[Cart] Updated quantity for ${product.name} in cart for user ${userId}`);
   } else {
-    db.carts[userId].push({ ...product, barcode: bcode, quantity: qty, scanTime: new Date() });
+    item = { ...product, barcode: bcode, quantity: qty, scanTime: new Date() };
+    db.carts[userId].push(item);
     console.log(`[Cart] Added ${product.name} to cart for user ${userId}`);
   }
 
-  saveDb();
+  const version = bumpCartVersion(userId);
+  saveDb(saveCart(userId));
   console.log(`[Cart] SUCCESS - Cart now has ${db.carts[userId].length} items for user ${userId}`);
-  res.json({ message: 'Added to cart', product, cartCount: db.carts[userId].length });
+  res.json({ message: 'Added to cart', product, item, cartCount: db.carts[userId].length, cartVersion: version });
+});
+
+// Add a whole basket in one request: items is [{ barcode, quantity }]
+// (repeated barcodes are merged). One version bump and one save for the lot;
+// the response carries the resulting cart so clients needn't re-fetch it.
+app.post('/api/cart/bulk-add', (req, res) => {
+  const { userId, items } = req.body;
+  if (!userId) return res.status(400).json({ error: 'Missing userId' });
+  if (!Array.isArray(items) || items.length === 0) return res.status(400).json({ error: 'Missing items' });
+  if (items.length > MAX_BATCH_ITEMS) return res.status(400).json({ error: `At most ${MAX_BATCH_ITEMS} items per batch` });
+
+  const wanted = new Map();
+  for (const entry of items) {
+    const bcode = String(entry?.barcode ?? entry).trim();
+    if (!bcode) continue;
+    wanted.set(bcode, (wanted.get(bcode) || 0) + (parseInt(entry?.quantity) || 1));
+  }
+  const found = findProducts([...wanted.keys()]);
+
+  if (!db.carts[userId]) db.carts[userId] = [];
+  const cart = db.carts[userId];
+  const added = [];
+  const missing = [];
+
+  for (const [bcode, qty] of wanted) {
+    const product = found.get(bcode);
+    if (!product) {
+      missing.push(bcode);
+      continue;
+    }
+    const existing = cart.find(item => String(item.barcode).trim() === bcode);
+    if (existing) existing.quantity = (existing.quantity || 1) + qty;
+    else cart.push({ ...product, barcode: bcode, quantity: qty, scanTime: new Date() });
+    added.push({ barcode: bcode, name: product.name, price: product.price, quantity: qty });
+  }
+
+  const version = added.length ? bumpCartVersion(userId) : cartVersion(userId);
+  if (added.length) saveDb(saveCart(userId));
+  console.log(`[Cart] Bulk add for user ${userId}: ${added.length} added, ${missing.length} missing`);
+  res.json({ added, missing, cart, cartCount: cart.length, cartVersion: version });
 });
 
 app.post('/api/cart/clear', (req, res) => {
   const { userId } = req.body;
   if (db.carts) db.carts[userId] = [];
-  const user = db.users.find(u => String(u.userId) === String(userId));
+  const user = indexes.users.get(userId);
   if (user) user.cart = [];
-  saveDb();
-  res.json({ message: 'Cart cleared' });
+  const version = bumpCartVersion(userId);
+  saveDb(saveCart(userId), ...(user ? [dbPut('users', 'userId', user)] : []));
+  res.json({ message: 'Cart cleared', cartVersion: version });
 });
 
 // --- Checkout & Transactions ---
@@ -511,14 +758,30 @@ app.post('/api/checkout', (req, res) => {
     return res.status(400).json({ error: 'Missing checkout details' });
   }
 
+  const idempotencyKey = req.get('Idempotency-Key') || undefined;
+  const placed = idempotencyKey && ordersByKey.get(idempotencyKey);
+  if (placed) {
+    if (String(placed.userId) !== String(userId)) {
+      return res.status(409).json({ error: 'Idempotency key belongs to another order' });
+    }
+    console.log(`[Checkout] REPLAY: ${placed.orderId} for key ${idempotencyKey}`);
+    return res.status(200).json({
+      message: 'Payment Successful',
+      orderId: placed.orderId,
+      exitQrCode: placed.orderId,
+      cartVersion: cartVersion(userId),
+      replayed: true
+    });
+  }
+
   const amount = parseFloat(totalAmount);
 
   // 1. Handle Wallet Payment
-  const outlet = db.outlets?.find(o => o.id === outletId);
+  const outlet = indexes.outlets.get(outletId);
   const outletName = outlet ? outlet.name : 'Priceless Store';
 
   if (paymentMethod === 'Priceless Wallet') {
-    const user = db.users.find(u => String(u.userId) === String(userId));
+    const user = indexes.users.get(userId);
     if (!user) return res.status(404).json({ error: 'User not found' });
 
     if ((user.walletBalance || 0) < amount) {
@@ -548,11 +811,14 @@ app.post('/api/checkout', (req, res) => {
     paymentMethod,
     paymentRef: paymentRef || `AUTO-${Date.now()}`,
     status: 'COMPLETED',
+    idempotencyKey,
     createdAt: new Date()
   };
 
-  if (!db.orders) db.orders = [];
+  if (!db.orders) db.orders = orderFeed.rebuild([]).orders;
   db.orders.push(order);
+  orderFeed.add(order);
+  if (idempotencyKey) ordersByKey.set(idempotencyKey, order);
 
   // 3. Create Transaction (for Analytics)
   const transaction = {
@@ -566,22 +832,31 @@ app.post('/api/checkout', (req, res) => {
     timestamp: new Date()
   };
   db.transactions.push(transaction);
+  orderStats.record(order);
+  transactionStats.record(transaction);
 
   // 4. Clear User Cart (Both types)
   if (db.carts && db.carts[userId]) {
     db.carts[userId] = [];
   }
-  const userInDb = db.users.find(u => String(u.userId) === String(userId));
+  const userInDb = indexes.users.get(userId);
   if (userInDb) {
     userInDb.cart = [];
   }
-
-  saveDb();
+  const version = bumpCartVersion(userId);
+
+  saveDb(
+    dbPush('orders', order),
+    dbPush('transactions', transaction),
+    saveCart(userId),
+    ...(userInDb ? [dbPut('users', 'userId', userInDb)] : [])
+  );
   console.log(`[Checkout] SUCCESS: ${orderId} via ${paymentMethod} for User: ${userId}`);
   res.status(201).json({
     message: 'Payment Successful',
     orderId,
     exitQrCode: orderId,
+    cartVersion: version,
     newBalance: paymentMethod === 'Priceless Wallet' ? userInDb?.walletBalance : undefined
   });
 });
@@ -590,10 +865,6 @@ app.get('/api/transactions/:userId', (req, res) => {
   res.json(db.transactions.filter(t => t.userId == req.params.userId));
 });
 
-app.get('/api/health', (req, res) => {
-  res.json({ status: 'ok', pid: process.pid, timestamp: new Date() });
-});
-
 // 🐛 Debug endpoint to read bot logs on Render
 app.get('/api/debug/bot-logs', (req, res) => {
   const logPath = path.join(__dirname, '../bot.log');
@@ -604,6 +875,26 @@ app.get('/api/debug/bot-logs', (req, res) => {
   }
 });
 
+// --- Telegram webhook: only this port is public, so hand updates to the bot's local listener ---
+const BOT_WEBHOOK_TARGET = process.env.BOT_WEBHOOK_TARGET || 'http://127.0.0.1:8081/telegram/webhook';
+
+app.post('/telegram/webhook', async (req, res) => {
+  try {
+    const upstream = await fetch(BOT_WEBHOOK_TARGET, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'X-Telegram-Bot-Api-Secret-Token': req.get('X-Telegram-Bot-Api-Secret-Token') || ''
+      },
+      body: JSON.stringify(req.body)
+    });
+    res.sendStatus(upstream.status);
+  } catch (e) {
+    // Bot not up yet; Telegram retries on non-2xx
+    res.sendStatus(502);
+  }
+});
+
 // --- Catch-all to serve React App for client-side routing ---
 app.use((req, res, next) => {
   if (req.path.startsWith('/api')) {
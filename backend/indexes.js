@@ -0,0 +1,58 @@
+// --- Lookup indexes over the db arrays ---
+// Map from a record's (normalized) key field to the record itself, kept
+// alongside the array it indexes: every push/update/delete on the array goes
+// through the matching method here, and everything is rebuilt after load.
+// Like Array.find, a lookup returns the first record with that key.
+
+class KeyIndex {
+  constructor(field, normalize) {
+    this.field = field;
+    this.normalize = normalize;
+    this.map = new Map();
+  }
+
+  rebuild(records = []) {
+    this.map.clear();
+    for (const record of records) this.add(record);
+    return this;
+  }
+
+  get(key) {
+    return key == null ? undefined : this.map.get(this.normalize(key));
+  }
+
+  add(record) {
+    const key = this.normalize(record[this.field]);
+    if (!this.map.has(key)) this.map.set(key, record);
+  }
+
+  // After `record` left `records`. A duplicate left behind takes over the
+  // key, as it would for Array.find.
+  remove(record, records, key = record[this.field]) {
+    key = this.normalize(key);
+    if (this.map.get(key) !== record) return;
+    this.map.delete(key);
+    const next = records.find(r => r !== record && this.normalize(r[this.field]) === key);
+    if (next) this.map.set(key, next);
+  }
+
+  // After `record` (updated in place) changed its key from `oldKey`
+  rekey(record, oldKey, records) {
+    if (this.normalize(oldKey) === this.normalize(record[this.field])) return;
+    this.remove(record, records, oldKey);
+    this.add(record);
+  }
+}
+
+const createIndexes = () => ({
+  products: new KeyIndex('barcode', v => String(v).trim()),
+  users: new KeyIndex('userId', v => String(v)),
+  staff: new KeyIndex('username', v => v),
+  outlets: new KeyIndex('id', v => v)
+});
+
+const rebuildIndexes = (indexes, db) => {
+  for (const [coll, index] of Object.entries(indexes)) index.rebuild(db[coll]);
+};
+
+module.exports = { KeyIndex, createIndexes, rebuildIndexes };
@@ -0,0 +1,295 @@
+const fs = require('fs');
+const { StringDecoder } = require('string_decoder');
+
+// --- Write-ahead journal for the JSON database ---
+// Instead of rewriting the whole db file on every mutation, each change is
+// appended to `<db file>.journal` as one JSON line:
+//
+//   { s, op: 'set',  path: ['carts', '42'], value }        object property
+//   { s, op: 'put',  coll: 'products', key: 'barcode', id, value }  upsert by key
+//   { s, op: 'del',  coll: 'staff', key: 'username', id }   delete by key
+//   { s, op: 'push', coll: 'orders', value }                append
+//
+// `s` is a sequence number. Every so often the journal is compacted: the
+// current state is written as a new snapshot (the db file itself, tagged with
+// the last sequence number it includes) and the journal starts over. Loading
+// reads the snapshot and replays journal entries newer than it. All ops carry
+// the full new value, so replaying one that the snapshot already contains is
+// harmless; that is what lets compaction run in the background while writes
+// continue, and makes a crash at any point recoverable.
+
+const SNAPSHOT_CHUNK = 2000; // records serialized per tick while compacting
+const SNAPSHOT_HEADER = '{\n"_journalSeq": ';
+const KEY_LINE = /^("(?:[^"\\]|\\.)*"): (.*)$/;
+
+const sameId = (record, key, id) => record && String(record[key]).trim() === String(id).trim();
+
+class Journal {
+  constructor(file, { compactEvery = 50000, compactBytes = 64 * 1024 * 1024, syncInterval = 1000 } = {}) {
+    this.file = file;
+    this.journalFile = `${file}.journal`;
+    this.compactingFile = `${file}.journal.compacting`;
+    this.compactEvery = compactEvery;
+    this.compactBytes = compactBytes;
+    this.syncInterval = syncInterval;
+    this.seq = 0;
+    this.fd = null;
+    this.entries = 0; // in the active journal
+    this.bytes = 0;
+    this.dirty = false;
+    this.compacting = null;
+    this.stats = { appended: 0, replayed: 0, compactions: 0, lastCompactionMs: null };
+  }
+
+  // Snapshot + journal replay. Returns the database, or `initial` if there is
+  // no snapshot yet.
+  load(initial) {
+    let db = initial;
+    if (fs.existsSync(this.file)) {
+      db = this._readSnapshot();
+      this.seq = db._journalSeq || 0;
+      delete db._journalSeq;
+    }
+    const snapshotSeq = this.seq;
+    const indexes = new Map(); // replay lookups: "coll/key" -> Map(id -> position)
+    for (const segment of [this.compactingFile, this.journalFile]) {
+      for (const entry of this._readSegment(segment)) {
+        if (entry.s <= snapshotSeq) continue;
+        this._apply(db, entry, indexes);
+        this.seq = Math.max(this.seq, entry.s);
+        this.stats.replayed++;
+      }
+    }
+    this.open();
+    if (fs.existsSync(this.compactingFile)) {
+      // A compaction was interrupted: fold everything into a fresh snapshot
+      this.entries = this.compactEvery;
+    }
+    return db;
+  }
+
+  // Snapshots are JSON laid out one record per line (see compact()), read
+  // line by line: a large database doesn't fit in a single string. Anything
+  // else (a db.json from before the journal) is parsed whole.
+  _readSnapshot() {
+    const fd = fs.openSync(this.file, 'r');
+    try {
+      const head = Buffer.alloc(SNAPSHOT_HEADER.length);
+      fs.readSync(fd, head, 0, head.length, 0);
+      if (head.toString() !== SNAPSHOT_HEADER) return JSON.parse(fs.readFileSync(this.file, 'utf8'));
+
+      const db = {};
+      let target = null; // the array or object being filled, or null at the top level
+      const onLine = (raw) => {
+        const line = raw.endsWith(',') ? raw.slice(0, -1) : raw;
+        if (target === null) {
+          const match = KEY_LINE.exec(line);
+          if (!match) return; // the document's own braces
+          const key = JSON.parse(match[1]);
+          if (match[2] === '[') target = db[key] = [];
+          else if (match[2] === '{') target = db[key] = {};
+          else db[key] = JSON.parse(match[2]);
+        } else if (line === ']' || line === '}') {
+          target = null;
+        } else if (Array.isArray(target)) {
+          target.push(JSON.parse(line));
+        } else {
+          const match = KEY_LINE.exec(line);
+          target[JSON.parse(match[1])] = JSON.parse(match[2]);
+        }
+      };
+
+      const decoder = new StringDecoder('utf8');
+      const buffer = Buffer.alloc(16 * 1024 * 1024);
+      let carry = '';
+      let read;
+      while ((read = fs.readSync(fd, buffer, 0, buffer.length, null)) > 0) {
+        const lines = (carry + decoder.write(buffer.subarray(0, read))).split('\n');
+        carry = lines.pop();
+        lines.forEach(onLine);
+      }
+      onLine(carry + decoder.end());
+      return db;
+    } finally {
+      fs.closeSync(fd);
+    }
+  }
+
+  _readSegment(segment) {
+    if (!fs.existsSync(segment)) return [];
+    const data = fs.readFileSync(segment, 'utf8');
+    const entries = [];
+    let offset = 0;
+    while (offset < data.length) {
+      const end = data.indexOf('\n', offset);
+      if (end === -1) break; // torn final write
+      try {
+        entries.push(JSON.parse(data.slice(offset, end)));
+      } catch (err) {
+        console.error(`[Journal] Stopping replay of ${segment} at a corrupt entry: ${err.message}`);
+        break;
+      }
+      offset = end + 1;
+    }
+    if (offset < data.length) {
+      // Drop the unreadable tail so new entries don't land after garbage
+      fs.truncateSync(segment, Buffer.byteLength(data.slice(0, offset)));
+    }
+    return entries;
+  }
+
+  _apply(db, entry, indexes) {
+    if (entry.op === 'set') {
+      let target = db;
+      for (const part of entry.path.slice(0, -1)) {
+        if (target[part] == null) target[part] = {};
+        target = target[part];
+      }
+      target[entry.path[entry.path.length - 1]] = entry.value;
+      return;
+    }
+    if (!Array.isArray(db[entry.coll])) db[entry.coll] = [];
+    const coll = db[entry.coll];
+    if (entry.op === 'push') {
+      coll.push(entry.value);
+      return;
+    }
+    // Positions go stale after a delete, so only trust them until the next one
+    const indexKey = `${entry.coll}/${entry.key}`;
+    let index = indexes.get(indexKey);
+    if (!index) {
+      index = new Map(coll.map((r, i) => [String(r[entry.key]).trim(), i]));
+      indexes.set(indexKey, index);
+    }
+    const id = String(entry.id).trim();
+    let position = index.get(id);
+    if (position === undefined || !sameId(coll[position], entry.key, id)) {
+      position = coll.findIndex(r => sameId(r, entry.key, id));
+    }
+    if (entry.op === 'put') {
+      if (position === -1) {
+        index.set(String(entry.value[entry.key]).trim(), coll.length);
+        coll.push(entry.value);
+      } else {
+        coll[position] = entry.value;
+        index.delete(id);
+        index.set(String(entry.value[entry.key]).trim(), position);
+      }
+    } else if (entry.op === 'del' && position !== -1) {
+      coll.splice(position, 1);
+      indexes.delete(indexKey);
+    }
+  }
+
+  open() {
+    this.fd = fs.openSync(this.journalFile, 'a');
+    this.bytes = fs.fstatSync(this.fd).size;
+  }
+
+  // Start over from an empty journal, keeping unreadable files for inspection
+  reset() {
+    if (this.fd !== null) fs.closeSync(this.fd);
+    for (const segment of [this.compactingFile, this.journalFile]) {
+      if (fs.existsSync(segment)) fs.renameSync(segment, `${segment}.corrupt-${Date.now()}`);
+    }
+    this.seq = 0;
+    this.entries = 0;
+    this.open();
+  }
+
+  // Record ops for changes already made to `db`. Values are serialized now,
+  // so later in-place edits don't leak into this entry.
+  append(db, ops) {
+    if (!ops.length) return;
+    let lines = '';
+    for (const op of ops) lines += JSON.stringify({ s: ++this.seq, ...op }) + '\n';
+    fs.writeSync(this.fd, lines);
+    this.entries += ops.length;
+    this.bytes += Buffer.byteLength(lines);
+    this.stats.appended += ops.length;
+    this._scheduleSync();
+    if (!this.compacting && (this.entries >= this.compactEvery || this.bytes >= this.compactBytes)) {
+      this.compacting = this.compact(db).finally(() => { this.compacting = null; });
+    }
+  }
+
+  // The journal is written with plain write()s, which survive a crash of the
+  // process; an fdatasync at most every `syncInterval` ms also covers the OS
+  _scheduleSync() {
+    if (this.dirty) return;
+    this.dirty = true;
+    const timer = setTimeout(() => {
+      this.dirty = false;
+      fs.fdatasync(this.fd, () => {});
+    }, this.syncInterval);
+    timer.unref();
+  }
+
+  // Write the current state as the new snapshot and retire the journal up to
+  // this point. Collections are copied (shallowly) up front and serialized a
+  // chunk per tick, so requests keep being served meanwhile.
+  async compact(db) {
+    const started = Date.now();
+    const seq = this.seq;
+    if (!fs.existsSync(this.compactingFile)) {
+      fs.closeSync(this.fd);
+      fs.renameSync(this.journalFile, this.compactingFile);
+      this.open();
+    }
+    this.entries = 0;
+    this.bytes = 0;
+
+    const copy = {};
+    for (const [key, value] of Object.entries(db)) {
+      copy[key] = Array.isArray(value) ? value.slice() : (value && typeof value === 'object' ? { ...value } : value);
+    }
+
+    const tmp = `${this.file}.tmp`;
+    const out = fs.openSync(tmp, 'w');
+    try {
+      const write = (text) => fs.writeSync(out, text);
+      const tick = () => new Promise(resolve => setImmediate(resolve));
+      write(`${SNAPSHOT_HEADER}${seq}`);
+      for (const [key, value] of Object.entries(copy)) {
+        write(`,\n${JSON.stringify(key)}: `);
+        if (Array.isArray(value)) {
+          write('[');
+          for (let i = 0; i < value.length; i += SNAPSHOT_CHUNK) {
+            write((i ? ',' : '') + '\n' + value.slice(i, i + SNAPSHOT_CHUNK).map(r => JSON.stringify(r)).join(',\n'));
+            await tick();
+          }
+          write('\n]');
+        } else if (value && typeof value === 'object') {
+          const entries = Object.entries(value);
+          write('{');
+          for (let i = 0; i < entries.length; i += SNAPSHOT_CHUNK) {
+            write((i ? ',' : '') + '\n' + entries.slice(i, i + SNAPSHOT_CHUNK).map(([k, v]) => `${JSON.stringify(k)}: ${JSON.stringify(v)}`).join(',\n'));
+            await tick();
+          }
+          write('\n}');
+        } else {
+          write(JSON.stringify(value === undefined ? null : value));
+        }
+      }
+      write('\n}\n');
+      fs.fsyncSync(out);
+    } finally {
+      fs.closeSync(out);
+    }
+    fs.renameSync(tmp, this.file);
+    fs.unlinkSync(this.compactingFile);
+
+    this.stats.compactions++;
+    this.stats.lastCompactionMs = Date.now() - started;
+    console.log(`[Journal] Compacted through entry ${seq} in ${this.stats.lastCompactionMs}ms`);
+  }
+
+  // Finish any running compaction and flush the journal (for shutdown)
+  async close() {
+    if (this.compacting) await this.compacting;
+    fs.fsyncSync(this.fd);
+    fs.closeSync(this.fd);
+  }
+}
+
+module.exports = { Journal };
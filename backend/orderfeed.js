@@ -0,0 +1,82 @@
+// --- Newest-first order feed ---
+// Pages through db.orders without copying it. db.orders is append-only and
+// in checkout order, so a position in it is a stable cursor and the order
+// times (kept per position) are sorted: that array is the time index.
+// Positions are also listed per outlet, per status and per outlet+status,
+// so a filtered page costs a binary search plus the page itself.
+
+// First index in [lo, hi) for which `pred` holds (pred is false...true)
+const lowerBound = (lo, hi, pred) => {
+  while (lo < hi) {
+    const mid = (lo + hi) >>> 1;
+    if (pred(mid)) hi = mid;
+    else lo = mid + 1;
+  }
+  return lo;
+};
+
+class OrderFeed {
+  constructor() {
+    this.rebuild([]);
+  }
+
+  rebuild(orders = []) {
+    this.orders = orders;      // db.orders itself
+    this.times = [];           // position -> createdAt in ms, never decreasing
+    this.lists = new Map();    // filter key -> positions, oldest first
+    for (let pos = 0; pos < orders.length; pos++) this._index(pos);
+    return this;
+  }
+
+  // After `order` was pushed onto db.orders
+  add(order) {
+    this._index(this.orders.length - 1);
+  }
+
+  _index(pos) {
+    const order = this.orders[pos];
+    const time = new Date(order.createdAt).getTime();
+    const previous = pos ? this.times[pos - 1] : 0;
+    // Clock steps backwards would break the binary search; clamp instead
+    this.times.push(isNaN(time) || time < previous ? previous : time);
+    // Status is indexed as placed; nothing changes an order's status yet
+    for (const key of [`o:${order.outletId}`, `s:${order.status}`, `os:${order.outletId}|${order.status}`]) {
+      let list = this.lists.get(key);
+      if (!list) this.lists.set(key, list = []);
+      list.push(pos);
+    }
+  }
+
+  // Up to `limit` orders, newest first, matching outletId/status and
+  // placed in [since, until] (ms). `before` pages to older orders, `after`
+  // to newer ones; both take the cursors a previous page returned.
+  page({ outletId, status, before, after, since, until, limit = 20 } = {}) {
+    let list = null; // null: every position
+    if (outletId && status) list = this.lists.get(`os:${outletId}|${status}`) || [];
+    else if (outletId) list = this.lists.get(`o:${outletId}`) || [];
+    else if (status) list = this.lists.get(`s:${status}`) || [];
+    const n = list ? list.length : this.orders.length;
+    const posAt = list ? (i => list[i]) : (i => i);
+
+    // Entries in the time window, then within the cursors
+    const first = since == null ? 0 : lowerBound(0, n, i => this.times[posAt(i)] >= since);
+    const last = until == null ? n : lowerBound(first, n, i => this.times[posAt(i)] > until);
+    const lo = after == null ? first : Math.max(first, lowerBound(first, last, i => posAt(i) > after));
+    const hi = before == null ? last : Math.min(last, lowerBound(first, last, i => posAt(i) >= before));
+
+    // `after` alone means "the page just newer than this": the oldest `limit` above it
+    const start = after != null && before == null ? lo : Math.max(lo, hi - limit);
+    const end = after != null && before == null ? Math.min(hi, lo + limit) : hi;
+    const orders = [];
+    for (let i = end - 1; i >= start; i--) orders.push(this.orders[posAt(i)]);
+
+    return {
+      orders,
+      total: last - first,
+      next: start > first ? posAt(start) : null,   // ?before= for older orders
+      prev: end < last ? posAt(end) - 1 : null      // ?after= for newer orders
+    };
+  }
+}
+
+module.exports = { OrderFeed };
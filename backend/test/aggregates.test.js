@@ -0,0 +1,80 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const { SalesAggregates } = require('../aggregates');
+
+const NOW = new Date('2024-05-10T12:30:00Z');
+const aggregates = () => new SalesAggregates({ amountOf: o => o.total, timeOf: o => o.createdAt, now: () => NOW });
+const order = (total, createdAt, extra = {}) => ({ total, createdAt, outletId: 'imo-central', outletName: 'Imo Central', items: [], ...extra });
+
+test('totals, days and hours follow each sale', () => {
+  const sales = aggregates();
+  sales.record(order(1000, '2024-05-10T12:05:00Z'));
+  sales.record(order(500, '2024-05-10T11:59:00Z'));
+  sales.record(order(200, '2024-05-08T09:00:00Z'));
+  sales.record(order(300, '2024-04-01T09:00:00Z'));
+
+  assert.strictEqual(sales.totalSales, 2000);
+  assert.strictEqual(sales.totalOrders, 4);
+  assert.deepStrictEqual(sales.daily(3), [
+    { day: '2024-05-08', sales: 200, orders: 1 },
+    { day: '2024-05-09', sales: 0, orders: 0 },
+    { day: '2024-05-10', sales: 1500, orders: 2 }
+  ]);
+  assert.deepStrictEqual(sales.hourly(2), [
+    { hour: '2024-05-10T11', sales: 500, orders: 1 },
+    { hour: '2024-05-10T12', sales: 1000, orders: 1 }
+  ]);
+  const week = sales.window(7);
+  assert.strictEqual(week.sales, 1700);
+  assert.strictEqual(week.orders, 3);
+});
+
+test('hourly buckets older than a week are dropped', () => {
+  const sales = aggregates();
+  sales.record(order(100, '2024-05-01T12:00:00Z'));
+  sales.record(order(100, '2024-05-10T12:00:00Z'));
+  assert.strictEqual(sales.byHour.size, 1);
+  assert.strictEqual(sales.hourly(24 * 30).length, 7 * 24);
+});
+
+test('outlets are ranked by sales', () => {
+  const sales = aggregates();
+  sales.record(order(100, NOW.toISOString()));
+  sales.record(order(900, NOW.toISOString(), { outletId: 'owerri-2', outletName: 'Owerri 2' }));
+  sales.record(order(50, NOW.toISOString(), { outletId: undefined, outletName: undefined }));
+  assert.deepStrictEqual(sales.outlets(), [
+    { outletId: 'owerri-2', sales: 900, orders: 1, name: 'Owerri 2' },
+    { outletId: 'imo-central', sales: 100, orders: 1, name: 'Imo Central' },
+    { outletId: 'unknown', sales: 50, orders: 1, name: 'Unknown' }
+  ]);
+});
+
+test('the top products list matches a full recount', () => {
+  const sales = aggregates();
+  const counts = new Map();
+  let seed = 7;
+  const random = () => (seed = (seed * 1103515245 + 12345) % 2147483648) / 2147483648;
+  for (let n = 0; n < 2000; n++) {
+    const items = [];
+    for (let i = 0; i < 3; i++) {
+      const barcode = String(Math.floor(random() * random() * 40));
+      const quantity = 1 + Math.floor(random() * 3);
+      items.push({ barcode, name: `Item ${barcode}`, price: 100, quantity });
+      counts.set(barcode, (counts.get(barcode) || 0) + quantity);
+    }
+    sales.record(order(300, NOW.toISOString(), { items }));
+  }
+  const expected = [...counts.values()].sort((a, b) => b - a).slice(0, 10);
+  const top = sales.topProducts();
+  assert.deepStrictEqual(top.map(p => p.quantity), expected);
+  for (const product of top) assert.strictEqual(product.quantity, counts.get(product.barcode));
+  assert.strictEqual(top[0].revenue, top[0].quantity * 100);
+});
+
+test('rebuild starts from scratch', () => {
+  const sales = aggregates();
+  sales.record(order(100, NOW.toISOString()));
+  sales.rebuild([order(40, NOW.toISOString())]);
+  assert.strictEqual(sales.totalSales, 40);
+  assert.strictEqual(sales.totalOrders, 1);
+});
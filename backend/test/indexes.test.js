@@ -0,0 +1,59 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const { KeyIndex, createIndexes, rebuildIndexes } = require('../indexes');
+
+const barcodes = () => new KeyIndex('barcode', v => String(v).trim());
+
+test('lookups normalize the key and return the first match, like Array.find', () => {
+  const products = [{ barcode: ' 123 ', name: 'first' }, { barcode: '123', name: 'second' }, { barcode: 456 }];
+  const index = barcodes().rebuild(products);
+  assert.strictEqual(index.get('123'), products[0]);
+  assert.strictEqual(index.get(' 123'), products[0]);
+  assert.strictEqual(index.get('456'), products[2]);
+  assert.strictEqual(index.get(null), undefined);
+  assert.strictEqual(index.get('789'), undefined);
+});
+
+test('removing a record hands its key to a duplicate left behind', () => {
+  const products = [{ barcode: '1', name: 'first' }, { barcode: '1', name: 'second' }];
+  const index = barcodes().rebuild(products);
+  const [removed] = products.splice(0, 1);
+  index.remove(removed, products);
+  assert.strictEqual(index.get('1'), products[0]);
+  index.remove(products.pop(), products);
+  assert.strictEqual(index.get('1'), undefined);
+});
+
+test('removing a shadowed duplicate leaves the key alone', () => {
+  const products = [{ barcode: '1', name: 'first' }, { barcode: '1', name: 'second' }];
+  const index = barcodes().rebuild(products);
+  const [removed] = products.splice(1, 1);
+  index.remove(removed, products);
+  assert.strictEqual(index.get('1').name, 'first');
+});
+
+test('rekey follows a record renamed in place', () => {
+  const products = [{ barcode: '1', name: 'Milk' }];
+  const index = barcodes().rebuild(products);
+  products[0].barcode = '2';
+  index.rekey(products[0], '1', products);
+  assert.strictEqual(index.get('1'), undefined);
+  assert.strictEqual(index.get('2'), products[0]);
+  index.rekey(products[0], ' 2 ', products);
+  assert.strictEqual(index.get('2'), products[0]);
+});
+
+test('rebuildIndexes covers every indexed collection', () => {
+  const db = {
+    products: [{ barcode: '1' }],
+    users: [{ userId: 42 }],
+    staff: [{ username: 'ada' }],
+    outlets: [{ id: 'imo-central' }]
+  };
+  const indexes = createIndexes();
+  rebuildIndexes(indexes, db);
+  assert.strictEqual(indexes.products.get(1), db.products[0]);
+  assert.strictEqual(indexes.users.get('42'), db.users[0]);
+  assert.strictEqual(indexes.staff.get('ada'), db.staff[0]);
+  assert.strictEqual(indexes.outlets.get('imo-central'), db.outlets[0]);
+});
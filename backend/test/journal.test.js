@@ -0,0 +1,112 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { Journal } = require('../journal');
+
+const tmpDb = () => path.join(fs.mkdtempSync(path.join(os.tmpdir(), 'journal-')), 'db.json');
+const initial = () => ({ products: [], carts: {}, orders: [], staff: [] });
+const reopen = (file) => {
+  const journal = new Journal(file);
+  return { journal, db: journal.load(initial()) };
+};
+
+test('appended ops are replayed on the next load', async () => {
+  const file = tmpDb();
+  const { journal, db } = reopen(file);
+  db.products.push({ barcode: '1', name: 'Milk', price: 500 });
+  db.carts['42'] = [{ barcode: '1', quantity: 2 }];
+  db.orders.push({ orderId: 'ORD-1' });
+  journal.append(db, [
+    { op: 'put', coll: 'products', key: 'barcode', id: '1', value: db.products[0] },
+    { op: 'set', path: ['carts', '42'], value: db.carts['42'] },
+    { op: 'push', coll: 'orders', value: db.orders[0] }
+  ]);
+  db.products[0] = { barcode: '1', name: 'Milk', price: 550 };
+  journal.append(db, [{ op: 'put', coll: 'products', key: 'barcode', id: '1', value: db.products[0] }]);
+  await journal.close();
+
+  const again = reopen(file);
+  assert.deepStrictEqual(again.db, db);
+  assert.strictEqual(again.journal.stats.replayed, 4);
+  assert.strictEqual(again.journal.seq, 4);
+  await again.journal.close();
+});
+
+test('deletes by key survive a replay with several puts', async () => {
+  const file = tmpDb();
+  const { journal, db } = reopen(file);
+  for (const username of ['a', 'b', 'c']) {
+    db.staff.push({ username });
+    journal.append(db, [{ op: 'put', coll: 'staff', key: 'username', id: username, value: { username } }]);
+  }
+  db.staff.splice(1, 1);
+  journal.append(db, [{ op: 'del', coll: 'staff', key: 'username', id: 'b' }]);
+  journal.append(db, [{ op: 'put', coll: 'staff', key: 'username', id: 'c', value: { username: 'c', role: 'ADMIN' } }]);
+  await journal.close();
+
+  assert.deepStrictEqual(reopen(file).db.staff, [{ username: 'a' }, { username: 'c', role: 'ADMIN' }]);
+});
+
+test('compaction writes a snapshot and starts the journal over', async () => {
+  const file = tmpDb();
+  const { journal, db } = reopen(file);
+  for (let i = 0; i < 5000; i++) {
+    db.products.push({ barcode: String(i), name: `Item ${i}` });
+    journal.append(db, [{ op: 'put', coll: 'products', key: 'barcode', id: String(i), value: db.products[i] }]);
+  }
+  await journal.compact(db);
+  db.carts['7'] = [];
+  journal.append(db, [{ op: 'set', path: ['carts', '7'], value: [] }]);
+  await journal.close();
+
+  assert.ok(fs.readFileSync(file, 'utf8').startsWith('{\n"_journalSeq": 5000'));
+  assert.ok(!fs.existsSync(`${file}.journal.compacting`));
+  const again = reopen(file);
+  assert.deepStrictEqual(again.db, db);
+  assert.strictEqual(again.journal.stats.replayed, 1);
+  await again.journal.close();
+});
+
+test('a torn final entry is dropped and the journal stays appendable', async () => {
+  const file = tmpDb();
+  const { journal, db } = reopen(file);
+  db.orders.push({ orderId: 'ORD-1' });
+  journal.append(db, [{ op: 'push', coll: 'orders', value: db.orders[0] }]);
+  await journal.close();
+  fs.appendFileSync(`${file}.journal`, '{"s":2,"op":"push","coll":"ord');
+
+  const again = reopen(file);
+  assert.deepStrictEqual(again.db.orders, [{ orderId: 'ORD-1' }]);
+  again.db.orders.push({ orderId: 'ORD-2' });
+  again.journal.append(again.db, [{ op: 'push', coll: 'orders', value: again.db.orders[1] }]);
+  await again.journal.close();
+
+  assert.deepStrictEqual(reopen(file).db.orders.map(o => o.orderId), ['ORD-1', 'ORD-2']);
+});
+
+test('an interrupted compaction is replayed and finished', async () => {
+  const file = tmpDb();
+  const { journal, db } = reopen(file);
+  db.orders.push({ orderId: 'ORD-1' });
+  journal.append(db, [{ op: 'push', coll: 'orders', value: db.orders[0] }]);
+  await journal.close();
+  fs.renameSync(`${file}.journal`, `${file}.journal.compacting`);
+
+  const again = reopen(file);
+  assert.deepStrictEqual(again.db.orders, [{ orderId: 'ORD-1' }]);
+  assert.strictEqual(again.journal.entries, again.journal.compactEvery);
+  await again.journal.compact(again.db);
+  await again.journal.close();
+  assert.deepStrictEqual(reopen(file).db.orders, [{ orderId: 'ORD-1' }]);
+});
+
+test('a db.json from before the journal is read as plain JSON', async () => {
+  const file = tmpDb();
+  fs.writeFileSync(file, JSON.stringify({ products: [{ barcode: '1' }], carts: {}, orders: [], staff: [] }, null, 2));
+  const { journal, db } = reopen(file);
+  assert.deepStrictEqual(db.products, [{ barcode: '1' }]);
+  assert.strictEqual(journal.seq, 0);
+  await journal.close();
+});
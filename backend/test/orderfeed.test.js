@@ -0,0 +1,76 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const { OrderFeed } = require('../orderfeed');
+
+const START = Date.parse('2024-05-01T00:00:00Z');
+const OUTLETS = ['imo-central', 'owerri-2', 'aba-1'];
+const STATUSES = ['COMPLETED', 'PENDING'];
+
+const history = (n) => Array.from({ length: n }, (_, i) => ({
+  orderId: `ORD-${i}`,
+  outletId: OUTLETS[(i * 7) % 3],
+  status: STATUSES[i % 5 === 0 ? 1 : 0],
+  createdAt: new Date(START + i * 60000).toISOString()
+}));
+
+// The same query answered by filtering the whole array
+const scan = (orders, { outletId, status, since, until }) => orders
+  .map((order, pos) => ({ order, pos, time: Date.parse(order.createdAt) }))
+  .filter(({ order, time }) => (!outletId || order.outletId === outletId) && (!status || order.status === status) &&
+    (since == null || time >= since) && (until == null || time <= until))
+  .reverse();
+
+test('paging older covers every match once, newest first', () => {
+  const orders = history(500);
+  const feed = new OrderFeed().rebuild(orders);
+  const filters = [{}, { outletId: 'owerri-2' }, { status: 'PENDING' }, { outletId: 'aba-1', status: 'COMPLETED' },
+    { since: START + 100 * 60000, until: START + 300 * 60000 }, { outletId: 'imo-central', since: START + 450 * 60000 }];
+  for (const filter of filters) {
+    const expected = scan(orders, filter);
+    const seen = [];
+    let page = feed.page({ ...filter, limit: 20 });
+    assert.strictEqual(page.total, expected.length);
+    for (;;) {
+      seen.push(...page.orders);
+      if (page.next == null) break;
+      page = feed.page({ ...filter, limit: 20, before: page.next });
+    }
+    assert.deepStrictEqual(seen.map(o => o.orderId), expected.map(e => e.order.orderId), JSON.stringify(filter));
+  }
+});
+
+test('paging newer from an older page comes back to the newest', () => {
+  const orders = history(100);
+  const feed = new OrderFeed().rebuild(orders);
+  const first = feed.page({ limit: 10 });
+  const second = feed.page({ limit: 10, before: first.next });
+  assert.strictEqual(first.prev, null);
+  assert.strictEqual(second.orders[0].orderId, 'ORD-89');
+
+  const back = feed.page({ limit: 10, after: second.prev });
+  assert.deepStrictEqual(back.orders, first.orders);
+  assert.strictEqual(back.prev, null);
+});
+
+test('orders added after the build are found', () => {
+  const orders = history(3);
+  const feed = new OrderFeed().rebuild(orders);
+  orders.push({ orderId: 'ORD-NEW', outletId: 'aba-1', status: 'COMPLETED', createdAt: new Date(START + 3600000).toISOString() });
+  feed.add(orders[orders.length - 1]);
+  assert.strictEqual(feed.page({ outletId: 'aba-1', limit: 1 }).orders[0].orderId, 'ORD-NEW');
+  assert.strictEqual(feed.page({}).total, 4);
+});
+
+test('a clock stepping backwards does not break the time index', () => {
+  const orders = history(10);
+  orders[5].createdAt = new Date(START - 86400000).toISOString();
+  orders[6].createdAt = 'not a date';
+  const feed = new OrderFeed().rebuild(orders);
+  const page = feed.page({ since: START + 4 * 60000, until: START + 7 * 60000 });
+  assert.deepStrictEqual(page.orders.map(o => o.orderId), ['ORD-7', 'ORD-6', 'ORD-5', 'ORD-4']);
+});
+
+test('unknown filters give an empty page', () => {
+  const feed = new OrderFeed().rebuild(history(10));
+  assert.deepStrictEqual(feed.page({ outletId: 'nowhere' }), { orders: [], total: 0, next: null, prev: null });
+});
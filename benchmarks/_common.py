@@ -0,0 +1,241 @@
+"""
+Shared pieces of the offline benchmarks (benchmarks/*.py, diagnose_bot.py bench).
+"""
+import asyncio
+import json
+import random
+import re
+from collections import Counter
+
+import httpx
+
+STAFF_USERNAME = "bench_staff"
+ADMIN_USERNAME = "origichidiah"
+SERVICE_TOKEN = "bench-service-token"
+WORD = r"(\w+)"
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+class StubBackend:
+    """
+    In-process stand-in for backend/index.js: the routes the bot calls, with
+    real per-user carts (versions, ETags), users, orders and staff, behind
+    an httpx MockTransport. Counts calls per route.
+    """
+
+    def __init__(self, products, latency=20.0, jitter=5.0, failure_rate=0.0, seed=7):
+        self.products = {p['barcode']: p for p in products}
+        self.latency, self.jitter, self.failure_rate = latency, jitter, failure_rate
+        self.rng = random.Random(seed)
+        self.users = {}
+        self.carts = {}
+        self.versions = {}
+        self.orders = [
+            {"orderId": f"ORD-SEED-{n}", "userId": 1, "items": [], "totalAmount": 1000, "status": "COMPLETED",
+             "outletId": "imo-central", "outletName": "Imo Central", "createdAt": "2024-05-01T12:00:00.000Z"}
+            for n in range(30)
+        ]
+        self.staff = [{"username": ADMIN_USERNAME, "role": "SUPER_ADMIN"}, {"username": STAFF_USERNAME, "role": "BILLING_STAFF"}]
+        self.calls = Counter()
+        self.failures = 0
+        self.routes = [
+            ("GET", r"/health", self.health),
+            ("GET", r"/users/check/(\w+)", self.check_user),
+            ("POST", r"/users/register", self.register),
+            ("POST", r"/users/login", self.login),
+            ("POST", r"/users/logout", self.logout),
+            ("GET", r"/products/all", self.all_products),
+            ("GET", r"/products/changes", self.product_changes),
+            ("POST", r"/products/lookup", self.lookup_products),
+            ("GET", r"/products/(\w+)", self.get_product),
+            ("GET", r"/cart/(\w+)", self.get_cart),
+            ("POST", r"/cart/add", self.cart_add),
+            ("POST", r"/cart/bulk-add", self.cart_bulk_add),
+            ("POST", r"/cart/clear", self.cart_clear),
+            ("POST", r"/checkout", self.checkout),
+            ("GET", r"/admin/stats", self.admin_stats),
+            ("GET", r"/admin/staff", self.admin_staff),
+            ("GET", r"/staff/(\w+)", self.staff_role),
+            ("GET", r"/orders/baskets", self.order_baskets),
+            ("GET", r"/orders/feed", self.order_feed),
+        ]
+        # Calls are counted per route ("GET /cart/:id"), never per id
+        self.routes = [
+            (method, re.compile(pattern + "$"), f"{method} {pattern.replace(WORD, ':id')}", handler)
+            for method, pattern, handler in self.routes
+        ]
+
+    def seed_user(self, user_id, name):
+        self.users[user_id] = {"userId": user_id, "name": name, "loginCode": "123456", "sessionActive": True}
+
+    def reset_counts(self):
+        self.calls.clear()
+        self.failures = 0
+
+    async def __call__(self, request):
+        await asyncio.sleep(max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter)) / 1000)
+        path = request.url.path.removeprefix('/api')
+        for method, pattern, route, handler in self.routes:
+            match = pattern.match(path)
+            if match and request.method == method:
+                self.calls[route] += 1
+                if self.failure_rate and self.rng.random() < self.failure_rate:
+                    self.failures += 1
+                    raise httpx.ConnectError("injected failure", request=request)
+                body = json.loads(request.content) if request.content else {}
+                return handler(request, body, *match.groups())
+        self.calls[f"{request.method} {path} (unmatched)"] += 1
+        return httpx.Response(404, json={"error": "Not found"})
+
+    def _version(self, user_id):
+        return f"bench:{self.versions.get(user_id, 0)}"
+
+    def _bump(self, user_id):
+        self.versions[user_id] = self.versions.get(user_id, 0) + 1
+        return self._version(user_id)
+
+    def _add(self, user_id, barcode, qty):
+        cart = self.carts.setdefault(user_id, [])
+        item = next((i for i in cart if i['barcode'] == barcode), None)
+        if item:
+            item['quantity'] += qty
+        else:
+            item = dict(self.products[barcode], quantity=qty)
+            cart.append(item)
+        return item
+
+    def health(self, request, body):
+        return httpx.Response(200, json={"status": "ok"})
+
+    def check_user(self, request, body, user_id):
+        user = self.users.get(int(user_id))
+        if not user:
+            return httpx.Response(200, json={"registered": False})
+        return httpx.Response(200, json={"registered": True, "name": user['name'], "loggedIn": user['sessionActive']})
+
+    def register(self, request, body):
+        if body['userId'] in self.users:
+            return httpx.Response(400, json={"error": "User already registered"})
+        self.seed_user(body['userId'], body['name'])
+        return httpx.Response(201, json={"message": "Registration successful", "loginCode": "123456"})
+
+    def login(self, request, body):
+        user = self.users.get(body['userId'])
+        if not user or user['loginCode'] != body['code']:
+            return httpx.Response(401, json={"error": "Invalid security code"})
+        user['sessionActive'] = True
+        return httpx.Response(200, json={"message": "Login successful", "name": user['name']})
+
+    def logout(self, request, body):
+        user = self.users.get(body['userId'])
+        if user:
+            user['sessionActive'] = False
+        return httpx.Response(200, json={"message": "Logged out"})
+
+    def all_products(self, request, body):
+        return httpx.Response(200, json=list(self.products.values()))
+
+    def product_changes(self, request, body):
+        if request.url.params.get('since') == "bench:1":
+            return httpx.Response(304)
+        return httpx.Response(200, json={"cursor": "bench:1", "full": True, "products": list(self.products.values()), "deleted": []})
+
+    def lookup_products(self, request, body):
+        barcodes = [str(b).strip() for b in body.get('barcodes', [])]
+        return httpx.Response(200, json={
+            "products": {b: self.products[b] for b in barcodes if b in self.products},
+            "missing": [b for b in barcodes if b not in self.products]
+        })
+
+    def get_product(self, request, body, barcode):
+        product = self.products.get(barcode)
+        return httpx.Response(200, json=product) if product else httpx.Response(404, json={"error": "Product not found"})
+
+    def get_cart(self, request, body, user_id):
+        user_id = int(user_id)
+        etag = f'"{self._version(user_id)}"'
+        if request.headers.get('if-none-match') == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        return httpx.Response(200, json=self.carts.get(user_id, []), headers={"ETag": etag})
+
+    def cart_add(self, request, body):
+        if body['barcode'] not in self.products:
+            return httpx.Response(404, json={"error": "Product not found"})
+        item = self._add(body['userId'], body['barcode'], body.get('quantity', 1))
+        return httpx.Response(200, json={"success": True, "item": item, "product": item, "cartVersion": self._bump(body['userId'])})
+
+    def cart_bulk_add(self, request, body):
+        user_id, added, missing = body['userId'], [], []
+        for entry in body['items']:
+            if entry['barcode'] in self.products:
+                self._add(user_id, entry['barcode'], entry['quantity'])
+                added.append(dict(self.products[entry['barcode']], quantity=entry['quantity']))
+            else:
+                missing.append(entry['barcode'])
+        cart = self.carts.get(user_id, [])
+        return httpx.Response(200, json={"added": added, "missing": missing, "cart": cart,
+                                         "cartCount": len(cart), "cartVersion": self._bump(user_id)})
+
+    def cart_clear(self, request, body):
+        self.carts[body['userId']] = []
+        return httpx.Response(200, json={"success": True, "cartVersion": self._bump(body['userId'])})
+
+    def checkout(self, request, body):
+        if not body.get('userId') or not body.get('items') or not body.get('totalAmount'):
+            return httpx.Response(400, json={"error": "Missing checkout details"})
+        key = request.headers.get('idempotency-key')
+        placed = next((o for o in self.orders if key and o.get('idempotencyKey') == key), None)
+        if placed:
+            return httpx.Response(200, json={"message": "Payment Successful", "orderId": placed['orderId'], "cartVersion": self._version(body['userId']), "replayed": True})
+        order_id = f"ORD-{len(self.orders) + 1}"
+        self.orders.append({"orderId": order_id, "idempotencyKey": key, "outletName": "Imo Central", "status": "COMPLETED",
+                            "createdAt": "2024-05-02T12:00:00.000Z", **body})
+        self.carts[body['userId']] = []
+        return httpx.Response(201, json={"message": "Payment Successful", "orderId": order_id, "cartVersion": self._bump(body['userId'])})
+
+    def admin_stats(self, request, body):
+        total = sum(o['totalAmount'] for o in self.orders)
+        return httpx.Response(200, json={
+            "totalSales": total, "totalOrders": len(self.orders), "userCount": len(self.users), "staffCount": len(self.staff),
+            "today": {"sales": total, "orders": len(self.orders)},
+            "window": {"days": 7, "sales": total, "orders": len(self.orders)},
+            "outlets": [{"outletId": "imo-central", "name": "Imo Central", "sales": total, "orders": len(self.orders)}],
+            "topProducts": []
+        })
+
+    def admin_staff(self, request, body):
+        return httpx.Response(200, json=self.staff)
+
+    def staff_role(self, request, body, username):
+        if request.headers.get('x-service-token') != SERVICE_TOKEN:
+            return httpx.Response(403, json={"error": "Access Denied: Insufficient Permissions"})
+        etag = '"bench:0"'
+        if request.headers.get('if-none-match') == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        member = next((s for s in self.staff if s['username'] == username), None)
+        return httpx.Response(200 if member else 404, json=member or {"error": "Staff not found"}, headers={"ETag": etag})
+
+    def order_feed(self, request, body):
+        if request.headers.get('x-admin-username') not in {s['username'] for s in self.staff}:
+            return httpx.Response(403, json={"error": "Access Denied: Insufficient Permissions"})
+        params, limit = request.url.params, int(request.url.params.get('limit', 20))
+        positions = range(len(self.orders))
+        if 'after' in params:
+            positions = positions[int(params['after']) + 1:][:limit]
+        else:
+            positions = positions[:int(params.get('before', len(self.orders)))][-limit:]
+        return httpx.Response(200, json={
+            "orders": [dict(self.orders[p], total=self.orders[p]['totalAmount']) for p in reversed(positions)],
+            "total": len(self.orders),
+            "next": positions[0] if positions and positions[0] > 0 else None,
+            "prev": positions[-1] if positions and positions[-1] < len(self.orders) - 1 else None
+        })
+
+    def order_baskets(self, request, body):
+        return httpx.Response(200, json={"baskets": [], "cursor": request.url.params.get('after')})
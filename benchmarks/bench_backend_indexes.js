@@ -0,0 +1,95 @@
+// Backend lookups with and without the hash indexes (backend/indexes.js).
+//
+//     node benchmarks/bench_backend_indexes.js [--skus 100000] [--users 20000] [--upload 10000]
+//
+// Against a catalog of --skus products and --users users:
+//
+//   lookup     /api/products/:barcode and /api/users/check/:userId:
+//              Array.find with String(...).trim() per element vs. index get
+//   upload     the body of /api/admin/products/bulk for --upload items (half
+//              updates of existing barcodes, half new) on a fresh copy
+//   rebuild    building all indexes from scratch, as after load
+const { createIndexes, rebuildIndexes } = require('../backend/indexes');
+
+const arg = (name, fallback) => {
+  const i = process.argv.indexOf(`--${name}`);
+  return i === -1 ? fallback : Number(process.argv[i + 1]);
+};
+const skus = arg('skus', 100000);
+const userCount = arg('users', 20000);
+const uploadSize = arg('upload', 10000);
+
+const buildDb = () => ({
+  products: Array.from({ length: skus }, (_, i) => ({ barcode: String(6000000000000 + i), name: `Item ${i}`, price: 100 + i % 900, category: `Cat ${i % 50}` })),
+  users: Array.from({ length: userCount }, (_, i) => ({ userId: 1000 + i, name: `User ${i}`, sessionActive: true })),
+  staff: [{ username: 'origichidiah', role: 'SUPER_ADMIN' }],
+  outlets: [{ id: 'imo-central' }]
+});
+
+const time = (fn) => {
+  const started = process.hrtime.bigint();
+  const result = fn();
+  return [Number(process.hrtime.bigint() - started) / 1e6, result];
+};
+
+// Old /api/admin/products/bulk loop
+const bulkLinear = (db, upload) => {
+  for (const p of upload) {
+    const barcode = String(p.barcode || '').trim();
+    const price = parseInt(p.price) || 0;
+    const index = db.products.findIndex(existing => String(existing.barcode).trim() === barcode);
+    if (index !== -1) db.products[index] = { ...db.products[index], ...p, barcode, price, updatedAt: new Date() };
+    else db.products.push({ ...p, barcode, price, createdAt: new Date() });
+  }
+};
+
+// Current loop
+const bulkIndexed = (db, indexes, upload) => {
+  for (const p of upload) {
+    const barcode = String(p.barcode || '').trim();
+    const price = parseInt(p.price) || 0;
+    const existing = indexes.products.get(barcode);
+    if (existing) Object.assign(existing, p, { barcode, price, updatedAt: new Date() });
+    else {
+      const product = { ...p, barcode, price, createdAt: new Date() };
+      db.products.push(product);
+      indexes.products.add(product);
+    }
+  }
+};
+
+const main = () => {
+  const db = buildDb();
+  const indexes = createIndexes();
+  const [rebuildMs] = time(() => rebuildIndexes(indexes, db));
+
+  const lookups = 20000;
+  const barcodes = Array.from({ length: lookups }, (_, i) => String(6000000000000 + (i * 7919) % skus));
+  const userIds = Array.from({ length: lookups }, (_, i) => String(1000 + (i * 104729) % userCount));
+
+  const [productScan, found] = time(() => barcodes.filter(b => db.products.find(p => String(p.barcode).trim() === b)).length);
+  const [productIndexed, foundIndexed] = time(() => barcodes.filter(b => indexes.products.get(b)).length);
+  const [userScan] = time(() => userIds.filter(id => db.users.find(u => u.userId == id)).length);
+  const [userIndexed] = time(() => userIds.filter(id => indexes.users.get(id)).length);
+
+  const upload = Array.from({ length: uploadSize }, (_, i) => ({
+    barcode: String(6000000000000 + (i % 2 ? skus + i : (i * 31) % skus)), name: `Upload ${i}`, price: String(500 + i)
+  }));
+  const linearDb = buildDb();
+  const [uploadLinear] = time(() => bulkLinear(linearDb, upload));
+  const indexedDb = buildDb();
+  const indexedIndexes = createIndexes();
+  rebuildIndexes(indexedIndexes, indexedDb);
+  const [uploadIndexed] = time(() => bulkIndexed(indexedDb, indexedIndexes, upload));
+  const same = JSON.stringify(linearDb.products.map(p => [p.barcode, p.name, p.price])) ===
+    JSON.stringify(indexedDb.products.map(p => [p.barcode, p.name, p.price]));
+
+  const us = (ms, n) => `${(ms * 1000 / n).toFixed(2).padStart(8)}us`;
+  console.log(`${skus.toLocaleString()} SKUs, ${userCount.toLocaleString()} users (${found}/${foundIndexed} lookups hit)`);
+  console.log(`product lookup   scan ${us(productScan, lookups)} | index ${us(productIndexed, lookups)}`);
+  console.log(`user lookup      scan ${us(userScan, lookups)} | index ${us(userIndexed, lookups)}`);
+  console.log(`bulk upload x${uploadSize.toLocaleString()}  scan ${uploadLinear.toFixed(0).padStart(7)}ms | index ${uploadIndexed.toFixed(1).padStart(7)}ms | ${same ? 'same result' : 'RESULTS DIFFER'}`);
+  console.log(`index rebuild    ${rebuildMs.toFixed(1)}ms`);
+};
+
+main();
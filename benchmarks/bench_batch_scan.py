@@ -0,0 +1,126 @@
+"""
+Time and backend calls to get a scanned basket into the cart, item by item
+vs. as one batch, against a stub backend.
+
+    python benchmarks/bench_batch_scan.py [--items 30] [--shoppers 20] [--latency 40] [--telegram 50]
+
+The stub keeps real per-user carts (with versions) and answers after
+`latency` +/- `jitter` ms; every reply or edit the bot sends to Telegram
+costs `telegram` ms. Each shopper fills a basket of --items products:
+
+  per-item   each barcode sent on its own (process_barcode_logic), then the
+             "Add to Cart" tap (button_handler), then VIEW_CART at the end
+  batch      the basket sent as one JSON array (handle_web_app_data ->
+             one /cart/bulk-add and one summary reply)
+
+Shopper think time between scans is not counted. Session and cart caches
+start cold and the catalog mirror fresh in both runs.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp())  # bot.py opens bot.log in the working directory
+
+import httpx
+
+import bot
+from _common import StubBackend, percentile
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def fake_update(user_id, telegram_ms, sent, web_app_data=None, callback_data=None):
+    async def send(*args, **kwargs):
+        sent.append(time.perf_counter())
+        await asyncio.sleep(telegram_ms / 1000)
+
+    async def answer(*args, **kwargs):
+        await asyncio.sleep(telegram_ms / 1000)
+
+    user = SimpleNamespace(id=user_id, username=None)
+    message = SimpleNamespace(reply_text=send, web_app_data=SimpleNamespace(data=web_app_data))
+    query = None
+    if callback_data is not None:
+        query = SimpleNamespace(data=callback_data, from_user=user, answer=answer, edit_message_text=send)
+    return SimpleNamespace(effective_user=user, effective_message=message, message=message, callback_query=query)
+
+
+async def per_item(user_id, basket, args, sent):
+    for barcode, _ in basket:
+        await bot.handle_web_app_data(fake_update(user_id, args.telegram, sent, web_app_data=barcode), None)
+        await bot.button_handler(fake_update(user_id, args.telegram, sent, callback_data=f"add_{barcode}"), SimpleNamespace(user_data={}))
+    await bot.handle_web_app_data(fake_update(user_id, args.telegram, sent, web_app_data="VIEW_CART"), None)
+
+
+async def batch(user_id, basket, args, sent):
+    payload = json.dumps([{"barcode": b, "quantity": q} for b, q in basket])
+    await bot.handle_web_app_data(fake_update(user_id, args.telegram, sent, web_app_data=payload), None)
+
+
+async def run(name, flow, baskets, backend, args):
+    bot.session_cache.clear()
+    bot.carts.entries.clear()
+    backend.carts.clear()
+    backend.reset_counts()
+    samples, messages = [], 0
+
+    async def shopper(user_id):
+        nonlocal messages
+        sent = []
+        started = time.perf_counter()
+        await flow(user_id, baskets[user_id], args, sent)
+        samples.append(time.perf_counter() - started)
+        messages += len(sent)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(shopper(u) for u in range(args.shoppers)))
+    elapsed = time.perf_counter() - started
+
+    expected = sum(q for b, q in baskets[0])
+    in_cart = sum(i['quantity'] for i in backend.carts.get(0, []))
+    print(f"{name:<9} p50 {percentile(samples, 50) * 1000:8.1f}ms | p99 {percentile(samples, 99) * 1000:8.1f}ms | "
+          f"{sum(backend.calls.values()) / args.shoppers:5.1f} backend calls, {messages / args.shoppers:5.1f} messages per basket | "
+          f"{elapsed:5.2f}s total | shopper 0: {in_cart}/{expected} in cart")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=30, help='barcodes per basket')
+    parser.add_argument('--shoppers', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=40.0, help='per-call backend latency (ms)')
+    parser.add_argument('--jitter', type=float, default=10.0)
+    parser.add_argument('--telegram', type=float, default=50.0, help='cost of each message sent or edited (ms)')
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    products = [
+        {"barcode": str(6000000000000 + i), "name": f"Item {i}", "price": 100 + i, "category": f"Cat {i % 50}"}
+        for i in range(args.products)
+    ]
+    baskets = [[(p['barcode'], 1) for p in rng.sample(products, args.items)] for _ in range(args.shoppers)]
+    backend = StubBackend(products, args.latency, args.jitter, seed=args.seed)
+    for user_id in range(args.shoppers):
+        backend.seed_user(user_id, "Bench Shopper")
+    bot.backend._client = httpx.AsyncClient(transport=httpx.MockTransport(backend))
+    bot.catalog.replace_all(products)
+
+    print(f"{args.shoppers} shoppers x {args.items} items, backend {args.latency:.0f}+/-{args.jitter:.0f}ms, Telegram {args.telegram:.0f}ms per message")
+    await run("per-item", per_item, baskets, backend, args)
+    await run("batch", batch, baskets, backend, args)
+    await bot.backend.aclose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
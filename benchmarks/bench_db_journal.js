@@ -0,0 +1,117 @@
+// /api/cart/add persistence cost: full db.json rewrite vs. the journal.
+//
+//     node benchmarks/bench_db_journal.js [--orders 10000,100000,1000000] [--seconds 3]
+//
+// Builds an in-memory database with N orders (and the matching analytics
+// transactions), then repeats what /api/cart/add does - find the product,
+// bump the user's cart line, persist - for --seconds each way:
+//
+//   rewrite   the old saveDb: JSON.stringify(db, null, 2) + writeFileSync
+//   journal   saveDb(saveCart(userId)): one line appended to db.json.journal
+//
+// and finally times a full compaction plus a cold load (snapshot + replay).
+// Past a few hundred MB the rewrite cannot run at all: the database no longer
+// fits in one JavaScript string.
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { Journal } = require('../backend/journal');
+
+const arg = (name, fallback) => {
+  const i = process.argv.indexOf(`--${name}`);
+  return i === -1 ? fallback : process.argv[i + 1];
+};
+const sizes = arg('orders', '10000,100000,1000000').split(',').map(Number);
+const seconds = parseFloat(arg('seconds', '3'));
+
+const buildDb = (orders) => {
+  const products = Array.from({ length: 5000 }, (_, i) => ({
+    barcode: String(6000000000000 + i), name: `Item ${i}`, price: 100 + i, category: `Cat ${i % 50}`
+  }));
+  const users = Array.from({ length: 2000 }, (_, i) => ({ userId: 1000 + i, name: `User ${i}`, sessionActive: true }));
+  const db = { outlets: [], products, users, transactions: [], staff: [], roles: [], settings: {}, orders: [], carts: {} };
+  for (let n = 0; n < orders; n++) {
+    const items = Array.from({ length: 5 }, (_, k) => {
+      const p = products[(n * 7 + k) % products.length];
+      return { barcode: p.barcode, name: p.name, price: p.price, quantity: 1 };
+    });
+    const orderId = `ORD-${n}`;
+    const userId = users[n % users.length].userId;
+    db.orders.push({ orderId, userId, outletId: 'imo-central', outletName: 'Priceless Imo Central', items, total: 5000, paymentMethod: 'Card', paymentRef: `REF-${n}`, status: 'COMPLETED', createdAt: new Date() });
+    db.transactions.push({ id: `TXN-OR-${n}`, orderId, userId, outletId: 'imo-central', items, totalAmount: 5000, status: 'paid', timestamp: new Date() });
+  }
+  return db;
+};
+
+// The body of /api/cart/add, minus HTTP
+const cartAdd = (db, n) => {
+  const userId = String(1000 + n % 2000);
+  const bcode = String(6000000000000 + (n * 13) % 5000);
+  const product = db.products.find(p => String(p.barcode).trim() === bcode);
+  if (!db.carts[userId]) db.carts[userId] = [];
+  const item = db.carts[userId].find(i => String(i.barcode).trim() === bcode);
+  if (item) item.quantity += 1;
+  else db.carts[userId].push({ ...product, barcode: bcode, quantity: 1, scanTime: new Date() });
+  return userId;
+};
+
+const timed = (persist, db) => {
+  const started = process.hrtime.bigint();
+  let n = 0;
+  let elapsed = 0;
+  while (elapsed < seconds || n < 3) {
+    persist(cartAdd(db, n++));
+    elapsed = Number(process.hrtime.bigint() - started) / 1e9;
+  }
+  return { n, elapsed };
+};
+
+const main = async () => {
+  for (const orders of sizes) {
+    const dir = fs.mkdtempSync(path.join(os.tmpdir(), 'dbjournal-'));
+    const file = path.join(dir, 'db.json');
+    const db = buildDb(orders);
+    const journal = new Journal(file, { compactEvery: Infinity, compactBytes: Infinity });
+    journal.load(db);
+    await journal.compact(db);
+    const mb = (fs.statSync(file).size / 1e6).toFixed(0);
+
+    let rewriteRate;
+    try {
+      const rewrite = timed(() => fs.writeFileSync(`${file}.old`, JSON.stringify(db, null, 2)), db);
+      rewriteRate = `${(rewrite.n / rewrite.elapsed).toFixed(1)} adds/s`;
+    } catch (err) {
+      rewriteRate = `fails: ${err.message}`; // past V8's maximum string length
+    }
+
+    const appended = timed((userId) => journal.append(db, [{ op: 'set', path: ['carts', userId], value: db.carts[userId] }]), db);
+
+    // Compaction: measure wall time and the longest event-loop stall it causes
+    let longest = 0;
+    let last = process.hrtime.bigint();
+    const probe = setInterval(() => {
+      const now = process.hrtime.bigint();
+      longest = Math.max(longest, Number(now - last) / 1e6);
+      last = now;
+    }, 1);
+    const compactStarted = Date.now();
+    await journal.compact(db);
+    const compactMs = Date.now() - compactStarted;
+    clearInterval(probe);
+    await journal.close();
+
+    const loadStarted = Date.now();
+    const reloaded = new Journal(file);
+    const loaded = reloaded.load({});
+    const loadMs = Date.now() - loadStarted;
+    await reloaded.close();
+    const consistent = JSON.stringify(loaded.carts) === JSON.stringify(db.carts) && loaded.orders.length === orders;
+
+    console.log(`${orders.toLocaleString().padStart(9)} orders (${mb} MB) | rewrite ${rewriteRate.padStart(14)}` +
+      ` | journal ${(appended.n / appended.elapsed).toFixed(0).padStart(7)} adds/s` +
+      ` | compaction ${compactMs}ms (longest stall ${longest.toFixed(0)}ms), load ${loadMs}ms, ${consistent ? 'state matches' : 'STATE MISMATCH'}`);
+    fs.rmSync(dir, { recursive: true, force: true });
+  }
+};
+
+main();
@@ -0,0 +1,62 @@
+"""
+Per-call cost of the metrics instrumentation.
+
+    python benchmarks/bench_metrics.py [--calls 200000]
+
+Times a no-op async handler bare and wrapped in @instrumented, the
+BackendMetrics bookkeeping done per backend call, and a full /metrics
+render with a realistic number of series.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from metrics import BackendMetrics, Registry, REGISTRY, instrumented
+
+
+async def noop(update, context):
+    return None
+
+
+async def per_call(func, calls):
+    started = time.perf_counter()
+    for _ in range(calls):
+        await func(None, None)
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=200000)
+    args = parser.parse_args()
+
+    bare = await per_call(noop, args.calls)
+    wrapped = await per_call(instrumented("noop")(noop), args.calls)
+    branch = await per_call(instrumented(lambda u, c: "button:view_cart")(noop), args.calls)
+    print(f"handler    bare {bare:.2f}us | instrumented {wrapped:.2f}us (+{wrapped - bare:.2f}us) | with branch label +{branch - bare:.2f}us")
+
+    backend = BackendMetrics(Registry())
+    started = time.perf_counter()
+    for i in range(args.calls):
+        backend.started()
+        backend.finished("GET", f"/products/{6000000000000 + i % 5000}", "2xx", 0.012, fallback=False)
+    print(f"backend    {(time.perf_counter() - started) / args.calls * 1e6:.2f}us per call (started + finished)")
+
+    names = ["start", "process_barcode_logic", "show_cart", "staff_menu"] + [f"button:{a}" for a in ("add", "rem", "checkout", "view_cart", "confirm_bank", "stock_page")]
+    for name in names:
+        await instrumented(name)(noop)(None, None)
+    endpoints = ["/products/:id", "/cart/:id", "/users/check/:id", "/cart/add", "/checkout", "/products/changes"]
+    for e in endpoints:
+        backend.finished("GET", e, "2xx", 0.01)
+    started = time.perf_counter()
+    body = REGISTRY.render()
+    print(f"render     {(time.perf_counter() - started) * 1000:.2f}ms for {body.count(chr(10))} lines")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+// Staff order list cost: copy-and-reverse db.orders vs. the OrderFeed.
+//
+//     node benchmarks/bench_order_feed.js [--orders 10000,100000,1000000] [--limit 20]
+//
+// For each history size, times the first page, a page deep in the history
+// and a filtered page (one outlet, completed, last 7 days) both ways: the
+// old way copies and reverses db.orders and filters the copy; the feed
+// binary searches its indexes. Every page is checked against the old way,
+// and walking every page with the `next` cursors must visit each order once.
+const { OrderFeed } = require('../backend/orderfeed');
+
+const arg = (name, fallback) => {
+  const i = process.argv.indexOf(`--${name}`);
+  return i === -1 ? fallback : process.argv[i + 1];
+};
+const sizes = arg('orders', '10000,100000,1000000').split(',').map(Number);
+const limit = Number(arg('limit', 20));
+const outlets = ['imo-central', 'imo-north', 'lagos-lekki'];
+const DAY = 24 * 3600 * 1000;
+
+const buildOrders = (n) => {
+  const now = Date.now();
+  return Array.from({ length: n }, (_, i) => ({
+    orderId: `ORD-${i}`,
+    outletId: outlets[i % 3],
+    status: i % 10 ? 'COMPLETED' : 'PENDING',
+    total: 1000,
+    // spread over the last 90 days, oldest first
+    createdAt: new Date(now - (n - i) * (90 * DAY / n)).toISOString()
+  }));
+};
+
+const time = (fn, reps) => {
+  const started = process.hrtime.bigint();
+  for (let r = 0; r < reps; r++) fn();
+  return Number(process.hrtime.bigint() - started) / 1e6 / reps;
+};
+
+const ids = page => page.map(o => o.orderId).join();
+
+for (const n of sizes) {
+  const orders = buildOrders(n);
+  const feed = new OrderFeed();
+  const rebuildMs = time(() => feed.rebuild(orders), 1);
+  const since = Date.now() - 7 * DAY;
+  const skip = Math.floor(n / 2);
+
+  const cases = [
+    ['latest', () => [...orders].reverse().slice(0, limit), () => feed.page({ limit }).orders],
+    ['deep', () => [...orders].reverse().slice(skip, skip + limit), () => feed.page({ before: n - skip, limit }).orders],
+    ['filtered', () => [...orders].reverse()
+      .filter(o => o.outletId === 'imo-north' && o.status === 'COMPLETED' && new Date(o.createdAt).getTime() >= since)
+      .slice(0, limit),
+      () => feed.page({ outletId: 'imo-north', status: 'COMPLETED', since, limit }).orders]
+  ];
+  let ok = true;
+  const cells = cases.map(([name, old, paged]) => {
+    ok = ok && ids(old()) === ids(paged());
+    const reps = n >= 1000000 ? 3 : 20;
+    return `${name} ${time(old, reps).toFixed(2).padStart(7)}ms -> ${(time(paged, 1000) * 1000).toFixed(1).padStart(5)}us`;
+  });
+
+  // Walk the whole feed by cursor
+  let seen = 0;
+  for (let page = feed.page({ limit: 1000 }); ; page = feed.page({ before: page.next, limit: 1000 })) {
+    seen += page.orders.length;
+    if (page.next == null) break;
+  }
+  ok = ok && seen === n;
+
+  console.log(`${n.toLocaleString().padStart(9)} orders | ${cells.join(' | ')} | rebuild ${rebuildMs.toFixed(0)}ms | ${ok ? 'matches' : 'MISMATCH'}`);
+}
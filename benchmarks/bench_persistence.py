@@ -0,0 +1,97 @@
+"""
+Update throughput with and without SQLitePersistence.
+
+    python benchmarks/bench_persistence.py [--users 500] [--per-user 20] [--work 20] [--interval 2]
+
+Feeds synthetic updates straight into an offline Application whose only
+handler does what the checkout button does to user_data (store a cart
+snapshot and total) after sleeping --work ms in place of backend calls.
+Three runs:
+
+  off           no persistence
+  sqlite        SQLitePersistence flushing every --interval seconds
+  sqlite@1ms    the same with a 1ms interval, close to a write per update
+
+After each persistent run the file is reopened to check every user's data
+made it to disk.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from telegram import Update
+from telegram.ext import ApplicationBuilder, TypeHandler
+
+from persistence import SQLitePersistence
+from replay_updates import OfflineBot, synthetic_updates
+from webhook import OrderedUpdateProcessor
+
+
+async def run(name, persistence, raw_updates, args):
+    builder = ApplicationBuilder().bot(OfflineBot("123456:bench")).concurrent_updates(OrderedUpdateProcessor(64))
+    if persistence is not None:
+        builder = builder.persistence(persistence)
+    application = builder.build()
+    handled = 0
+    all_done = asyncio.Event()
+
+    async def handler(update, context):
+        nonlocal handled
+        n = update.update_id
+        context.user_data['checkout_cart_data'] = [
+            {"barcode": str(6000000000000 + (n + i) % 5000), "name": f"Item {i}", "price": 100 + i, "quantity": 1}
+            for i in range(5)
+        ]
+        context.user_data['checkout_total'] = 510 + n % 7
+        await asyncio.sleep(args.work / 1000)
+        handled += 1
+        if handled == len(raw_updates):
+            all_done.set()
+
+    application.add_handler(TypeHandler(Update, handler))
+    async with application:
+        await application.start()
+        updates = [Update.de_json(u, application.bot) for u in raw_updates]
+        started = time.perf_counter()
+        for update in updates:
+            await application.update_queue.put(update)
+        await all_done.wait()
+        elapsed = time.perf_counter() - started
+        await application.stop()  # final flush
+
+    line = f"{name:<11} {len(updates) / elapsed:9.0f} updates/s"
+    if persistence is not None:
+        stats = persistence.stats()
+        persistence.close()
+        reopened = SQLitePersistence(persistence.path)
+        stored = await reopened.get_user_data()
+        reopened.close()
+        complete = sum(1 for d in stored.values() if 'checkout_cart_data' in d)
+        line += f" | {stats['flushes']} flushes, {stats['rowsWritten']} rows, avg {stats['avgFlushMs']}ms | {complete}/{args.users} users on disk"
+    print(line)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--per-user', type=int, default=20)
+    parser.add_argument('--work', type=float, default=20.0, help='simulated handler time per update (ms)')
+    parser.add_argument('--interval', type=float, default=2.0, help='persistence flush interval (s)')
+    args = parser.parse_args()
+
+    raw_updates = synthetic_updates(args.users, args.per_user)
+    tmp = tempfile.mkdtemp()
+    print(f"{len(raw_updates)} updates from {args.users} users, {args.work:.0f}ms handler work")
+    await run("off", None, raw_updates, args)
+    await run("sqlite", SQLitePersistence(os.path.join(tmp, "a.sqlite3"), update_interval=args.interval), raw_updates, args)
+    await run("sqlite@1ms", SQLitePersistence(os.path.join(tmp, "b.sqlite3"), update_interval=0.001), raw_updates, args)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,152 @@
+"""
+Barcode photo decode throughput, per core and through the PhotoDecoder pool.
+
+    python benchmarks/bench_photo_decode.py [--corpus DIR] [--images 60] [--workers 1,2,4] [--max-side 1024]
+
+--corpus is a directory of .jpg/.png photos; a file named after the code it
+shows (6001234567893.jpg, or 6001234567893_shelf.jpg) is also checked for
+the right answer. Without one, --images synthetic phone shots are made:
+an EAN-13 (or, one in five, a QR code) pasted off-centre into a noisy,
+blurred 1600x1200 or 4000x3000 frame, some turned upright, and one in ten
+with no code at all.
+
+  single     decode_image in this process, one core: full resolution
+             (no shrinking) against shrinking to --max-side
+  pool       PhotoDecoder with each --workers count, every photo submitted
+             at once, then again (answered from the file_unique_id cache)
+
+Needs opencv-python-headless.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import cv2
+import numpy as np
+
+from _common import percentile
+from photoscan import PhotoDecoder, decode_image
+
+# EAN-13 digit patterns (L, G, R codes) and the L/G parity set by the first digit
+L_CODES = ["0001101", "0011001", "0010011", "0111101", "0100011", "0110001", "0101111", "0111011", "0110111", "0001011"]
+G_CODES = [code.translate(str.maketrans("01", "10"))[::-1] for code in L_CODES]
+R_CODES = [code.translate(str.maketrans("01", "10")) for code in L_CODES]
+PARITY = ["LLLLLL", "LLGLGG", "LLGGLG", "LLGGGL", "LGLLGG", "LGGLLG", "LGGGLL", "LGLGLG", "LGLGGL", "LGGLGL"]
+
+
+def ean13(rng):
+    digits = [6, 0] + [rng.randrange(10) for _ in range(10)]
+    total = sum(d * (3 if i % 2 else 1) for i, d in enumerate(digits))
+    return "".join(map(str, digits + [(10 - total % 10) % 10]))
+
+
+def ean13_image(code, module, height):
+    bits = "101"
+    for digit, parity in zip(code[1:7], PARITY[int(code[0])]):
+        bits += (L_CODES if parity == "L" else G_CODES)[int(digit)]
+    bits += "01010" + "".join(R_CODES[int(d)] for d in code[7:]) + "101"
+    row = np.array([0 if b == "1" else 255 for b in "0" * 11 + bits + "0" * 11], np.uint8)
+    return np.repeat(np.tile(row, (height, 1)), module, axis=1)
+
+
+def synthetic_photo(rng, n):
+    """(jpeg bytes, expected code or None)"""
+    big = rng.random() < 0.3
+    h, w = (3000, 4000) if big else (1200, 1600)
+    frame = np.clip(rng.randrange(90, 200) + np.random.default_rng(n).normal(0, 12, (h, w)), 0, 255).astype(np.uint8)
+    kind = "none" if n % 10 == 9 else ("qr" if n % 5 == 4 else "ean")
+    code = None
+    if kind == "ean":
+        code = ean13(rng)
+        label = ean13_image(code, module=rng.choice([3, 4]) * (2 if big else 1), height=h // 6)
+    elif kind == "qr":
+        code = f"https://pricelessshopper.example/p/{ean13(rng)}"
+        label = cv2.QRCodeEncoder.create().encode(code)
+        label = cv2.resize(label, None, fx=(16 if big else 8), fy=(16 if big else 8), interpolation=cv2.INTER_NEAREST)
+        label = cv2.copyMakeBorder(label, 32, 32, 32, 32, cv2.BORDER_CONSTANT, value=255)
+    if kind != "none":
+        if rng.random() < 0.2:
+            label = cv2.rotate(label, cv2.ROTATE_90_CLOCKWISE)
+        lh, lw = label.shape
+        y = (h - lh) // 2 + rng.randrange(-h // 10, h // 10)
+        x = (w - lw) // 2 + rng.randrange(-w // 10, w // 10)
+        frame[y:y + lh, x:x + lw] = label
+    frame = cv2.GaussianBlur(frame, (3, 3), 0)
+    ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    return jpeg.tobytes(), code
+
+
+def load_corpus(path):
+    corpus = []
+    for name in sorted(os.listdir(path)):
+        if name.lower().endswith((".jpg", ".jpeg", ".png")):
+            stem = os.path.splitext(name)[0].split("_")[0]
+            with open(os.path.join(path, name), "rb") as f:
+                corpus.append((f.read(), stem if stem.isdigit() else None))
+    return corpus
+
+
+def single(corpus, max_side, label):
+    times, right = [], 0
+    for data, expected in corpus:
+        started = time.perf_counter()
+        codes = decode_image(data, max_side)
+        times.append(time.perf_counter() - started)
+        right += (codes[:1] == [expected]) if expected else not codes
+    print(f"single {label:<10} {len(corpus) / sum(times):6.1f} photos/s/core | p50 {percentile(times, 50) * 1000:6.1f}ms "
+          f"p99 {percentile(times, 99) * 1000:6.1f}ms | {right}/{len(corpus)} read right")
+
+
+async def pool(corpus, workers, max_side):
+    decoder = PhotoDecoder(workers=workers, max_side=max_side, max_waiting=len(corpus))
+
+    async def one(n, data):
+        async def download():
+            return data
+        return await decoder.decode(f"photo-{n}", download)
+
+    # Start the workers (interpreter + OpenCV import) before timing
+    async def sample():
+        return corpus[0][0]
+    await decoder.decode("warmup", sample)
+    for label in ("cold", "cached"):
+        started = time.perf_counter()
+        await asyncio.gather(*(one(n, data) for n, (data, _) in enumerate(corpus)))
+        elapsed = time.perf_counter() - started
+        print(f"pool   {workers} worker{'s' if workers > 1 else ' '} {label:<7} {len(corpus) / elapsed:9.1f} photos/s "
+              f"({len(corpus) / elapsed / workers:9.1f}/worker) | {elapsed:5.2f}s")
+    await decoder.aclose()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--corpus', help='directory of sample photos (default: synthetic)')
+    parser.add_argument('--images', type=int, default=60, help='synthetic photos to make')
+    parser.add_argument('--workers', default=None, help='comma-separated pool sizes (default 1..cores, up to 4)')
+    parser.add_argument('--max-side', type=int, default=1024)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+    else:
+        rng = random.Random(args.seed)
+        corpus = [synthetic_photo(rng, n) for n in range(args.images)]
+    cores = os.cpu_count() or 1
+    workers = [int(w) for w in args.workers.split(",")] if args.workers else list(range(1, min(cores, 4) + 1))
+    print(f"{len(corpus)} photos, {sum(len(d) for d, _ in corpus) / len(corpus) / 1024:.0f} KiB avg, {cores} cores")
+
+    single(corpus, 1 << 30, "full res")
+    single(corpus, args.max_side, f"<= {args.max_side}px")
+    for n in workers:
+        await pool(corpus, n, args.max_side)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+"""
+Build time and lookup latency of the co-purchase RecommendationIndex.
+
+    python benchmarks/bench_recommendations.py [--skus 50000] [--lines 1000000]
+
+Baskets are synthetic: item popularity is Zipf-like and half of each basket
+is drawn from the same category, roughly how real grocery baskets look.
+"""
+import argparse
+import itertools
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from _common import percentile
+from catalog import CatalogMirror
+from recommendations import RecommendationIndex
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--skus', type=int, default=50000)
+    parser.add_argument('--lines', type=int, default=1000000)
+    parser.add_argument('--categories', type=int, default=200)
+    parser.add_argument('--lookups', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    catalog = CatalogMirror(request=None)
+    catalog.replace_all(
+        {"barcode": str(6000000000000 + i), "name": f"Item {i}", "price": 100 + i % 5000, "category": f"Cat {i % args.categories}"}
+        for i in range(args.skus)
+    )
+    barcodes = list(catalog.by_barcode)
+    by_category = {c: list(members) for c, members in catalog.by_category.items()}
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(args.skus)))
+
+    # Pre-generate baskets so generation cost isn't counted as build time.
+    # Popular items are drawn in one batch; per-call choices() is slow.
+    popular = iter(rng.choices(barcodes, cum_weights=cum_weights, k=args.lines))
+    baskets, lines = [], 0
+    while lines < args.lines:
+        size = max(1, min(40, int(rng.expovariate(1 / 8))))
+        anchor = next(popular)
+        same_cat = by_category[catalog.get(anchor)['category']]
+        basket = [anchor] + rng.sample(same_cat, size // 2) + [next(popular) for _ in range(size - size // 2 - 1)]
+        baskets.append(basket)
+        lines += len(basket)
+
+    index = RecommendationIndex(catalog)
+    catalog.subscribe(index)
+    started = time.perf_counter()
+    for start in range(0, len(baskets), 2000):
+        for basket in baskets[start:start + 2000]:
+            index.add_basket(basket)
+        index.commit()
+    build_time = time.perf_counter() - started
+
+    probes = [catalog.get(rng.choice(barcodes)) for _ in range(args.lookups)]
+    samples = []
+    for product in probes:
+        t0 = time.perf_counter_ns()
+        index.recommend(product)
+        samples.append(time.perf_counter_ns() - t0)
+
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"SKUs: {args.skus:,} | baskets: {len(baskets):,} | order lines: {lines:,}")
+    print(f"Build (incremental, 2k-basket batches): {build_time:.2f}s ({lines / build_time:,.0f} lines/s)")
+    print(f"Lookup: p50 {percentile(samples, 50) / 1000:.1f}us | p99 {percentile(samples, 99) / 1000:.1f}us | mean {sum(samples) / len(samples) / 1000:.1f}us")
+    print(f"Peak RSS: {rss_mb:,.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+// /admin/stats cost: reduce over db.orders vs. the running aggregates.
+//
+//     node benchmarks/bench_sales_stats.js [--orders 10000,100000,1000000]
+//
+// For each history size, times the old handler body (a reduce over every
+// order), a read of the aggregates (totals + 7-day window + outlets + top
+// products) and the per-checkout record() cost, and checks the aggregates
+// against a brute-force recomputation.
+const { SalesAggregates } = require('../backend/aggregates');
+
+const arg = (name, fallback) => {
+  const i = process.argv.indexOf(`--${name}`);
+  return i === -1 ? fallback : process.argv[i + 1];
+};
+const sizes = arg('orders', '10000,100000,1000000').split(',').map(Number);
+const outlets = ['imo-central', 'imo-north', 'lagos-lekki'];
+
+const buildOrders = (n) => {
+  const now = Date.now();
+  return Array.from({ length: n }, (_, i) => ({
+    orderId: `ORD-${i}`,
+    outletId: outlets[i % 3],
+    outletName: outlets[i % 3],
+    total: 1000 + (i % 97) * 10,
+    // spread over the last 90 days, oldest first
+    createdAt: new Date(now - (n - i) * (90 * 24 * 3600 * 1000 / n)),
+    items: [0, 1, 2].map(k => ({ barcode: String(6000000000000 + ((i * 31 + k * 7) % 3000) ** 2 % 5000), name: 'x', price: 100, quantity: 1 + (k % 2) }))
+  }));
+};
+
+const time = (fn, reps = 1) => {
+  const started = process.hrtime.bigint();
+  for (let r = 0; r < reps; r++) fn();
+  return Number(process.hrtime.bigint() - started) / 1e6 / reps;
+};
+
+for (const n of sizes) {
+  const orders = buildOrders(n);
+  const stats = new SalesAggregates({ amountOf: o => o.total, timeOf: o => o.createdAt });
+  const rebuildMs = time(() => stats.rebuild(orders));
+
+  const reduceMs = time(() => orders.reduce((sum, o) => sum + (o.total || 0), 0), 5);
+  const readMs = time(() => ({
+    totalSales: stats.totalSales, window: stats.window(7), outlets: stats.outlets(), top: stats.topProducts(5)
+  }), 1000);
+  const extra = buildOrders(1000).map(o => ({ ...o, createdAt: new Date() }));
+  const recordMs = time(() => extra.forEach(o => stats.record(o))) / extra.length;
+
+  // Brute force over everything recorded
+  const all = orders.concat(extra);
+  const units = new Map();
+  for (const o of all) for (const item of o.items) units.set(item.barcode, (units.get(item.barcode) || 0) + item.quantity);
+  const expectedTop = [...units.values()].sort((a, b) => b - a).slice(0, 5);
+  const ok = stats.totalSales === all.reduce((s, o) => s + o.total, 0) &&
+    JSON.stringify(stats.topProducts(5).map(p => p.quantity)) === JSON.stringify(expectedTop);
+
+  console.log(`${n.toLocaleString().padStart(9)} orders | reduce ${reduceMs.toFixed(2).padStart(7)}ms | aggregates ${(readMs * 1000).toFixed(1).padStart(6)}us` +
+    ` | record ${(recordMs * 1000).toFixed(1)}us/checkout | rebuild ${rebuildMs.toFixed(0)}ms | ${ok ? 'matches brute force' : 'MISMATCH'}`);
+}
@@ -0,0 +1,124 @@
+"""
+Scan-to-reply latency of process_barcode_logic against a stub backend.
+
+    python benchmarks/bench_scan_latency.py [--latency 40] [--jitter 20] [--shoppers 50] [--scans 10]
+
+The stub answers the routes a scan touches after `latency` +/- `jitter` ms
+(`/products/all` additionally pays for its payload size). Three runs:
+
+  serial      the old pipeline: check -> product -> products/all -> cart, one after another
+  fan-out     process_barcode_logic with cold session/cart caches and stale catalog mirror
+  fan-out+mem process_barcode_logic with warm session cache and fresh catalog mirror
+              (carts start cold in both and are cached after each shopper's first scan)
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp())  # bot.py opens bot.log in the working directory
+
+import httpx
+
+import bot
+from _common import StubBackend, percentile
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+class ScanBackend(StubBackend):
+    """The shared stub, with /products/all also paying for its payload on a ~5 MB/s link."""
+
+    def __init__(self, products, *args, **kwargs):
+        super().__init__(products, *args, **kwargs)
+        self.transfer = len(json.dumps(products)) / 5_000_000
+
+    async def __call__(self, request):
+        if request.url.path.endswith('/products/all'):
+            await asyncio.sleep(self.transfer)
+        return await super().__call__(request)
+
+
+def fake_update(user_id, replies):
+    async def reply_text(text, **kwargs):
+        replies.append(time.perf_counter())
+    return SimpleNamespace(
+        effective_user=SimpleNamespace(id=user_id, username=None),
+        message=SimpleNamespace(reply_text=reply_text),
+        callback_query=None
+    )
+
+
+async def serial_scan(barcode, update, context):
+    user_id = update.effective_user.id
+    await bot.smart_request("GET", f"/users/check/{user_id}")
+    res = await bot.smart_request("GET", f"/products/{barcode}")
+    res.json()
+    (await bot.smart_request("GET", "/products/all")).json()
+    (await bot.smart_request("GET", f"/cart/{user_id}")).json()
+    await update.message.reply_text("done")
+
+
+async def run(name, scan, barcodes, args, rng, warm):
+    bot.session_cache.clear()
+    bot.carts.entries.clear()
+    bot.catalog.last_sync = None
+    if warm:
+        for user_id in range(args.shoppers):
+            bot.session_cache.set(user_id, {"registered": True, "loggedIn": True})
+        bot.catalog.last_sync = bot.catalog.clock()
+
+    samples = []
+
+    async def shopper(user_id):
+        for _ in range(args.scans):
+            replies = []
+            started = time.perf_counter()
+            await scan(rng.choice(barcodes), fake_update(user_id, replies), None)
+            samples.append((replies[0] if replies else time.perf_counter()) - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(shopper(u) for u in range(args.shoppers)))
+    elapsed = time.perf_counter() - started
+    print(f"{name:<12} p50 {percentile(samples, 50) * 1000:7.1f}ms | p99 {percentile(samples, 99) * 1000:7.1f}ms | {len(samples) / elapsed:7.1f} scans/s")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=40.0, help='per-call backend latency (ms)')
+    parser.add_argument('--jitter', type=float, default=20.0)
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--shoppers', type=int, default=50)
+    parser.add_argument('--scans', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    products = [
+        {"barcode": str(6000000000000 + i), "name": f"Item {i}", "price": 100 + i, "category": f"Cat {i % 50}"}
+        for i in range(args.products)
+    ]
+    barcodes = [p['barcode'] for p in products]
+    backend = ScanBackend(products, args.latency, args.jitter, seed=args.seed)
+    for user_id in range(args.shoppers):
+        backend.seed_user(user_id, "Bench Shopper")
+    bot.backend._client = httpx.AsyncClient(transport=httpx.MockTransport(backend))
+    bot.catalog.replace_all(products)
+
+    print(f"{args.shoppers} shoppers x {args.scans} scans, backend {args.latency:.0f}+/-{args.jitter:.0f}ms, {args.products} products")
+    await run("serial", serial_scan, barcodes, args, rng, warm=False)
+    await run("fan-out", bot.process_barcode_logic, barcodes, args, rng, warm=False)
+    await run("fan-out+mem", bot.process_barcode_logic, barcodes, args, rng, warm=True)
+    await bot.backend.aclose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
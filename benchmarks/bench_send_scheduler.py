@@ -0,0 +1,164 @@
+"""
+Outbound Telegram traffic against simulated flood limits, with and without
+the SendScheduler.
+
+    python benchmarks/bench_send_scheduler.py [--seconds 10] [--replies 25] [--broadcast 100] [--edits 10]
+
+A fake Bot API answers every call after --rtt ms but enforces flood limits
+the way Telegram does: more than --global-limit sends in any second, or
+more than 20 in 10 seconds to one chat, earns a 429 with retry_after
+--penalty seconds, and every send to that scope is refused until then.
+For --seconds, the bot sends:
+
+  replies     --replies interactive replies per second, to random shoppers
+              (the latency that matters)
+  broadcast   --broadcast admin notifications queued at the start
+  progress    --edits progress edits per second to one admin message,
+              each fired without waiting for the previous one
+
+  direct      straight to the Bot API; a 429 fails the send (as the bot
+              did before the scheduler)
+  scheduled   through SendScheduler, replies in the interactive lane,
+              broadcast and progress in the background lane
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+from collections import Counter, deque
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from telegram.error import RetryAfter
+from telegram.ext import ExtBot
+from telegram.request import BaseRequest
+
+from _common import percentile
+from outbound import LANE_BACKGROUND, SendScheduler
+
+ADMIN_CHAT = 1
+
+
+class FloodLimitedTelegram(BaseRequest):
+    def __init__(self, args):
+        self.args = args
+        self.recent = deque()   # send times, last second
+        self.per_chat = {}      # chat id -> deque of send times, last 10s
+        self.blocked = {}       # None (everything) or chat id -> blocked until
+        self.calls = Counter()
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _flood(self, scope, now):
+        if self.blocked.get(scope, 0) <= now:
+            self.blocked[scope] = now + self.args.penalty
+        self.calls['429'] += 1
+        body = {"ok": False, "error_code": 429, "description": "Too Many Requests",
+                "parameters": {"retry_after": max(1, round(self.blocked[scope] - now))}}
+        return 429, json.dumps(body).encode()
+
+    async def do_request(self, url, method, request_data=None, **timeouts):
+        endpoint = url.rsplit('/', 1)[1]
+        await asyncio.sleep(self.args.rtt / 1000)
+        if endpoint == "getMe":
+            return 200, json.dumps({"ok": True, "result": {"id": 42, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}}).encode()
+        params = request_data.parameters
+        chat_id = int(params['chat_id'])
+        now = time.monotonic()
+        for scope in (None, chat_id):
+            if self.blocked.get(scope, 0) > now:
+                return self._flood(scope, now)
+        while self.recent and self.recent[0] <= now - 1:
+            self.recent.popleft()
+        chat = self.per_chat.setdefault(chat_id, deque())
+        while chat and chat[0] <= now - 10:
+            chat.popleft()
+        if len(self.recent) >= self.args.global_limit:
+            return self._flood(None, now)
+        if len(chat) >= 20:
+            return self._flood(chat_id, now)
+        self.recent.append(now)
+        chat.append(now)
+        self.calls[endpoint] += 1
+        message = {"message_id": params.get('message_id', 1), "date": int(time.time()),
+                   "chat": {"id": chat_id, "type": "private"}, "text": params.get('text', '')}
+        return 200, json.dumps({"ok": True, "result": message}).encode()
+
+
+async def run(name, scheduler, args):
+    rng = random.Random(args.seed)
+    telegram = FloodLimitedTelegram(args)
+    bot = ExtBot("123456:bench", request=telegram, get_updates_request=telegram, rate_limiter=scheduler)
+    background = {"rate_limit_args": LANE_BACKGROUND} if scheduler else {}
+    await bot.initialize()
+
+    reply_latency, outcomes, tasks = [], Counter(), []
+
+    async def send(kind, coro):
+        started = time.perf_counter()
+        try:
+            await coro
+            outcomes[f"{kind} ok"] += 1
+            if kind == "reply":
+                reply_latency.append(time.perf_counter() - started)
+        except RetryAfter:
+            outcomes[f"{kind} 429"] += 1
+
+    started = time.perf_counter()
+    for n in range(args.broadcast):
+        tasks.append(asyncio.create_task(send("broadcast", bot.send_message(1000 + n, f"Promo {n}", **background))))
+    ticks = int(args.seconds * 10)
+    for tick in range(ticks):
+        for _ in range(int(args.replies / 10) + (rng.random() < (args.replies / 10) % 1)):
+            tasks.append(asyncio.create_task(send("reply", bot.send_message(rng.randrange(10000, 20000), "Added to cart"))))
+        for _ in range(int(args.edits / 10) + (rng.random() < (args.edits / 10) % 1)):
+            tasks.append(asyncio.create_task(send("progress", bot.edit_message_text(f"Rows read: {tick}", chat_id=ADMIN_CHAT, message_id=7, **background))))
+        await asyncio.sleep(0.1)
+    await asyncio.gather(*tasks)
+    drained = time.perf_counter() - started
+    await bot.shutdown()
+
+    print(f"{name:<10} replies p50 {percentile(reply_latency, 50) * 1000:7.1f}ms p99 {percentile(reply_latency, 99) * 1000:7.1f}ms | "
+          f"429s {telegram.calls['429']:4d} | sent {telegram.calls['sendMessage']} msgs + {telegram.calls['editMessageText']} edits | "
+          f"drained in {drained:5.1f}s")
+    print(f"{'':<10} {dict(sorted(outcomes.items()))}")
+    if scheduler:
+        stats = scheduler.stats()
+        print(f"{'':<10} scheduler: {stats['coalesced']} edits coalesced, avg wait {stats['avgWaitMs']}ms, max {stats['maxWaitMs']}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--replies', type=float, default=25.0, help='interactive replies per second')
+    parser.add_argument('--broadcast', type=int, default=100, help='admin notifications queued at the start')
+    parser.add_argument('--edits', type=float, default=10.0, help='progress edits per second to one message')
+    parser.add_argument('--global-limit', type=int, default=30, help='sends per second before Telegram answers 429')
+    parser.add_argument('--penalty', type=int, default=2, help='retry_after on a 429 (s)')
+    parser.add_argument('--rtt', type=float, default=40.0, help='Bot API round trip (ms)')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)
+
+    print(f"{args.replies:.0f} replies/s + {args.broadcast} broadcast + {args.edits:.0f} progress edits/s for {args.seconds:.0f}s; "
+          f"Telegram allows {args.global_limit}/s and 20 per chat per 10s")
+    await run("direct", None, args)
+    # At most rate + burst sends land in any one second
+    await run("scheduled", SendScheduler(overall_rate=args.global_limit - 5, overall_burst=5), args)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
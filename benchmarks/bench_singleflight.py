@@ -0,0 +1,89 @@
+"""
+Backend load during a scan spike, with and without GET coalescing.
+
+    python benchmarks/bench_singleflight.py [--shoppers 500] [--hot 20] [--waves 5] [--latency 80]
+
+--shoppers scan at the same moment, --waves times, each picking one of
+--hot promo barcodes, while one in ten also opens /staff. The catalog
+mirror is stale, so every scan asks the backend for /products/{barcode},
+as it does right after a restart or a failed refresh. The stub answers
+after `latency` +/- `jitter` ms. Reports backend calls against requests
+made and the latency each shopper saw:
+
+  direct     straight to BackendClient.request, one call per shopper
+  coalesced  through bot.smart_request (SingleFlight)
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp())  # bot.py opens bot.log in the working directory
+
+import httpx
+
+import bot
+from _common import ADMIN_USERNAME, StubBackend, percentile
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+async def run(name, request, hot, backend, args, rng):
+    backend.reset_counts()
+    bot.singleflight.clear()
+    samples, made = [], 0
+
+    async def shopper(n):
+        nonlocal made
+        started = time.perf_counter()
+        calls = [request("GET", f"/products/{rng.choice(hot)}")]
+        if n % 10 == 0:
+            calls.append(request("GET", "/admin/staff", headers={'x-admin-username': ADMIN_USERNAME}))
+        made += len(calls)
+        await asyncio.gather(*calls)
+        samples.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for _ in range(args.waves):
+        await asyncio.gather(*(shopper(n) for n in range(args.shoppers)))
+    elapsed = time.perf_counter() - started
+
+    sent = sum(backend.calls.values())
+    print(f"{name:<10} {sent:6d} backend calls for {made} requests ({dict(backend.calls)}) | "
+          f"p50 {percentile(samples, 50) * 1000:7.1f}ms | p99 {percentile(samples, 99) * 1000:7.1f}ms | {elapsed:5.2f}s")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shoppers', type=int, default=500, help='shoppers scanning at once')
+    parser.add_argument('--hot', type=int, default=20, help='distinct promo barcodes')
+    parser.add_argument('--waves', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=80.0, help='per-call backend latency (ms)')
+    parser.add_argument('--jitter', type=float, default=20.0)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    products = [{"barcode": str(6000000000000 + i), "name": f"Item {i}", "price": 100 + i} for i in range(1000)]
+    hot = [p['barcode'] for p in rng.sample(products, args.hot)]
+    backend = StubBackend(products, args.latency, args.jitter, seed=args.seed)
+    bot.backend._client = httpx.AsyncClient(transport=httpx.MockTransport(backend))
+
+    print(f"{args.shoppers} shoppers x {args.waves} waves, {args.hot} hot barcodes, backend {args.latency:.0f}+/-{args.jitter:.0f}ms, "
+          f"{bot.BACKEND_MAX_CONCURRENCY} backend slots")
+    await run("direct", bot.backend.request, hot, backend, args, rng)
+    await run("coalesced", bot.smart_request, hot, backend, args, rng)
+    stats = bot.singleflight.stats(top=3)
+    print(f"single-flight: {stats['savedRate']:.1%} saved, {stats['shared']} shared, {stats['cached']} cached; "
+          f"busiest {', '.join(k['key'] for k in stats['topKeys'])}")
+    await bot.backend.aclose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
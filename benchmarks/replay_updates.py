@@ -0,0 +1,174 @@
+"""
+Replay Telegram updates through the webhook listener.
+
+    python benchmarks/replay_updates.py [--updates recorded.jsonl] [--users 200] [--per-user 10] [--work 50]
+    python benchmarks/replay_updates.py --url http://127.0.0.1:8081/telegram/webhook --secret ... --updates recorded.jsonl
+
+Updates come from a JSON Lines file (one raw update per line, e.g. copied from
+getUpdates) or are synthesised as text messages from `--users` shoppers.
+Each user's updates are POSTed one after another, as Telegram does per chat,
+with all users in flight at once.
+
+Without --url it runs offline: a WebhookServer on a free port feeds an
+Application whose only handler sleeps `--work` ms (standing in for backend
+round trips), once with sequential processing and once with the
+OrderedUpdateProcessor. It reports throughput, latency from POST to handled,
+HTTP statuses and any per-user ordering violations. With --url it only POSTs
+to a running bot and reports throughput and statuses.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import httpx
+from telegram import Update, User
+from telegram.ext import ApplicationBuilder, ExtBot, TypeHandler
+
+from _common import percentile
+from webhook import OrderedUpdateProcessor, WebhookServer, ordering_key
+
+SECRET = "replay-secret"
+
+
+class OfflineBot(ExtBot):
+    """Bot that never talks to Telegram; enough for Application.initialize()."""
+
+    async def get_me(self, *args, **kwargs):
+        self._bot_user = User(id=1, first_name="Replay", is_bot=True, username="replay_bot")
+        return self._bot_user
+
+
+def synthetic_updates(users, per_user):
+    updates, update_id = [], 100000
+    for n in range(per_user):
+        for user_id in range(1000, 1000 + users):
+            update_id += 1
+            user = {"id": user_id, "is_bot": False, "first_name": f"Shopper {user_id}"}
+            updates.append({
+                "update_id": update_id,
+                "message": {
+                    "message_id": n + 1, "date": int(time.time()), "text": f"scan {n}",
+                    "chat": {"id": user_id, "type": "private"}, "from": user
+                }
+            })
+    return updates
+
+
+def load_updates(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def user_of(raw):
+    for value in raw.values():
+        if isinstance(value, dict):
+            sender = value.get("from") or value.get("user") or value.get("chat")
+            if isinstance(sender, dict) and "id" in sender:
+                return sender["id"]
+    return None
+
+
+async def post_all(url, updates, secret, senders):
+    """POST each user's updates in order, users concurrently. Returns (status counts, sent_at, elapsed)."""
+    by_user = defaultdict(list)
+    for raw in updates:
+        by_user[user_of(raw)].append(raw)
+    statuses, sent_at = Counter(), {}
+    gate = asyncio.Semaphore(senders)
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=senders), timeout=30) as client:
+        async def sender(queue):
+            for raw in queue:
+                async with gate:
+                    sent_at[raw["update_id"]] = time.perf_counter()
+                    try:
+                        res = await client.post(url, json=raw, headers=headers)
+                        statuses[res.status_code] += 1
+                    except httpx.HTTPError as e:
+                        statuses[type(e).__name__] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(sender(q) for q in by_user.values()))
+    return statuses, sent_at, time.perf_counter() - started
+
+
+async def run_offline(name, processor, updates, args):
+    builder = ApplicationBuilder().bot(OfflineBot("123456:replay"))
+    if processor is not None:
+        builder = builder.concurrent_updates(processor)
+    application = builder.build()
+
+    handled_at, seen, violations = {}, {}, 0
+
+    async def handler(update, context):
+        nonlocal violations
+        key = ordering_key(update)
+        if key in seen and seen[key] > update.update_id:
+            violations += 1
+        seen[key] = update.update_id
+        await asyncio.sleep(args.work / 1000)
+        handled_at[update.update_id] = time.perf_counter()
+
+    application.add_handler(TypeHandler(Update, handler))
+    server = WebhookServer(
+        application, asyncio.get_running_loop(), "127.0.0.1", 0, "/telegram/webhook",
+        secret=SECRET, max_backlog=args.backlog, processor=processor
+    )
+    async with application:
+        await application.start()
+        server.start()
+        url = f"http://127.0.0.1:{server.address[1]}/telegram/webhook"
+        started = time.perf_counter()
+        statuses, sent_at, _ = await post_all(url, updates, SECRET, args.senders)
+        while len(handled_at) < statuses[200]:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        server.stop()
+        await application.stop()
+
+    latencies = [handled_at[u] - sent_at[u] for u in handled_at]
+    print(
+        f"{name:<12} {len(handled_at) / elapsed:8.1f} updates/s | "
+        f"p50 {percentile(latencies, 50) * 1000:8.1f}ms | p99 {percentile(latencies, 99) * 1000:8.1f}ms | "
+        f"statuses {dict(statuses)} | order violations {violations}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--updates', help='JSON Lines file of recorded updates')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--per-user', type=int, default=10)
+    parser.add_argument('--work', type=float, default=50.0, help='simulated handler time per update (ms)')
+    parser.add_argument('--concurrency', type=int, default=64, help='max updates processed at once')
+    parser.add_argument('--backlog', type=int, default=1000, help='queued+in-flight updates before 503')
+    parser.add_argument('--senders', type=int, default=64, help='concurrent POSTs')
+    parser.add_argument('--url', help='POST to a running bot instead of the offline stand-in')
+    parser.add_argument('--secret', default=os.getenv("WEBHOOK_SECRET"))
+    parser.add_argument('--skip-sequential', action='store_true')
+    args = parser.parse_args()
+
+    updates = load_updates(args.updates) if args.updates else synthetic_updates(args.users, args.per_user)
+    updates.sort(key=lambda u: u["update_id"])
+
+    if args.url:
+        statuses, _, elapsed = await post_all(args.url, updates, args.secret, args.senders)
+        print(f"{len(updates)} updates in {elapsed:.2f}s ({len(updates) / elapsed:.1f}/s) | statuses {dict(statuses)}")
+        return
+
+    print(f"{len(updates)} updates, {args.work:.0f}ms handler work, {args.senders} concurrent senders")
+    if not args.skip_sequential:
+        await run_offline("sequential", None, updates, args)
+    await run_offline("ordered", OrderedUpdateProcessor(args.concurrency), updates, args)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,34 +1,37 @@
 import logging
 import os
-import sys
-
-# 🔍 STARTUP DEBUGGING (For Render)
-print(f"--- BOT SYSTEM DEBUG ---")
-print(f"Python Executable: {sys.executable}")
-print(f"Python Version: {sys.version}")
-print(f"System Path: {sys.path}")
-print(f"Environment PATH: {os.environ.get('PATH')}")
-print(f"------------------------")
-
-try:
-    import requests
-    print("SUCCESS: 'requests' is available.")
-except Exception as e:
-    print(f"CRITICAL: 'requests' import failed - {e}")
-# import cv2
-# import numpy as np
+import time
+
+PROCESS_STARTED = time.monotonic()
+
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton, WebAppInfo, constants
 from telegram.ext import (
     ApplicationBuilder, CommandHandler, ContextTypes, MessageHandler, 
-    filters, CallbackQueryHandler, ConversationHandler
+    filters, CallbackQueryHandler, ConversationHandler, TypeHandler
 )
 from dotenv import load_dotenv
 # import pandas as pd
-import io
+import asyncio
 import json
-import time
-import threading
-from http.server import BaseHTTPRequestHandler, HTTPServer
+import secrets
+
+from api_client import BackendClient, wait_until_ready
+from caches import TTLCache
+from carts import CartCache
+from catalog import CatalogMirror
+from checkout import CheckoutQueue
+from logsetup import bind_update, configure_logging
+from metrics import BackendMetrics, MetricsServer, instrumented
+from outbound import LANE_BACKGROUND, SendScheduler
+from persistence import SQLitePersistence
+from photoscan import PhotoDecoder, PhotoDecoderBusy
+from recommendations import RecommendationIndex
+from search import ProductSearchIndex
+from singleflight import SingleFlight
+from staff import StaffRoster
+from webhook import OrderedUpdateProcessor, run_webhook
+
+IMPORTS_DONE = time.monotonic()
 
 load_dotenv()
 
@@ -42,68 +45,245 @@ API_BASE = os.getenv("API_BASE", "http://localhost:5000")
 API_URL = f"{API_BASE}/api"
 WEB_APP_URL = os.getenv("WEB_APP_URL", "https://smart-priceless-shopper.onrender.com")
 SCANNER_URL = f"{WEB_APP_URL}/scanner.html"
+LOCAL_API_URL = "http://localhost:5000/api"
+
+# Backend connection pool / concurrency limits
+BACKEND_MAX_CONNECTIONS = int(os.getenv("BACKEND_MAX_CONNECTIONS", "20"))
+BACKEND_MAX_CONCURRENCY = int(os.getenv("BACKEND_MAX_CONCURRENCY", "16"))
+# Circuit breaker: consecutive failures before a base URL is skipped, and
+# seconds before it is probed again
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "3"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+# Auth/session cache for /users/check lookups
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "60"))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+# Identical GETs in flight at once share one backend call; catalog and
+# staff responses are also reused for this many seconds (0 disables)
+SINGLE_FLIGHT_WINDOW = float(os.getenv("SINGLE_FLIGHT_WINDOW", "0.5"))
+SINGLE_FLIGHT_CACHEABLE = ("/products/", "/admin/staff", "/staff/")
+# Cart cache: seconds a user's cached cart is trusted without asking the
+# backend (after that it is revalidated with a cheap conditional GET)
+CART_FRESH_SECONDS = float(os.getenv("CART_FRESH_SECONDS", "15"))
+# Staff roles: seconds a cached role is trusted before revalidating it
+# (a roster change seen on any lookup makes every older role stale at once)
+STAFF_FRESH_SECONDS = float(os.getenv("STAFF_FRESH_SECONDS", "60"))
+# The bot's credential for backend routes it calls as itself (role lookups);
+# start.js generates one for both processes when it is not set
+BOT_SERVICE_TOKEN = os.getenv("BOT_SERVICE_TOKEN", "")
+# Checkout workers placing orders in the background, and how many times one
+# retries a failed /checkout (safe: every order carries an idempotency key)
+CHECKOUT_WORKERS = int(os.getenv("CHECKOUT_WORKERS", "2"))
+CHECKOUT_MAX_ATTEMPTS = int(os.getenv("CHECKOUT_MAX_ATTEMPTS", "4"))
+# Barcode photos: decoder processes (default min(2, cores)) and the longest
+# side, in pixels, an image is shrunk to before decoding
+PHOTO_DECODE_WORKERS = int(os.getenv("PHOTO_DECODE_WORKERS", "0")) or None
+PHOTO_MAX_SIDE = int(os.getenv("PHOTO_MAX_SIDE", "1024"))
+# Catalog mirror: how often to pull changes, and how old the mirror may get
+# before scans stop trusting it and ask the backend directly
+CATALOG_REFRESH_INTERVAL = float(os.getenv("CATALOG_REFRESH_INTERVAL", "30"))
+CATALOG_MAX_STALENESS = float(os.getenv("CATALOG_MAX_STALENESS", "300"))
+# How often the co-purchase index pulls new orders
+RECS_REFRESH_INTERVAL = float(os.getenv("RECS_REFRESH_INTERVAL", "120"))
+# Overall budget (seconds) for the backend lookups behind one scan reply
+SCAN_DEADLINE = float(os.getenv("SCAN_DEADLINE", "6"))
+# Results per page in the staff stock search and the recent-orders view
+STOCK_PAGE_SIZE = 5
+ORDERS_PAGE_SIZE = 5
+# Batch scans: most items per basket (the backend's limit too) and most
+# lines listed in the summary reply before "...and N more"
+BATCH_MAX_ITEMS = 200
+BATCH_SUMMARY_LINES = 40
+# Bulk inventory import: products per /admin/products/bulk call, and the
+# Telegram Bot API's download limit for files sent to a bot
+BULK_IMPORT_BATCH_SIZE = int(os.getenv("BULK_IMPORT_BATCH_SIZE", "1000"))
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+# Webhook mode: set WEBHOOK_URL to the public URL Telegram should POST to
+# (the backend proxies /telegram/webhook to the listener below); otherwise
+# the bot long-polls
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8081"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or secrets.token_urlsafe(32)
+# Updates handled at once (one user's updates still run in order), and how
+# many may be queued or in flight before the webhook answers 503
+MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", "64"))
+WEBHOOK_MAX_BACKLOG = int(os.getenv("WEBHOOK_MAX_BACKLOG", "1000"))
+# Outbound messages per second: across all chats, and per private / group
+# chat (with the burst each bucket allows)
+TELEGRAM_OVERALL_RATE = float(os.getenv("TELEGRAM_OVERALL_RATE", "25"))
+TELEGRAM_OVERALL_BURST = int(os.getenv("TELEGRAM_OVERALL_BURST", "5"))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+TELEGRAM_CHAT_BURST = int(os.getenv("TELEGRAM_CHAT_BURST", "10"))
+TELEGRAM_GROUP_RATE = float(os.getenv("TELEGRAM_GROUP_RATE", str(20 / 60)))
+
+# user_data / conversation state survives restarts in this SQLite file
+# (empty disables persistence); changes are written at most this often
+PERSISTENCE_PATH = os.getenv("PERSISTENCE_PATH", "bot_state.sqlite3")
+PERSISTENCE_FLUSH_INTERVAL = float(os.getenv("PERSISTENCE_FLUSH_INTERVAL", "2"))
+
+# Startup: how long to wait for the backend's /health before starting anyway
+BACKEND_READY_TIMEOUT = float(os.getenv("BACKEND_READY_TIMEOUT", "60"))
+
+# Logging: JSON lines in LOG_FILE (rotated at LOG_MAX_BYTES), plain text on
+# stdout from LOG_CONSOLE_LEVEL up; httpx's one-line-per-request INFO logs
+# are kept 1 in LOG_SAMPLE_HTTPX
+LOG_FILE = os.getenv("LOG_FILE", "bot.log")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUPS = int(os.getenv("LOG_BACKUPS", "3"))
+LOG_CONSOLE_LEVEL = os.getenv("LOG_CONSOLE_LEVEL", "INFO").upper()
+LOG_SAMPLE_HTTPX = int(os.getenv("LOG_SAMPLE_HTTPX", "100"))
+
+# Prometheus metrics on http://METRICS_LISTEN:METRICS_PORT/metrics (0 disables)
+METRICS_LISTEN = os.getenv("METRICS_LISTEN", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
 
 # Conversation States
 REG_NAME, REG_PHONE, REG_EMAIL, LOGIN_CODE = range(4)
 
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    handlers=[
-        logging.FileHandler("bot.log"),
-        logging.StreamHandler()
-    ]
+configure_logging(
+    LOG_FILE,
+    max_bytes=LOG_MAX_BYTES,
+    backups=LOG_BACKUPS,
+    console_level=LOG_CONSOLE_LEVEL,
+    sample_rates={"httpx": LOG_SAMPLE_HTTPX}
 )
 
 # --- Helpers ---
 
-def smart_request(method, endpoint, **kwargs):
+backend = BackendClient(
+    [LOCAL_API_URL, API_URL],
+    max_connections=BACKEND_MAX_CONNECTIONS,
+    max_concurrency=BACKEND_MAX_CONCURRENCY,
+    failure_threshold=BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=BREAKER_RESET_TIMEOUT,
+    metrics=BackendMetrics()
+)
+singleflight = SingleFlight(backend.request, window=SINGLE_FLIGHT_WINDOW, cacheable=SINGLE_FLIGHT_CACHEABLE)
+
+async def smart_request(method, endpoint, **kwargs):
     """
     Tries internal localhost first (fastest for Render), 
     then falls back to the public API_BASE.
+    Runs on the shared pooled client so handlers never block the event loop;
+    a base URL whose breaker is open is skipped until a probe succeeds.
+    Identical concurrent GETs are collapsed into one call.
     """
-    # 1. Try Localhost
-    local_url = f"http://localhost:5000/api{endpoint}"
-    try:
-        res = requests.request(method, local_url, timeout=3, **kwargs)
-        if res.status_code < 500: return res
-    except:
-        pass
+    return await singleflight.request(method, endpoint, **kwargs)
 
-    # 2. Try Public URL
-    public_url = f"{API_URL}{endpoint}" 
-    try:
-        return requests.request(method, public_url, timeout=10, **kwargs)
-    except Exception as e:
-        logging.error(f"Network Error for {endpoint}: {e}")
-        raise e
+catalog = CatalogMirror(smart_request, max_staleness=CATALOG_MAX_STALENESS)
+recommender = RecommendationIndex(catalog)
+catalog.subscribe(recommender)
+stock_index = ProductSearchIndex()
+catalog.subscribe(stock_index)
+background_tasks = []
+startup_backend_wait = 0.0  # seconds __main__ spent waiting for /health
+metrics_server = None
+
+async def post_init(application):
+    global metrics_server
+    now = time.monotonic()
+    logging.info(
+        f"[Startup] Ready in {(now - PROCESS_STARTED) * 1000:.0f}ms "
+        f"(imports {(IMPORTS_DONE - PROCESS_STARTED) * 1000:.0f}ms, "
+        f"backend wait {startup_backend_wait * 1000:.0f}ms)"
+    )
+    if METRICS_PORT:
+        metrics_server = MetricsServer(METRICS_LISTEN, METRICS_PORT)
+        metrics_server.start()
+    background_tasks.append(asyncio.create_task(catalog.run(CATALOG_REFRESH_INTERVAL)))
+    background_tasks.append(asyncio.create_task(recommender.run(smart_request, RECS_REFRESH_INTERVAL)))
+    background_tasks.append(asyncio.create_task(checkouts.run()))
+
+async def post_shutdown(application):
+    for task in background_tasks:
+        task.cancel()
+    await backend.aclose()
+    await photo_decoder.aclose()
+    if metrics_server:
+        metrics_server.stop()
+    if application.persistence:
+        application.persistence.close()
+
+async def lookup_product(barcode):
+    """Product dict from the catalog mirror, or from the backend if the mirror is stale or missing it."""
+    if catalog.is_fresh():
+        product = catalog.get(barcode)
+        if product is not None:
+            return product
+    res = await smart_request("GET", f"/products/{barcode}")
+    if res.status_code != 200:
+        return None
+    product = res.json()
+    catalog.upsert(product)
+    return product
+
+# user_id -> /users/check payload. Invalidated on login, registration and
+# logout so the cache never outlives a login state change made through the bot.
+session_cache = TTLCache(maxsize=SESSION_CACHE_SIZE, ttl=SESSION_CACHE_TTL)
 
 async def is_authenticated(user_id):
-    try:
-        res = smart_request("GET", f"/users/check/{user_id}").json()
-        return res.get('registered') and res.get('loggedIn')
-    except:
-        return False
+    status = await get_user_status(user_id)
+    return bool(status.get('registered') and status.get('loggedIn'))
 
 async def get_user_status(user_id):
+    status = session_cache.get(user_id)
+    if status is not None:
+        return status
     try:
-        return smart_request("GET", f"/users/check/{user_id}").json()
+        res = await smart_request("GET", f"/users/check/{user_id}")
+        if res.status_code != 200:
+            return {"registered": False}
+        status = res.json()
     except:
         return {"registered": False}
+    session_cache.set(user_id, status)
+    return status
+
+carts = CartCache(smart_request, fresh_for=CART_FRESH_SECONDS)
+staff_roster = StaffRoster(smart_request, BOT_SERVICE_TOKEN, fresh_for=STAFF_FRESH_SECONDS)
+checkouts = CheckoutQueue(smart_request, workers=CHECKOUT_WORKERS, max_attempts=CHECKOUT_MAX_ATTEMPTS)
+photo_decoder = PhotoDecoder(workers=PHOTO_DECODE_WORKERS, max_side=PHOTO_MAX_SIDE)
+
+async def fetch_cart(user_id):
+    """The user's cart (usually from the cart cache), or None if it could not be fetched."""
+    try:
+        return await carts.load(user_id)
+    except Exception as e:
+        logging.warning(f"Cart fetch failed for {user_id}: {e!r}")
+        return None
 
-def get_recommendations(current_product, all_products):
-    category = current_product.get('category')
-    barcode = current_product.get('barcode')
-    related = [p for p in all_products if p.get('category') == category and p.get('barcode') != barcode]
-    if len(related) < 1:
-        related = [p for p in all_products if p.get('barcode') != barcode][:2]
-    return related[:3]
+async def wait_until(task, deadline, optional=False):
+    """
+    Result of `task` if it finishes before the loop-time `deadline`.
+    On a miss, optional lookups give None; required ones raise TimeoutError.
+    """
+    remaining = deadline - asyncio.get_running_loop().time()
+    done, _ = await asyncio.wait({task}, timeout=max(remaining, 0))
+    if done:
+        return task.result()
+    if optional:
+        return None
+    raise asyncio.TimeoutError("backend did not answer in time")
+
+def discard_tasks(tasks):
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled():
+            task.exception()  # mark retrieved so asyncio doesn't log it
+
+def get_recommendations(current_product, limit=3):
+    # Bought-together first, then category best-sellers, then same category
+    return recommender.recommend(current_product, limit=limit)
 
 # --- Registration Flow ---
 
+@instrumented("ping")
 async def ping(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("🏓 Pong! Bot is alive and well.")
 
+@instrumented("start")
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     status = await get_user_status(user_id)
@@ -142,16 +322,19 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     return ConversationHandler.END
 
+@instrumented("reg_name")
 async def reg_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data['reg_name'] = update.message.text
     await update.message.reply_text("Great! Now, what is your **Phone Number**? (with country code)", parse_mode='Markdown')
     return REG_PHONE
 
+@instrumented("reg_phone")
 async def reg_phone(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data['reg_phone'] = update.message.text
     await update.message.reply_text("Finally, what is your **Email Address**?", parse_mode='Markdown')
     return REG_EMAIL
 
+@instrumented("reg_email")
 async def reg_email(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data['reg_email'] = update.message.text
     
@@ -164,7 +347,8 @@ async def reg_email(update: Update, context: ContextTypes.DEFAULT_TYPE):
     }
     
     try:
-        res = smart_request("POST", "/users/register", json=payload).json()
+        res = (await smart_request("POST", "/users/register", json=payload)).json()
+        session_cache.invalidate(update.effective_user.id)
         code = res.get('loginCode')
         
         await update.message.reply_text(
@@ -184,13 +368,15 @@ async def reg_email(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     return ConversationHandler.END
 
+@instrumented("handle_login")
 async def handle_login(update: Update, context: ContextTypes.DEFAULT_TYPE):
     code = update.message.text
     user_id = update.effective_user.id
     
     try:
-        res = smart_request("POST", "/users/login", json={"userId": user_id, "code": code})
+        res = await smart_request("POST", "/users/login", json={"userId": user_id, "code": code})
         if res.status_code == 200:
+            session_cache.invalidate(user_id)
             data = res.json()
             await update.message.reply_text(
                 f"✅ *Login Verified!*\nWelcome back, {data['name']}.",
@@ -209,6 +395,18 @@ async def handle_login(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Service error during login. Please try again later.")
         return ConversationHandler.END
 
+@instrumented("logout")
+async def logout(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    try:
+        await smart_request("POST", "/users/logout", json={"userId": user_id})
+        await update.message.reply_text("👋 You have been logged out. Run /start and enter your security code to shop again.")
+    except Exception as e:
+        logging.error(f"Logout Error for {user_id}: {e}")
+        await update.message.reply_text("Service error during logout. Please try again later.")
+    finally:
+        session_cache.invalidate(user_id)
+
 # --- Feature Handlers (Auth Guarded) ---
 
 async def auth_guard(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -217,28 +415,41 @@ async def auth_guard(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return False
     return True
 
+@instrumented("process_barcode_logic")
 async def process_barcode_logic(barcode, update, context):
-    if not await auth_guard(update, context): return
-    
+    if barcode.startswith("http"):
+        if not await auth_guard(update, context): return
+        await update.message.reply_text("🌐 Website link detected. Please scan product barcode! 🛍️", parse_mode='Markdown')
+        return
+
+    # Auth first, so unregistered users cost the backend nothing more (and
+    # it is usually a session cache hit); then the product and cart lookups
+    # side by side, all under one deadline. Auth and product are required;
+    # the cart only decides which buttons to show, so a slow cart just
+    # renders "Add to Cart".
+    user_id = update.effective_user.id
+    deadline = asyncio.get_running_loop().time() + SCAN_DEADLINE
+    tasks = [asyncio.create_task(is_authenticated(user_id))]
+
     try:
-        if barcode.startswith("http"):
-            await update.message.reply_text("🌐 Website link detected. Please scan product barcode! 🛍️", parse_mode='Markdown')
+        if not await wait_until(tasks[0], deadline):
+            await update.message.reply_text("🔒 Please run /start to login first.")
             return
 
-        response = smart_request("GET", f"/products/{barcode}")
-        if response.status_code == 200:
-            product = response.json()
-            all_products = []
-            try: all_products = smart_request("GET", "/products/all").json()
-            except: pass
-            
-            recommendations = get_recommendations(product, all_products)
+        product_task = asyncio.create_task(lookup_product(barcode))
+        cart_task = asyncio.create_task(fetch_cart(user_id))
+        tasks += [product_task, cart_task]
+        product = await wait_until(product_task, deadline)
+        if product is not None:
+            recommendations = get_recommendations(product)
             msg = f"📦 *{product['name']}*\n💰 *Price:* ₦{product['price']:,}\n\n"
+            if recommendations:
+                msg += "💡 *Often bought with this:*\n"
+                for p in recommendations:
+                    msg += f"• {p['name']} - ₦{p['price']:,}\n"
             
             # Check backend cart to see if item is there
-            user_id = update.effective_user.id
-            cart_res = smart_request("GET", f"/cart/{user_id}")
-            cart = cart_res.json() if cart_res.status_code == 200 else []
+            cart = await wait_until(cart_task, deadline, optional=True) or []
             in_cart = any(item['barcode'] == barcode for item in cart)
             
             keyboard = []
@@ -252,18 +463,21 @@ async def process_barcode_logic(barcode, update, context):
             await update.message.reply_text(msg, parse_mode='Markdown', reply_markup=InlineKeyboardMarkup(keyboard))
         else:
             await update.message.reply_text(f"🤔 *Item not in database.* (`{barcode}`)", parse_mode='Markdown')
+    except asyncio.TimeoutError:
+        await update.message.reply_text("⚠️ Service is busy right now. Please scan again in a moment.")
     except Exception as e:
         await update.message.reply_text(f"⚠️ Service error: {e}")
+    finally:
+        discard_tasks(tasks)
 
-async def show_cart(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@instrumented("show_cart")
+async def show_cart(update: Update, context: ContextTypes.DEFAULT_TYPE, revalidate=False):
     if not await auth_guard(update, context): return
     user_id = update.effective_user.id
     query = update.callback_query
     
     try:
-        # Fetch cart from backend
-        res = requests.get(f"{API_URL}/cart/{user_id}")
-        cart = res.json()
+        cart = await carts.load(user_id, revalidate=revalidate)
         
         if not cart:
             msg = "🛒 Your cart is empty! Start scanning items to add them. 🛍️"
@@ -291,6 +505,7 @@ async def show_cart(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         await update.message.reply_text(f"⚠️ Error fetching cart: {e}")
 
+@instrumented("show_profile")
 async def show_profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await auth_guard(update, context): return
     user = update.effective_user
@@ -302,13 +517,178 @@ async def show_profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     await update.message.reply_text(msg, parse_mode='Markdown', reply_markup=InlineKeyboardMarkup(keyboard) if keyboard else None)
 
+def parse_batch(data):
+    """
+    A batch payload from the scanner: a JSON array of barcodes, of
+    {"barcode", "quantity"} objects or of [barcode, quantity] pairs.
+    Returns [(barcode, quantity)], or None if `data` isn't one.
+    """
+    if not data.startswith("["):
+        return None
+    try:
+        entries = json.loads(data)
+    except ValueError:
+        return None
+    items = []
+    for entry in entries:
+        if isinstance(entry, dict):
+            barcode, qty = entry.get("barcode"), entry.get("quantity", 1)
+        elif isinstance(entry, list) and entry:
+            barcode, qty = entry[0], entry[1] if len(entry) > 1 else 1
+        else:
+            barcode, qty = entry, 1
+        barcode = str(barcode or "").strip()
+        try:
+            qty = int(qty)
+        except (TypeError, ValueError):
+            qty = 1
+        if barcode and qty > 0:
+            items.append((barcode, qty))
+    return items
+
+@instrumented("process_batch")
+async def process_batch(items, update, context):
+    """Add a whole scanned basket with one backend call and one reply."""
+    if not await auth_guard(update, context): return
+    if not items:
+        await update.message.reply_text("🤔 That basket was empty. Scan some items first! 🛍️")
+        return
+    if len(items) > BATCH_MAX_ITEMS:
+        await update.message.reply_text(f"⚠️ That's more than {BATCH_MAX_ITEMS} items. Please send the basket in parts.")
+        return
+
+    user_id = update.effective_user.id
+    try:
+        res = await smart_request("POST", "/cart/bulk-add", json={
+            "userId": user_id,
+            "items": [{"barcode": barcode, "quantity": qty} for barcode, qty in items]
+        })
+        if res.status_code != 200:
+            await update.message.reply_text(f"❌ Could not add your basket: {res.json().get('error', res.status_code)}")
+            return
+        result = res.json()
+    except Exception as e:
+        # The backend may have added some of it before failing
+        carts.invalidate(user_id)
+        await update.message.reply_text(f"⚠️ Service error: {e}")
+        return
+
+    cart = result.get('cart', [])
+    carts.apply_snapshot(user_id, cart, result.get('cartVersion'))
+
+    added, missing = result.get('added', []), result.get('missing', [])
+    msg = f"🧺 *BASKET ADDED* ({sum(i['quantity'] for i in added)} item(s))\n\n"
+    for item in added[:BATCH_SUMMARY_LINES]:
+        msg += f"• *{item['name']}* x{item['quantity']} - ₦{item['price'] * item['quantity']:,}\n"
+    if len(added) > BATCH_SUMMARY_LINES:
+        msg += f"_...and {len(added) - BATCH_SUMMARY_LINES} more_\n"
+    if added:
+        msg += f"\n💰 *Added:* ₦{sum(i['price'] * i['quantity'] for i in added):,}\n"
+    msg += f"🛒 *Cart total:* ₦{sum(i['price'] * i.get('quantity', 1) for i in cart):,}"
+    if missing:
+        msg += "\n\n🤔 *Not in database:* " + ", ".join(f"`{b}`" for b in missing[:BATCH_SUMMARY_LINES])
+
+    keyboard = [
+        [InlineKeyboardButton("💳 PROCEED TO PAYMENT", callback_data="checkout")],
+        [InlineKeyboardButton("🛒 View Cart", callback_data="view_cart")]
+    ]
+    await update.message.reply_text(msg, parse_mode='Markdown', reply_markup=InlineKeyboardMarkup(keyboard))
+
+@instrumented("handle_web_app_data")
 async def handle_web_app_data(update: Update, context: ContextTypes.DEFAULT_TYPE):
     data = update.effective_message.web_app_data.data
     if data == "VIEW_CART":
-        await show_cart(update, context)
+        # The scanner writes to the backend cart directly, so the cached copy
+        # may be behind: a conditional GET costs a 304 if it isn't
+        await show_cart(update, context, revalidate=True)
+        return
+    batch = parse_batch(data)
+    if batch is not None:
+        await process_batch(batch, update, context)
     else:
         await process_barcode_logic(data, update, context)
 
+@instrumented("handle_photo")
+async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Fallback for shoppers whose web app scanner fails: read the barcode from a photo."""
+    if not await auth_guard(update, context): return
+    if not photo_decoder.available:
+        await update.message.reply_text("📷 Photo scanning isn't available right now. Please use the 📸 Scan Item button.")
+        return
+
+    # Telegram keeps several sizes: the smallest that is still big enough saves download and decode time
+    sizes = update.message.photo
+    photo = next((p for p in sizes if max(p.width, p.height) >= PHOTO_MAX_SIDE), sizes[-1])
+
+    async def download():
+        return await (await photo.get_file()).download_as_bytearray()
+
+    try:
+        codes = await photo_decoder.decode(photo.file_unique_id, download)
+    except PhotoDecoderBusy:
+        await update.message.reply_text("⚠️ Lots of photos to read right now. Please send it again in a moment.")
+        return
+    except Exception as e:
+        logging.error(f"Photo decode failed: {e}")
+        await update.message.reply_text("⚠️ Could not read that photo. Please try again.")
+        return
+    if not codes:
+        await update.message.reply_text("🤔 No barcode found. Try again closer, with the barcode flat and well lit.")
+        return
+    await process_barcode_logic(codes[0], update, context)
+
+def render_stock_results(query, page):
+    results, total = stock_index.search(query, offset=page * STOCK_PAGE_SIZE, limit=STOCK_PAGE_SIZE)
+    if not results:
+        return None, None
+
+    pages = (total + STOCK_PAGE_SIZE - 1) // STOCK_PAGE_SIZE
+    msg = f"🔍 *STOCK FOUND (Name Match)*\n_{total} result(s) - page {page + 1}/{pages}_\n\n"
+    for p in results:
+        msg += f"📦 *{p['name']}*\n💰 Price: ₦{p['price']:,}\n🔗 Barcode: `{p['barcode']}`\n\n"
+
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton("◀️ Prev", callback_data=f"stock_page_{page - 1}"))
+    if page + 1 < pages:
+        nav.append(InlineKeyboardButton("Next ▶️", callback_data=f"stock_page_{page + 1}"))
+    return msg, InlineKeyboardMarkup([nav]) if nav else None
+
+async def render_orders_page(username, before=None, after=None):
+    """(message, markup) for one page of /orders/feed, newest first."""
+    params = {"limit": ORDERS_PAGE_SIZE}
+    if before is not None:
+        params["before"] = before
+    if after is not None:
+        params["after"] = after
+    res = await smart_request("GET", "/orders/feed", params=params, headers={'x-admin-username': username or ''})
+    if res.status_code == 403:
+        return "⛔ *Access Denied:* Your staff role can't view orders.", None
+    if res.status_code != 200:
+        return "⚠️ Error fetching orders.", None
+    page = res.json()
+    if not page['orders']:
+        return "🗂️ *RECENT ORDERS*\n\nNo orders yet.", None
+
+    msg = f"🗂️ *RECENT ORDERS*\n_{page['total']} order(s) in total_\n\n"
+    for o in page['orders']:
+        items = sum(i.get('quantity', 1) for i in o.get('items', []))
+        placed = str(o.get('createdAt', ''))[:16].replace('T', ' ')
+        msg += (
+            f"🧾 `{o['orderId']}` - ₦{o.get('total', 0):,}\n"
+            f"🏬 {o.get('outletName', o.get('outletId', '?'))} | {items} item(s) | {o.get('status', '?')}\n"
+            f"🕐 {placed} UTC\n\n"
+        )
+    nav = []
+    if page.get('prev') is not None:
+        nav.append(InlineKeyboardButton("◀️ Newer", callback_data=f"orders_after_{page['prev']}"))
+    if page.get('next') is not None:
+        nav.append(InlineKeyboardButton("Older ▶️", callback_data=f"orders_before_{page['next']}"))
+    keyboard = [nav] if nav else []
+    keyboard.append([InlineKeyboardButton("🔄 Latest", callback_data="staff_orders")])
+    return msg, InlineKeyboardMarkup(keyboard)
+
+@instrumented("handle_text_messages")
 async def handle_text_messages(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text
     
@@ -316,22 +696,21 @@ async def handle_text_messages(update: Update, context: ContextTypes.DEFAULT_TYP
     if context.user_data.get('searching_stock'):
         context.user_data['searching_stock'] = False
         try:
+            if not catalog.is_fresh():
+                await catalog.refresh()
+
             # First try as barcode, then as name
-            res = requests.get(f"{API_URL}/products/{text}")
-            if res.status_code == 200:
-                p = res.json()
+            p = catalog.get(text)
+            if p is not None:
                 msg = f"🔍 *STOCK FOUND (Barcode)*\n📦 *{p['name']}*\n💰 Price: ₦{p['price']:,}\n📂 Category: {p['category']}"
                 await update.message.reply_text(msg, parse_mode='Markdown')
                 return
             
             # Search by name
-            all_p = requests.get(f"{API_URL}/products/all").json()
-            matches = [p for p in all_p if text.lower() in p['name'].lower()]
-            if matches:
-                msg = "🔍 *STOCK FOUND (Name Match)*\n\n"
-                for p in matches[:5]:
-                    msg += f"📦 *{p['name']}*\n💰 Price: ₦{p['price']:,}\n🔗 Barcode: `{p['barcode']}`\n\n"
-                await update.message.reply_text(msg, parse_mode='Markdown')
+            msg, markup = render_stock_results(text, 0)
+            if msg:
+                context.user_data['stock_query'] = text
+                await update.message.reply_text(msg, parse_mode='Markdown', reply_markup=markup)
             else:
                 await update.message.reply_text("❌ No items found matching that name or barcode.")
         except:
@@ -343,6 +722,22 @@ async def handle_text_messages(update: Update, context: ContextTypes.DEFAULT_TYP
     elif text == '👤 Profile': await show_profile(update, context)
     elif text == '📜 History': await update.message.reply_text("📜 *PURCHASE HISTORY*\n\n1. Nestlé Milo - ₦2,500\n2. Peak Milk - ₦1,800\n\n_Feature in development..._", parse_mode='Markdown')
 
+# Callback data is "<action>" or "<action>_<id/amount>"; metrics are kept
+# per action, never per id
+BUTTON_ACTIONS = {'view_cart', 'checkout', 'clear_cart', 'admin_stats', 'back_admin', 'staff_stock', 'staff_orders'}
+BUTTON_PREFIXES = ('add_', 'rem_', 'pay_stars_', 'pay_card_', 'pay_paystack_', 'pay_bank_', 'confirm_bank_', 'stock_page_',
+                   'orders_before_', 'orders_after_')
+
+def button_action(update, context):
+    data = update.callback_query.data or ''
+    if data in BUTTON_ACTIONS:
+        return f"button:{data}"
+    for prefix in BUTTON_PREFIXES:
+        if data.startswith(prefix):
+            return f"button:{prefix[:-1]}"
+    return "button:other"
+
+@instrumented(button_action)
 async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     data = query.data
@@ -351,16 +746,34 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if data.startswith('add_'):
         barcode = data.split('_')[1]
         user_id = query.from_user.id
+        added_markup = InlineKeyboardMarkup([[InlineKeyboardButton("🛒 VIEW CART", callback_data="view_cart")]])
+        known = catalog.get(barcode)
+        add_task = asyncio.create_task(smart_request("POST", "/cart/add", json={"userId": user_id, "barcode": barcode, "quantity": 1}))
         try:
-            # Add to backend cart
-            res = smart_request("POST", "/cart/add", json={"userId": user_id, "barcode": barcode, "quantity": 1})
+            if known:
+                # Show the confirmation while the add is in flight; corrected below if it fails
+                try:
+                    await query.edit_message_text(f"✅ Added *{known['name']}* to your cart.", parse_mode='Markdown', reply_markup=added_markup)
+                except Exception as e:
+                    logging.warning(f"Optimistic add edit failed: {e}")
+            res = await add_task
             if res.status_code == 200:
-                p = res.json().get('product', {})
-                await query.edit_message_text(f"✅ Added *{p.get('name', 'Item')}* to your cart.", parse_mode='Markdown', reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🛒 VIEW CART", callback_data="view_cart")]]))
+                result = res.json()
+                carts.apply_add(user_id, result)
+                if not known:
+                    p = result.get('product', {})
+                    await query.edit_message_text(f"✅ Added *{p.get('name', 'Item')}* to your cart.", parse_mode='Markdown', reply_markup=added_markup)
             else:
+                carts.invalidate(user_id)
                 await query.edit_message_text("⚠️ Could not add item to cart.")
         except Exception as e:
             logging.error(f"Add Cart Error: {e}")
+            carts.invalidate(user_id)
+            if known:
+                try:
+                    await query.edit_message_text("⚠️ Could not add item to cart.")
+                except Exception:
+                    pass
     elif data.startswith('rem_'):
         barcode = data.split('_')[1]
         user_id = query.from_user.id
@@ -379,7 +792,8 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Show payment method selection
         user_id = query.from_user.id
         try:
-            cart = smart_request("GET", f"/cart/{user_id}").json()
+            # Paying for a stale cart would be worse than one round trip
+            cart = await carts.load(user_id, revalidate=True)
             if not cart:
                 await query.edit_message_text("🛒 Your cart is empty!")
                 return
@@ -411,7 +825,8 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif data == 'clear_cart':
         user_id = query.from_user.id
         try:
-            requests.post(f"{API_URL}/cart/clear", json={"userId": user_id})
+            res = await smart_request("POST", "/cart/clear", json={"userId": user_id})
+            carts.apply_clear(user_id, res.json().get('cartVersion') if res.status_code == 200 else None)
             await query.edit_message_text("🗑️ Your cart has been cleared.")
         except:
             await query.edit_message_text("⚠️ Error clearing cart.")
@@ -487,50 +902,43 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif data.startswith('confirm_bank_'):
         ref_code = data.replace('confirm_bank_', '')
         user_id = query.from_user.id
-        
-        try:
-            # Retrieve cart data and total from context
-            cart_data = context.user_data.get('checkout_cart_data')
-            total = context.user_data.get('checkout_total')
 
-            if not cart_data or not total:
-                await query.edit_message_text("⚠️ Your cart data is missing. Please try checking out again.")
-                return
+        # Retrieve cart data and total from context
+        cart_data = context.user_data.get('checkout_cart_data')
+        total = context.user_data.get('checkout_total')
+
+        if not cart_data or not total:
+            await query.edit_message_text("⚠️ Your cart data is missing. Please try checking out again.")
+            return
+
+        # Create Transaction/Order
+        order_data = {
+            "userId": user_id,
+            "items": cart_data, # it's already a list of items from /api/cart/user_id
+            "totalAmount": total,
+            "paymentMethod": "Bank Transfer",
+            "paymentRef": ref_code,
+            "outletId": "imo-central" # Default
+        }
+
+        # Acknowledge first: a checkout worker places the order and turns this
+        # message into the receipt once it is committed
+        await query.edit_message_text(
+            "⏳ *PAYMENT NOTED*\n\n"
+            f"Receipt Reference: `{ref_code}`\n\n"
+            "Placing your order, this message will update in a moment...",
+            parse_mode='Markdown'
+        )
+        receipt = bank_receipt_updater(context.bot, query.message.chat_id, query.message.message_id, user_id, ref_code)
+        try:
+            checkouts.submit(f"checkout:{ref_code}", order_data, receipt)
+        except asyncio.QueueFull:
+            keyboard = [[InlineKeyboardButton("✅ I've Paid", callback_data=f"confirm_bank_{ref_code}")]]
+            await query.edit_message_text("⚠️ We're placing a lot of orders right now. Please tap again in a moment.", reply_markup=InlineKeyboardMarkup(keyboard))
 
-            # Create Transaction/Order
-            order_data = {
-                "userId": user_id,
-                "items": cart_data, # it's already a list of items from /api/cart/user_id
-                "totalAmount": total,
-                "paymentMethod": "Bank Transfer",
-                "paymentRef": ref_code,
-                "outletId": "imo-central" # Default
-            }
-            
-            res = smart_request("POST", "/checkout", json=order_data)
-            if res.status_code == 201:
-                msg = (
-                    "✅ *PAYMENT CONFIRMED & ORDER PLACED*\n\n"
-                    f"Receipt Reference: `{ref_code}`\n\n"
-                    "Receipt initiated! You can view and print your receipt in the shopper dashboard.\n\n"
-                    "🕐 Our staff will verify the transfer and prepare your items for pickup."
-                )
-                keyboard = [[InlineKeyboardButton("📜 View Digital Receipt", web_app=WebAppInfo(url=f"{WEB_APP_URL}/history"))]]
-                await query.edit_message_text(msg, parse_mode='Markdown', reply_markup=InlineKeyboardMarkup(keyboard))
-            else:
-                raise Exception(f"Server returned {res.status_code}")
-            
-        except Exception as e:
-            print(f"Checkout Error: {e}")
-            await query.edit_message_text("⚠️ Error processing your receipt. Please contact support.")
-    
-        user_id = query.from_user.id
-        smart_request("POST", "/cart/clear", json={"userId": user_id})
-        await query.edit_message_text("🗑️ Cart cleared!")
-    
     elif data == 'admin_stats':
         try:
-            res = smart_request("GET", "/admin/stats", headers={'x-admin-username': 'origichidiah'}).json()
+            res = (await smart_request("GET", "/admin/stats", params={"days": 7, "top": 3}, headers={'x-admin-username': 'origichidiah'})).json()
             msg = (
                 "📊 *REAL-TIME ANALYTICS*\n\n"
                 f"💰 Total Sales: ₦{res['totalSales']:,}\n"
@@ -538,6 +946,15 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 f"👤 Users: {res['userCount']}\n"
                 f"🛠️ Staff: {res['staffCount']}"
             )
+            if 'today' in res:
+                msg += (
+                    f"\n\n📅 Today: ₦{res['today']['sales']:,} ({res['today']['orders']} orders)\n"
+                    f"🗓️ Last {res['window']['days']} days: ₦{res['window']['sales']:,} ({res['window']['orders']} orders)"
+                )
+            if res.get('outlets'):
+                msg += "\n\n🏬 *By outlet:*\n" + "\n".join(f"• {o['name']}: ₦{o['sales']:,}" for o in res['outlets'][:5])
+            if res.get('topProducts'):
+                msg += "\n\n🔥 *Top sellers:*\n" + "\n".join(f"• {p['name']} x{p['quantity']}" for p in res['topProducts'])
             await query.edit_message_text(msg, parse_mode='Markdown', reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Back to Admin", callback_data="back_admin")]]))
         except:
             await query.edit_message_text("⚠️ Error fetching analytics.")
@@ -553,12 +970,59 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif data == 'staff_stock':
         await query.edit_message_text("🔍 To check stock, please send the **Barcode** or **Name** of the item you're looking for.")
         context.user_data['searching_stock'] = True
-    elif data == 'staff_orders':
-        await query.edit_message_text("📜 *RECENT ORDERS*\nFetching last 5 transactions...", parse_mode='Markdown')
-        # Logic to fetch and display orders could be added here
+    elif data.startswith('stock_page_'):
+        page = int(data.split('_')[2])
+        stock_query = context.user_data.get('stock_query')
+        msg, markup = render_stock_results(stock_query, page) if stock_query else (None, None)
+        if msg:
+            await query.edit_message_text(msg, parse_mode='Markdown', reply_markup=markup)
+        else:
+            await query.edit_message_text("⌛ This search has expired. Tap *Check Product Stock* to search again.", parse_mode='Markdown')
+    elif data == 'staff_orders' or data.startswith(('orders_before_', 'orders_after_')):
+        cursor = int(data.rsplit('_', 1)[1]) if data != 'staff_orders' else None
+        try:
+            msg, markup = await render_orders_page(
+                query.from_user.username,
+                before=cursor if data.startswith('orders_before_') else None,
+                after=cursor if data.startswith('orders_after_') else None
+            )
+        except Exception as e:
+            logging.error(f"Orders feed error: {e}")
+            msg, markup = "⚠️ Error fetching orders.", None
+        await query.edit_message_text(msg, parse_mode='Markdown', reply_markup=markup)
+
+def bank_receipt_updater(bot, chat_id, message_id, user_id, ref_code):
+    """Checkout-worker callback that turns the "payment noted" message into the receipt (or an error)."""
+    async def update_receipt(res, error):
+        if res is not None and res.status_code in (200, 201):
+            result = res.json()
+            if result.get('replayed'):
+                # The order was placed earlier; cartVersion is the cart as it is now, which may have items again
+                carts.invalidate(user_id)
+            else:
+                carts.apply_clear(user_id, result.get('cartVersion'))
+            msg = (
+                "✅ *PAYMENT CONFIRMED & ORDER PLACED*\n\n"
+                f"Receipt Reference: `{ref_code}`\n\n"
+                "Receipt initiated! You can view and print your receipt in the shopper dashboard.\n\n"
+                "🕐 Our staff will verify the transfer and prepare your items for pickup."
+            )
+            keyboard = [[InlineKeyboardButton("📜 View Digital Receipt", web_app=WebAppInfo(url=f"{WEB_APP_URL}/history"))]]
+            await bot.edit_message_text(msg, chat_id=chat_id, message_id=message_id, parse_mode='Markdown', reply_markup=InlineKeyboardMarkup(keyboard))
+            return
+        logging.error(f"Checkout Error: {error or f'Server returned {res.status_code}'}")
+        carts.invalidate(user_id)
+        # Tapping again is safe: the same reference never places a second order
+        keyboard = [[InlineKeyboardButton("🔄 Try Again", callback_data=f"confirm_bank_{ref_code}")]] if res is None else []
+        await bot.edit_message_text(
+            "⚠️ Error processing your receipt. Please contact support.",
+            chat_id=chat_id, message_id=message_id, reply_markup=InlineKeyboardMarkup(keyboard) if keyboard else None
+        )
+    return update_receipt
 
 # --- Admin & Staff Command Handlers ---
 
+@instrumented("admin_menu")
 async def admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     if user.username != 'origichidiah':
@@ -580,18 +1044,118 @@ async def admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     await update.message.reply_text(msg, parse_mode='Markdown', reply_markup=InlineKeyboardMarkup(keyboard))
 
+@instrumented("backend_diagnostics")
+async def backend_diagnostics(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    if user.username != 'origichidiah':
+        await update.message.reply_text("⛔ *Access Denied:* This command is reserved for the Super Admin.")
+        return
+
+    msg = "🩺 *BACKEND ROUTING*\n\n"
+    for h in backend.health_snapshot():
+        icon = {'closed': '🟢', 'half_open': '🟡', 'open': '🔴'}[h['state']]
+        latency = f"{h['latencyMs']}ms" if h['latencyMs'] is not None else "n/a"
+        msg += (
+            f"{icon} `{h['baseUrl']}`\n"
+            f"State: {h['state']} | Latency: {latency}\n"
+            f"OK: {h['successes']} | Failed: {h['failures']}\n\n"
+        )
+    sc = session_cache.stats()
+    msg += f"🔐 *Session cache:* {sc['size']} users | hit rate {sc['hitRate']:.0%} ({sc['hits']}/{sc['hits'] + sc['misses']})\n"
+    ct = carts.stats()
+    msg += f"🛒 *Cart cache:* {ct['users']} carts | {ct['zeroTripRate']:.0%} reads with no round trip | {ct['conflicts']} conflicts\n"
+    st = staff_roster.stats()
+    msg += f"🛠️ *Staff roles:* {st['users']} users | {st['zeroTripRate']:.0%} checks with no round trip | {st['changes']} roster changes\n"
+    cs = catalog.stats()
+    msg += f"📦 *Catalog mirror:* {cs['products']} products | age {cs['ageSeconds']}s | {'fresh' if cs['fresh'] else 'STALE'}\n"
+    sf = singleflight.stats()
+    msg += f"🔀 *Coalesced GETs:* {sf['savedRate']:.0%} saved | {sf['flights']} sent for {sf['requests']} ({sf['shared']} shared, {sf['cached']} cached)\n"
+    ck = checkouts.stats()
+    msg += f"🧾 *Checkouts:* {ck['placed']} placed | {ck['replayed'] + ck['duplicates']} duplicates absorbed | {ck['failed']} failed | {ck['pending']} pending\n"
+    ph = photo_decoder.stats()
+    if ph['available']:
+        msg += f"📷 *Photo scans:* {ph['found']}/{ph['decoded']} read | {ph['cached']} cached | avg {ph['avgDecodeMs']}ms on {ph['workers']} workers | {ph['rejected']} turned away\n"
+    rs = recommender.stats()
+    msg += f"💡 *Recommendations:* {rs['items']} items from {rs['baskets']} orders"
+    if context.bot.rate_limiter:
+        ss = context.bot.rate_limiter.stats()
+        msg += (
+            f"\n📤 *Outbound:* {ss['sent']} sent | {ss['coalesced']} edits coalesced | {ss['floodWaits']} flood waits\n"
+            f"Queued: {ss['queued']['interactive']} interactive, {ss['queued']['background']} background | "
+            f"wait avg {ss['avgWaitMs']}ms, max {ss['maxWaitMs']}ms"
+        )
+    if context.application.persistence:
+        ps = context.application.persistence.stats()
+        msg += f"\n💾 *Persistence:* {ps['flushes']} flushes | {ps['rowsWritten']} rows | avg {ps['avgFlushMs']}ms"
+    await update.message.reply_text(msg, parse_mode='Markdown')
+
+@instrumented("handle_document")
 async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     if user.username != 'origichidiah': return
-    await update.message.reply_text("📦 *Bulk Upload:* Temporarily disabled for performance optimization. Please use the web dashboard.")
 
+    # Only needed for the occasional bulk upload, so kept off the startup path
+    import tempfile
+    from importer import SUPPORTED_EXTENSIONS, import_products, iter_rows
+
+    doc = update.message.document
+    filename = doc.file_name or ""
+    if not filename.lower().endswith(SUPPORTED_EXTENSIONS):
+        await update.message.reply_text("📦 *Bulk Upload:* Please send a `.csv`, `.xlsx` or `.json` file.", parse_mode='Markdown')
+        return
+    if doc.file_size and doc.file_size > MAX_UPLOAD_BYTES:
+        await update.message.reply_text("📦 *Bulk Upload:* Files over 20 MB can't be sent to a bot. Please split the file or use the web dashboard.", parse_mode='Markdown')
+        return
+
+    status = await update.message.reply_text(f"📦 *Bulk Upload:* Downloading `{filename}`...", parse_mode='Markdown')
+    last_edit = 0.0
+
+    async def report(progress, done=False):
+        nonlocal last_edit
+        # Telegram rate-limits edits; one every couple of seconds is plenty
+        if not done and time.monotonic() - last_edit < 2:
+            return
+        last_edit = time.monotonic()
+        msg = (
+            f"📦 *Bulk Upload {'Complete' if done else 'in progress'}* ({progress.elapsed:.0f}s)\n\n"
+            f"📄 Rows read: {progress.rows:,}\n"
+            f"✅ Added: {progress.added:,} | 🔄 Updated: {progress.updated:,}\n"
+            f"⏭️ Skipped: {progress.skipped:,}"
+        )
+        if progress.failed_batches:
+            msg += f"\n⚠️ Failed batches: {progress.failed_batches}"
+        if done and progress.errors:
+            msg += "\n\n*First problems:*\n" + "\n".join(f"• Row {n}: {reason}" for n, reason in progress.errors)
+        # Progress reports wait behind shoppers' replies
+        background = {"rate_limit_args": LANE_BACKGROUND} if context.bot.rate_limiter else {}
+        try:
+            await context.bot.edit_message_text(msg, chat_id=status.chat_id, message_id=status.message_id, parse_mode='Markdown', **background)
+        except Exception as e:
+            logging.warning(f"Bulk upload progress edit failed: {e}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "upload")
+        try:
+            tg_file = await doc.get_file()
+            await tg_file.download_to_drive(custom_path=path)
+            progress = await import_products(
+                iter_rows(path, filename),
+                smart_request,
+                batch_size=BULK_IMPORT_BATCH_SIZE,
+                on_progress=report,
+                headers={'x-admin-username': user.username}
+            )
+            await report(progress, done=True)
+        except Exception as e:
+            logging.error(f"Bulk upload failed for {filename}: {e}")
+            await status.edit_text(f"⚠️ *Bulk Upload failed:* {e}", parse_mode='Markdown')
+
+@instrumented("staff_menu")
 async def staff_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     try:
-        # Check backend for staff role
-        res = smart_request("GET", "/admin/staff", headers={'x-admin-username': 'origichidiah'}) # Using super admin to fetch list
-        staff_list = res.json()
-        is_staff = any(s['username'] == user.username for s in staff_list) or user.username == 'origichidiah'
+        # Check the user's staff role (cached, revalidated against the roster version)
+        is_staff = await staff_roster.role(user.username) is not None or user.username == 'origichidiah'
         
         if not is_staff:
             await update.message.reply_text("🚫 *Access Denied:* You are not registered as a staff member.")
@@ -616,7 +1180,67 @@ async def staff_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 def log_info(msg):
     logging.info(msg)
-    print(msg)
+
+async def bind_log_context(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    bind_update(update)
+
+def build_send_scheduler():
+    return SendScheduler(
+        overall_rate=TELEGRAM_OVERALL_RATE,
+        overall_burst=TELEGRAM_OVERALL_BURST,
+        chat_rate=TELEGRAM_CHAT_RATE,
+        chat_burst=TELEGRAM_CHAT_BURST,
+        group_rate=TELEGRAM_GROUP_RATE
+    )
+
+def build_application(bot=None, persistence=None):
+    """
+    The Application with every handler registered. Talks to Telegram with
+    TOKEN through the outbound SendScheduler unless a `bot` is given
+    (diagnose_bot.py's offline benchmarks pass one that never leaves the
+    process, with or without a scheduler).
+    """
+    builder = (
+        ApplicationBuilder()
+        .concurrent_updates(OrderedUpdateProcessor(MAX_CONCURRENT_UPDATES))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if bot is not None:
+        builder = builder.bot(bot)
+    else:
+        builder = builder.token(TOKEN).rate_limiter(build_send_scheduler())
+    if persistence:
+        builder = builder.persistence(persistence)
+    application = builder.build()
+
+    # Registration Handler
+    reg_handler = ConversationHandler(
+        entry_points=[CommandHandler('start', start)],
+        states={
+            REG_NAME: [MessageHandler(filters.TEXT & ~(filters.COMMAND), reg_name)],
+            REG_PHONE: [MessageHandler(filters.TEXT & ~(filters.COMMAND), reg_phone)],
+            REG_EMAIL: [MessageHandler(filters.TEXT & ~(filters.COMMAND), reg_email)],
+            LOGIN_CODE: [MessageHandler(filters.Regex(r'^\d{6}$'), handle_login)]
+        },
+        fallbacks=[CommandHandler('start', start)],
+        name="registration",
+        persistent=persistence is not None
+    )
+
+    application.add_handler(TypeHandler(Update, bind_log_context), group=-1)
+    application.add_handler(reg_handler)
+    application.add_handler(CommandHandler('ping', ping))
+    application.add_handler(CommandHandler('logout', logout))
+    application.add_handler(CommandHandler('admin', admin_menu))
+    application.add_handler(CommandHandler('staff', staff_menu))
+    application.add_handler(CommandHandler('diag', backend_diagnostics))
+    application.add_handler(MessageHandler(filters.StatusUpdate.WEB_APP_DATA, handle_web_app_data))
+    application.add_handler(MessageHandler(filters.PHOTO, handle_photo))
+    application.add_handler(CallbackQueryHandler(button_handler))
+    application.add_handler(MessageHandler(filters.Document.ALL, handle_document))
+    application.add_handler(MessageHandler(filters.TEXT & ~(filters.COMMAND), handle_text_messages))
+    return application
 
 if __name__ == '__main__':
     log_info("--- Bot Process Started ---")
@@ -625,38 +1249,27 @@ if __name__ == '__main__':
     log_info(f"API_BASE: {API_BASE}")
     
     try:
-        application = ApplicationBuilder().token(TOKEN).build()
-        
-        # Registration Handler
-        reg_handler = ConversationHandler(
-            entry_points=[CommandHandler('start', start)],
-            states={
-                REG_NAME: [MessageHandler(filters.TEXT & ~(filters.COMMAND), reg_name)],
-                REG_PHONE: [MessageHandler(filters.TEXT & ~(filters.COMMAND), reg_phone)],
-                REG_EMAIL: [MessageHandler(filters.TEXT & ~(filters.COMMAND), reg_email)],
-                LOGIN_CODE: [MessageHandler(filters.Regex(r'^\d{6}$'), handle_login)]
-            },
-            fallbacks=[CommandHandler('start', start)]
-        )
-        
-        application.add_handler(reg_handler)
-        application.add_handler(CommandHandler('ping', ping))
-        application.add_handler(CommandHandler('admin', admin_menu))
-        application.add_handler(CommandHandler('staff', staff_menu))
-        application.add_handler(MessageHandler(filters.StatusUpdate.WEB_APP_DATA, handle_web_app_data))
-        application.add_handler(CallbackQueryHandler(button_handler))
-        application.add_handler(MessageHandler(filters.Document.ALL, handle_document))
-        application.add_handler(MessageHandler(filters.TEXT & ~(filters.COMMAND), handle_text_messages))
+        persistence = SQLitePersistence(PERSISTENCE_PATH, update_interval=PERSISTENCE_FLUSH_INTERVAL) if PERSISTENCE_PATH else None
+        application = build_application(persistence=persistence)
         
-        print("Priceless Secure Bot is LIVE and preparing to start polling...")
-        
-        # ⏱️ Slight delay to ensure the backend web server has bound to the port first
-        print("Waiting 10 seconds for backend initialization...")
-        time.sleep(10)
-        
-        print("Bot is starting polling now.")
-        application.run_polling()
+        log_info("Priceless Secure Bot is LIVE and waiting for the backend...")
+        ready, attempts, waited = wait_until_ready([LOCAL_API_URL, API_URL], deadline=BACKEND_READY_TIMEOUT)
+        startup_backend_wait = waited
+        if ready:
+            log_info(f"Backend ready after {waited * 1000:.0f}ms ({attempts} attempts)")
+        else:
+            log_info(f"Backend not ready after {waited:.0f}s; starting anyway, requests will fail over")
+
+        if WEBHOOK_URL:
+            log_info(f"Bot is starting in webhook mode on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}{WEBHOOK_PATH}.")
+            asyncio.run(run_webhook(
+                application, WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH,
+                secret=WEBHOOK_SECRET, max_backlog=WEBHOOK_MAX_BACKLOG
+            ))
+        else:
+            log_info("Bot is starting polling now.")
+            application.run_polling()
     except Exception as e:
-        print(f"CRITICAL BOT ERROR: {e}")
+        logging.critical(f"CRITICAL BOT ERROR: {e}", exc_info=True)
         # Keep process alive so Render doesn't loop forever, but logged error is clear
         time.sleep(3600)
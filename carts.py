@@ -0,0 +1,118 @@
+import time
+
+from caches import TTLCache
+
+
+def _parse_version(version):
+    """'<epoch>:<n>' -> (epoch, n), or None if missing/garbled."""
+    try:
+        epoch, n = str(version).rsplit(":", 1)
+        return epoch, int(n)
+    except (TypeError, ValueError):
+        return None
+
+
+def _follows(new, old):
+    """True if cart version `new` is the very next change after `old`."""
+    new, old = _parse_version(new), _parse_version(old)
+    return new is not None and old is not None and new[0] == old[0] and new[1] == old[1] + 1
+
+
+class CartEntry:
+    __slots__ = ("version", "items", "validated_at")
+
+    def __init__(self, version, items, validated_at):
+        self.version = version
+        self.items = items
+        self.validated_at = validated_at
+
+
+class CartCache:
+    """
+    Per-user copy of the backend cart, kept current write-through.
+
+    The bot's own writes (add / clear / checkout) are applied locally from
+    the backend's response, which carries the cart's new version. An add is
+    only applied if that version directly follows the cached one; otherwise
+    something else (the web app, another device) changed the cart in
+    between and the entry is dropped. Reads within `fresh_for` seconds of
+    the last validation cost no round trip; older entries are revalidated
+    with If-None-Match, which is a bodiless 304 when nothing changed.
+    Checkout always revalidates.
+    """
+
+    def __init__(self, request, fresh_for=15.0, maxsize=10000, retention=1800.0, clock=time.monotonic):
+        self.request = request
+        self.fresh_for = fresh_for
+        self.clock = clock
+        self.entries = TTLCache(maxsize=maxsize, ttl=retention, clock=clock)
+        self.fresh_hits = 0
+        self.revalidated = 0
+        self.fetched = 0
+        self.applied = 0
+        self.conflicts = 0
+
+    async def load(self, user_id, revalidate=False):
+        """The user's cart items, from cache when fresh, else from the backend."""
+        entry = self.entries.get(user_id)
+        now = self.clock()
+        if entry is not None and not revalidate and now - entry.validated_at <= self.fresh_for:
+            self.fresh_hits += 1
+            return entry.items
+
+        headers = {"If-None-Match": f'"{entry.version}"'} if entry is not None and entry.version else None
+        res = await self.request("GET", f"/cart/{user_id}", headers=headers)
+        if res.status_code == 304 and entry is not None:
+            entry.validated_at = self.clock()
+            self.revalidated += 1
+            return entry.items
+        if res.status_code != 200:
+            raise RuntimeError(f"cart fetch returned {res.status_code}")
+        items = res.json()
+        self.fetched += 1
+        self.entries.set(user_id, CartEntry(res.headers.get("ETag", "").strip('"') or None, items, self.clock()))
+        return items
+
+    def apply_add(self, user_id, result):
+        """Fold a /cart/add response into the cached cart."""
+        entry = self.entries.get(user_id)
+        version, item = result.get("cartVersion"), result.get("item")
+        if entry is None:
+            return
+        if item is None or not _follows(version, entry.version):
+            self.conflicts += 1
+            self.entries.invalidate(user_id)
+            return
+        barcode = str(item.get("barcode", "")).strip()
+        items = [i for i in entry.items if str(i.get("barcode", "")).strip() != barcode]
+        position = next((n for n, i in enumerate(entry.items) if str(i.get("barcode", "")).strip() == barcode), len(items))
+        items.insert(position, item)
+        self.entries.set(user_id, CartEntry(version, items, self.clock()))
+        self.applied += 1
+
+    def apply_snapshot(self, user_id, items, version):
+        """The backend says the cart is exactly `items` as of `version`."""
+        if version is None:
+            self.entries.invalidate(user_id)
+            return
+        self.entries.set(user_id, CartEntry(version, items, self.clock()))
+        self.applied += 1
+
+    def apply_clear(self, user_id, version):
+        """The cart is empty as of `version` (after /cart/clear or checkout)."""
+        self.apply_snapshot(user_id, [], version)
+
+    def invalidate(self, user_id):
+        self.entries.invalidate(user_id)
+
+    def stats(self):
+        reads = self.fresh_hits + self.revalidated + self.fetched
+        return {
+            "users": len(self.entries),
+            "freshHits": self.fresh_hits,
+            "revalidated": self.revalidated,
+            "fetched": self.fetched,
+            "zeroTripRate": round(self.fresh_hits / reads, 3) if reads else 0.0,
+            "applied": self.applied,
+            "conflicts": self.conflicts
+        }
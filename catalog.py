@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import time
+
+
+class CatalogMirror:
+    """
+    Resident copy of the product catalog, keyed by barcode with a per-category
+    index on the side.
+
+    It is kept in sync with `/products/changes`: the first call returns the
+    full catalog plus a cursor, later calls send the cursor back and only get
+    the products added/updated/deleted since then (or a bare 304 when nothing
+    changed). `request` is the bot's `smart_request` coroutine.
+
+    Secondary indexes (e.g. the stock search index) can `subscribe` to be
+    told about every add/remove; they must provide add(product),
+    discard(barcode) and clear().
+    """
+
+    def __init__(self, request, max_staleness=300.0, clock=time.monotonic):
+        self.request = request
+        self.max_staleness = max_staleness
+        self.clock = clock
+        self.by_barcode = {}
+        self.by_category = {}  # category -> {barcode: product}, a dict doubles as an ordered set
+        self.cursor = None
+        self.last_sync = None
+        self.refreshes = 0
+        self.full_syncs = 0
+        self.listeners = []
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+        for product in self.by_barcode.values():
+            listener.add(product)
+
+    # --- Lookups ---
+
+    def get(self, barcode):
+        return self.by_barcode.get(str(barcode).strip())
+
+    def in_category(self, category):
+        return self.by_category.get(category, {})
+
+    def is_fresh(self):
+        return self.last_sync is not None and self.clock() - self.last_sync <= self.max_staleness
+
+    def __len__(self):
+        return len(self.by_barcode)
+
+    # --- Mutations ---
+
+    def upsert(self, product):
+        barcode = str(product.get('barcode', '')).strip()
+        if not barcode:
+            return
+        self.remove(barcode)
+        self.by_barcode[barcode] = product
+        self.by_category.setdefault(product.get('category'), {})[barcode] = product
+        for listener in self.listeners:
+            listener.add(product)
+
+    def remove(self, barcode):
+        old = self.by_barcode.pop(barcode, None)
+        if old is None:
+            return
+        members = self.by_category.get(old.get('category'))
+        if members is not None:
+            members.pop(barcode, None)
+            if not members:
+                del self.by_category[old.get('category')]
+        for listener in self.listeners:
+            listener.discard(barcode)
+
+    def replace_all(self, products):
+        self.by_barcode = {}
+        self.by_category = {}
+        for listener in self.listeners:
+            listener.clear()
+        for p in products:
+            self.upsert(p)
+
+    # --- Sync ---
+
+    async def refresh(self):
+        params = {"since": self.cursor} if self.cursor else None
+        res = await self.request("GET", "/products/changes", params=params)
+        if res.status_code == 304:
+            self.last_sync = self.clock()
+            return
+        if res.status_code != 200:
+            raise RuntimeError(f"catalog sync returned {res.status_code}")
+
+        data = res.json()
+        if data.get('full'):
+            self.replace_all(data.get('products', []))
+            self.full_syncs += 1
+        else:
+            for p in data.get('products', []):
+                self.upsert(p)
+            for barcode in data.get('deleted', []):
+                self.remove(barcode)
+        self.cursor = data.get('cursor')
+        self.last_sync = self.clock()
+        self.refreshes += 1
+
+    async def run(self, interval):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"[Catalog] Refresh failed: {e!r}")
+            await asyncio.sleep(interval)
+
+    def stats(self):
+        return {
+            "products": len(self.by_barcode),
+            "categories": len(self.by_category),
+            "fresh": self.is_fresh(),
+            "ageSeconds": round(self.clock() - self.last_sync, 1) if self.last_sync is not None else None,
+            "refreshes": self.refreshes,
+            "fullSyncs": self.full_syncs
+        }
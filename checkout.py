@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import time
+
+from metrics import REGISTRY
+
+QUEUE_DEPTH = REGISTRY.gauge("bot_checkout_queue_depth", "Checkouts waiting for a worker.")
+CHECKOUT_SECONDS = REGISTRY.histogram("bot_checkout_seconds", "Time from a checkout being submitted to the backend's answer.")
+CHECKOUTS = REGISTRY.counter("bot_checkouts_total", "Checkouts by outcome (placed/replayed/rejected/failed).", ("outcome",))
+
+
+class CheckoutJob:
+    __slots__ = ("key", "order", "on_result", "submitted")
+
+    def __init__(self, key, order, on_result, submitted):
+        self.key = key
+        self.order = order
+        self.on_result = on_result  # async (response or None, error or None)
+        self.submitted = submitted
+
+
+class CheckoutQueue:
+    """
+    Places orders from background workers, so a payment callback can answer
+    the shopper at once instead of holding the update until `/checkout`
+    returns.
+
+    Every job carries an idempotency key, sent as the Idempotency-Key
+    header; the backend answers a key it has already seen with the order it
+    placed then. That makes retries safe: a network error or 5xx is retried
+    up to `max_attempts` times with doubling backoff, and a shopper tapping
+    the button again while the first job is pending adds nothing. When the
+    backend answers (or the attempts run out), the job's `on_result` is
+    awaited with the response or the last error.
+
+    `request` is the bot's `smart_request` coroutine.
+    """
+
+    def __init__(self, request, workers=2, max_attempts=4, backoff=1.0, maxsize=1000, clock=time.monotonic):
+        self.request = request
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.clock = clock
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self._pending = {}  # key -> CheckoutJob queued or in flight
+        self.submitted = 0
+        self.duplicates = 0
+        self.retries = 0
+        self.outcomes = {"placed": 0, "replayed": 0, "rejected": 0, "failed": 0}
+
+    def submit(self, key, order, on_result):
+        """
+        Queue an order. False if one with this key is already pending (its
+        `on_result` will answer); raises asyncio.QueueFull when saturated.
+        """
+        if key in self._pending:
+            self.duplicates += 1
+            return False
+        job = CheckoutJob(key, order, on_result, self.clock())
+        self._queue.put_nowait(job)
+        self._pending[key] = job
+        self.submitted += 1
+        QUEUE_DEPTH.inc()
+        return True
+
+    async def run(self):
+        await asyncio.gather(*(self._work() for _ in range(self.workers)))
+
+    async def join(self):
+        """Wait until every submitted checkout has been answered."""
+        await self._queue.join()
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            QUEUE_DEPTH.dec()
+            try:
+                await self._place(job)
+            finally:
+                self._pending.pop(job.key, None)
+                self._queue.task_done()
+
+    async def _place(self, job):
+        res = error = None
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                res = await self.request("POST", "/checkout", json=job.order, headers={"Idempotency-Key": job.key})
+            except Exception as e:
+                res, error = None, e
+            else:
+                if res.status_code < 500:
+                    error = None
+                    break
+                error = RuntimeError(f"checkout returned {res.status_code}")
+            if attempt < self.max_attempts:
+                self.retries += 1
+                logging.warning(f"[Checkout] {job.key} attempt {attempt} failed ({error}), retrying")
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+
+        if error is not None:
+            outcome = "failed"
+        elif res.status_code in (200, 201):
+            outcome = "replayed" if res.status_code == 200 else "placed"
+        else:
+            outcome = "rejected"
+        self.outcomes[outcome] += 1
+        CHECKOUTS.inc((outcome,))
+        CHECKOUT_SECONDS.observe((), self.clock() - job.submitted)
+        try:
+            await job.on_result(res if error is None else None, error)
+        except Exception as e:
+            logging.error(f"[Checkout] Reporting {job.key} failed: {e}")
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "pending": len(self._pending),
+            "submitted": self.submitted,
+            "duplicates": self.duplicates,
+            "retries": self.retries,
+            **self.outcomes
+        }
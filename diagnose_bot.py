@@ -1,14 +1,64 @@
+"""
+Telegram bot diagnostics.
+
+    python diagnose_bot.py [live]
+    python diagnose_bot.py bench [--shoppers 50] [--rounds 2] [--latency 20] [--failure-rate 0]
+                                 [--scenarios shop,admin] [--json out.json] [--compare baseline.json]
+
+`live` (the default) checks the token with getMe and clears any webhook on
+the real Telegram API.
+
+`bench` never leaves the process. It builds the bot's real Application
+(bot.build_application) on a fake Telegram connection and points its backend
+client at an in-process stub of backend/index.js, then plays scripted
+scenarios through the real handlers with --shoppers virtual shoppers at
+once, each running the script --rounds times:
+
+  registration   /start, name, phone, email, /start again (new users)
+  shop           /start, --scans scans each followed by "Add to Cart",
+                 view cart, checkout, bank transfer, "I've Paid"
+  staff          /staff, "View Recent Orders", older orders, /staff,
+                 "Check Product Stock", a name search, next page
+  admin          /admin, analytics, back to the console
+
+The stub answers after --latency +/- --jitter ms and fails --failure-rate
+of calls with a connection error; each Telegram call costs --telegram ms.
+Sends skip the outbound rate limiter unless --rate-limit is given (shoppers
+here have no think time, so it would mostly measure Telegram's limits).
+Updates go through the Application's update processor exactly as polled or
+webhook updates do. Per scenario it reports runs and updates per second,
+per-update latency percentiles, backend and Telegram calls per run (with a
+per-route breakdown), failed runs and handler errors. --json saves the
+results; --compare checks them against a saved run and exits non-zero when
+a scenario got slower, chattier or less reliable than --tolerance allows.
+"""
+import argparse
+import asyncio
+import json
+import logging
 import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import httpx
 import requests
 from dotenv import load_dotenv
+from telegram import Update
+from telegram.ext import ExtBot
+from telegram.request import BaseRequest
+
+from benchmarks._common import ADMIN_USERNAME, SERVICE_TOKEN, STAFF_USERNAME, StubBackend, percentile
 
 load_dotenv()
 
 # Fallback token if not in env
 TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "8572310430:AAG_PxjRMAiAFWtLN0f7SfD4yEWD5l3qnas")
 
-print(f"--- Telegram Bot Diagnostic ---")
-print(f"Token (First 10 chars): {TOKEN[:10]}...")
+SCENARIOS = ("registration", "shop", "staff", "admin")
+BENCH_BOT_ID = 999000
 
 def test_token():
     url = f"https://api.telegram.org/bot{TOKEN}/getMe"
@@ -36,6 +86,364 @@ def clear_webhook():
     except Exception as e:
         print(f"[ERROR] Error deleting webhook: {e}")
 
-if __name__ == "__main__":
+def live():
+    print(f"--- Telegram Bot Diagnostic ---")
+    print(f"Token (First 10 chars): {TOKEN[:10]}...")
     test_token()
     clear_webhook()
+
+# --- Offline benchmark ---
+
+class FakeTelegramRequest(BaseRequest):
+    """
+    Bot API connection that never leaves the process: every call costs
+    `latency` ms and succeeds. Sent messages come back as Message objects so
+    the handlers' edits and replies work; the last inline keyboard sent to
+    each chat is kept for the virtual shoppers to tap.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.keyboards = {}  # chat id -> callback_data of the last inline keyboard
+        self.texts = {}      # chat id -> text of the last message sent or edited
+        self.warnings = 0    # "⚠️ ..." replies: a handler caught an error
+        self.message_ids = 0
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def reset_counts(self):
+        self.calls.clear()
+        self.warnings = 0
+
+    async def do_request(self, url, method, request_data=None, **timeouts):
+        endpoint = url.rsplit('/', 1)[1]
+        self.calls[endpoint] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency / 1000)
+        params = request_data.parameters if request_data else {}
+        result = self._result(endpoint, params)
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+    def _result(self, endpoint, params):
+        if endpoint == "getMe":
+            return {"id": BENCH_BOT_ID, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        if endpoint not in ("sendMessage", "editMessageText"):
+            return True
+        chat_id = int(params['chat_id'])
+        text = params.get('text', '')
+        self.texts[chat_id] = text
+        if text.startswith("⚠️"):
+            self.warnings += 1
+        markup = params.get('reply_markup') or {}
+        self.keyboards[chat_id] = [
+            button['callback_data']
+            for row in markup.get('inline_keyboard', [])
+            for button in row if 'callback_data' in button
+        ]
+        self.message_ids += 1
+        return {
+            "message_id": params.get('message_id', self.message_ids), "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": BENCH_BOT_ID, "is_bot": True, "first_name": "Bench"}, "text": text
+        }
+
+class ScenarioError(Exception):
+    pass
+
+class Shopper:
+    """One virtual user: builds raw updates and feeds them through the Application one at a time."""
+
+    update_ids = 0
+
+    def __init__(self, application, telegram, backend, user_id, username=None):
+        self.application = application
+        self.telegram = telegram
+        self.backend = backend
+        self.user = {"id": user_id, "is_bot": False, "first_name": f"Shopper {user_id}"}
+        if username:
+            self.user["username"] = username
+        self.chat = {"id": user_id, "type": "private"}
+        self.latencies = []
+        self.message_id = 0
+
+    async def _send(self, raw):
+        Shopper.update_ids += 1
+        raw["update_id"] = Shopper.update_ids
+        update = Update.de_json(raw, self.application.bot)
+        started = time.perf_counter()
+        await self.application.update_processor.process_update(update, self.application.process_update(update))
+        self.latencies.append(time.perf_counter() - started)
+
+    def _message(self, **fields):
+        self.message_id += 1
+        return {"message_id": self.message_id, "date": int(time.time()), "chat": self.chat, "from": self.user, **fields}
+
+    async def command(self, text):
+        await self._send({"message": self._message(text=text, entities=[{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}])})
+
+    async def text(self, text):
+        await self._send({"message": self._message(text=text)})
+
+    async def web_app_data(self, data):
+        await self._send({"message": self._message(web_app_data={"data": data, "button_text": "📸 Scan Item"})})
+
+    async def tap(self, prefix):
+        """Tap the first button of the last inline keyboard whose callback data starts with `prefix`."""
+        data = next((d for d in self.telegram.keyboards.get(self.user["id"], []) if d.startswith(prefix)), None)
+        if data is None:
+            raise ScenarioError(f"no {prefix!r} button after {self.telegram.texts.get(self.user['id'], '')[:60]!r}")
+        message = {
+            "message_id": self.message_id, "date": int(time.time()), "chat": self.chat,
+            "from": {"id": BENCH_BOT_ID, "is_bot": True, "first_name": "Bench"}, "text": "..."
+        }
+        await self._send({"callback_query": {
+            "id": str(Shopper.update_ids), "from": self.user, "chat_instance": str(self.user["id"]),
+            "message": message, "data": data
+        }})
+
+    async def wait_for(self, prefix, timeout=10.0):
+        """Wait until the chat's last message (e.g. one a background worker edits) starts with `prefix`."""
+        deadline = time.perf_counter() + timeout
+        while not self.telegram.texts.get(self.user["id"], "").startswith(prefix):
+            if time.perf_counter() > deadline:
+                raise ScenarioError(f"still {self.telegram.texts.get(self.user['id'], '')[:60]!r} after {timeout:.0f}s")
+            await asyncio.sleep(0.005)
+
+async def registration(shopper, args, rng):
+    await shopper.command("/start")
+    await shopper.text(f"Bench Shopper {shopper.user['id']}")
+    await shopper.text("+2348000000000")
+    await shopper.text(f"shopper{shopper.user['id']}@example.com")
+    await shopper.command("/start")
+    if "Welcome back" not in shopper.telegram.texts.get(shopper.user["id"], ""):
+        raise ScenarioError("not logged in after registering")
+
+async def shop(shopper, args, rng):
+    await shopper.command("/start")
+    for barcode in rng.sample(args.barcodes, args.scans):
+        await shopper.web_app_data(barcode)
+        await shopper.tap("add_")
+    await shopper.tap("view_cart")
+    await shopper.tap("checkout")
+    await shopper.tap("pay_bank_")
+    await shopper.tap("confirm_bank_")
+    await shopper.wait_for("✅")
+    # Rounds within one second reuse the payment reference, and so the order
+    ref = shopper.telegram.texts[shopper.user["id"]].split("`")[1]
+    if not any(o['userId'] == shopper.user["id"] and o.get('paymentRef') == ref for o in shopper.backend.orders):
+        raise ScenarioError("no order placed")
+
+async def staff(shopper, args, rng):
+    await shopper.command("/staff")
+    await shopper.tap("staff_orders")
+    await shopper.tap("orders_before_")
+    await shopper.command("/staff")
+    await shopper.tap("staff_stock")
+    await shopper.text("Item 1")
+    await shopper.tap("stock_page_1")
+
+async def admin(shopper, args, rng):
+    await shopper.command("/admin")
+    await shopper.tap("admin_stats")
+    await shopper.tap("back_admin")
+
+# scenario -> (script, seed users as registered and logged in, username)
+SCENARIO_SCRIPTS = {
+    "registration": (registration, False, None),
+    "shop": (shop, True, None),
+    "staff": (staff, True, STAFF_USERNAME),
+    "admin": (admin, True, ADMIN_USERNAME),
+}
+
+async def run_scenario(name, application, telegram, backend, args, first_user_id):
+    import bot
+
+    script, seeded, username = SCENARIO_SCRIPTS[name]
+    bot.session_cache.clear()
+    bot.carts.entries.clear()
+    bot.staff_roster.invalidate()
+    bot.singleflight.clear()
+    backend.reset_counts()
+    telegram.reset_counts()
+    errors_before = args.errors
+
+    user_ids = range(first_user_id, first_user_id + args.shoppers)
+    if seeded:
+        for user_id in user_ids:
+            backend.seed_user(user_id, f"Shopper {user_id}")
+    shoppers = [Shopper(application, telegram, backend, user_id, username) for user_id in user_ids]
+    failures = Counter()
+
+    async def play(shopper, rng):
+        for _ in range(args.rounds):
+            if name == "registration":
+                # A brand-new user each round
+                backend.users.pop(shopper.user["id"], None)
+                bot.session_cache.invalidate(shopper.user["id"])
+            try:
+                await script(shopper, args, rng)
+            except ScenarioError as e:
+                failures[str(e)] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(play(s, random.Random(args.seed + s.user["id"])) for s in shoppers))
+    elapsed = time.perf_counter() - started
+
+    runs = args.shoppers * args.rounds
+    latencies = [l for s in shoppers for l in s.latencies]
+    return {
+        "runs": runs,
+        "failedRuns": sum(failures.values()),
+        "failures": dict(failures.most_common(3)),
+        "seconds": round(elapsed, 3),
+        "runsPerSec": round(runs / elapsed, 2),
+        "updatesPerSec": round(len(latencies) / elapsed, 1),
+        "updatesPerRun": round(len(latencies) / runs, 2),
+        "p50Ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95Ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99Ms": round(percentile(latencies, 99) * 1000, 1),
+        "backendCallsPerRun": round(sum(backend.calls.values()) / runs, 2),
+        "backendRoutes": {route: round(n / runs, 2) for route, n in backend.calls.most_common()},
+        "injectedFailures": backend.failures,
+        "telegramCallsPerRun": round(sum(telegram.calls.values()) / runs, 2),
+        "errorReplies": telegram.warnings,
+        "handlerErrors": args.errors - errors_before
+    }
+
+def print_result(name, r):
+    print(
+        f"{name:<13} {r['runsPerSec']:7.1f} runs/s {r['updatesPerSec']:8.1f} updates/s | "
+        f"p50 {r['p50Ms']:7.1f}ms p95 {r['p95Ms']:7.1f}ms p99 {r['p99Ms']:7.1f}ms | "
+        f"backend {r['backendCallsPerRun']:5.2f}/run telegram {r['telegramCallsPerRun']:5.2f}/run | "
+        f"failed {r['failedRuns']}/{r['runs']} errors {r['handlerErrors']} error replies {r['errorReplies']}"
+    )
+    print("              " + ", ".join(f"{route} {n}" for route, n in r['backendRoutes'].items()))
+    for reason, n in r['failures'].items():
+        print(f"              {n} x {reason}")
+
+def compare(results, baseline, tolerance):
+    """Regressions of `results` against a saved `baseline` run, as printable lines."""
+    problems = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if r['p95Ms'] > base['p95Ms'] * (1 + tolerance):
+            problems.append(f"{name}: p95 {base['p95Ms']}ms -> {r['p95Ms']}ms")
+        if r['runsPerSec'] < base['runsPerSec'] / (1 + tolerance):
+            problems.append(f"{name}: {base['runsPerSec']} -> {r['runsPerSec']} runs/s")
+        if r['backendCallsPerRun'] > base['backendCallsPerRun'] + 0.01:
+            problems.append(f"{name}: backend calls/run {base['backendCallsPerRun']} -> {r['backendCallsPerRun']}")
+        if r['telegramCallsPerRun'] > base['telegramCallsPerRun'] + 0.01:
+            problems.append(f"{name}: Telegram calls/run {base['telegramCallsPerRun']} -> {r['telegramCallsPerRun']}")
+        for key in ('failedRuns', 'handlerErrors', 'errorReplies'):
+            if r[key] > base[key]:
+                problems.append(f"{name}: {key} {base[key]} -> {r[key]}")
+    return problems
+
+async def bench(args):
+    # bot.py opens bot.log in the working directory; handler and backend
+    # errors go there rather than between the result lines
+    os.chdir(tempfile.mkdtemp(prefix="diagnose_bot_"))
+    os.environ.setdefault("LOG_CONSOLE_LEVEL", "CRITICAL")
+    os.environ["BOT_SERVICE_TOKEN"] = SERVICE_TOKEN
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import bot
+
+    logging.getLogger().setLevel(logging.WARNING)
+    products = [
+        {"barcode": str(6000000000000 + i), "name": f"Item {i}", "price": 100 + i, "category": f"Cat {i % 50}"}
+        for i in range(args.products)
+    ]
+    args.barcodes = [p['barcode'] for p in products]
+    backend = StubBackend(products, args.latency, args.jitter, args.failure_rate, args.seed)
+    bot.backend._client = httpx.AsyncClient(transport=httpx.MockTransport(backend))
+    telegram = FakeTelegramRequest(args.telegram)
+    scheduler = bot.build_send_scheduler() if args.rate_limit else None
+    application = bot.build_application(bot=ExtBot("123456:diagnose-bench", request=telegram, get_updates_request=telegram, rate_limiter=scheduler))
+    args.errors = 0
+
+    async def count_error(update, context):
+        args.errors += 1
+        logging.warning(f"[Bench] Handler error: {context.error!r}")
+
+    application.add_error_handler(count_error)
+
+    print(
+        f"{args.shoppers} shoppers x {args.rounds} rounds | backend {args.latency:.0f}+/-{args.jitter:.0f}ms, "
+        f"{args.failure_rate:.0%} failures | Telegram {args.telegram:.0f}ms/call{' (rate limited)' if args.rate_limit else ''} | "
+        f"{args.products} products"
+    )
+    results = {}
+    async with application:
+        # What post_init's refresh loop and checkout workers would be doing
+        await bot.catalog.refresh()
+        workers = asyncio.create_task(bot.checkouts.run())
+        for n, name in enumerate(args.scenarios):
+            results[name] = await run_scenario(name, application, telegram, backend, args, 100000 * (n + 1))
+            print_result(name, results[name])
+        workers.cancel()
+    await bot.backend.aclose()
+    print(f"Handler errors and warnings: {os.path.abspath(bot.LOG_FILE)}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("live", help="check the token and clear the webhook on the real Telegram API")
+    b = sub.add_parser("bench", help="offline benchmark of the real handlers against a stub backend")
+    b.add_argument('--scenarios', default=",".join(SCENARIOS), help=f"comma-separated, from {', '.join(SCENARIOS)}")
+    b.add_argument('--shoppers', type=int, default=50, help='concurrent virtual shoppers')
+    b.add_argument('--rounds', type=int, default=2, help='times each shopper runs the scenario')
+    b.add_argument('--scans', type=int, default=5, help='items scanned per shop run')
+    b.add_argument('--latency', type=float, default=20.0, help='backend latency per call (ms)')
+    b.add_argument('--jitter', type=float, default=5.0)
+    b.add_argument('--failure-rate', type=float, default=0.0, help='fraction of backend calls failing to connect')
+    b.add_argument('--telegram', type=float, default=30.0, help='cost of each Telegram API call (ms)')
+    b.add_argument('--rate-limit', action='store_true', help="send through the bot's outbound SendScheduler")
+    b.add_argument('--products', type=int, default=2000)
+    b.add_argument('--seed', type=int, default=7)
+    b.add_argument('--json', help='save the results here')
+    b.add_argument('--compare', help='results saved by an earlier --json run to check against')
+    b.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown against --compare (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    if args.command != "bench":
+        live()
+        return
+
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in args.scenarios if s not in SCENARIO_SCRIPTS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    json_path = os.path.abspath(args.json) if args.json else None
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["scenarios"]
+
+    results = asyncio.run(bench(args))
+
+    if json_path:
+        settings = {k: getattr(args, k) for k in ("shoppers", "rounds", "scans", "latency", "jitter", "failure_rate", "telegram", "rate_limit", "products", "seed")}
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, "scenarios": results}, f, indent=2)
+    if baseline is not None:
+        problems = compare(results, baseline, args.tolerance)
+        for line in problems:
+            print(f"[REGRESSION] {line}")
+        if problems:
+            sys.exit(1)
+        print(f"[OK] No regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import csv
+import json
+import re
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+from decimal import Decimal, InvalidOperation
+
+# Column aliases, matching what the web dashboard's bulk upload accepts
+FIELD_ALIASES = {
+    "barcode": ("barcode", "bar code", "code", "sku", "ean", "upc"),
+    "name": ("name", "product name", "product", "item"),
+    "price": ("price", "amount", "cost", "unit price"),
+    "category": ("category", "dept", "department"),
+    "description": ("description", "info", "notes")
+}
+SUPPORTED_EXTENSIONS = (".csv", ".xlsx", ".json")
+
+_BARCODE_RE = re.compile(r"^[A-Za-z0-9-]{3,64}$")
+_PRICE_JUNK_RE = re.compile(r"[₦\s]|NGN|N(?=\d)", re.IGNORECASE)
+# Digits grouped in threes by `sep`, e.g. 1,234,567 (sep doubled for the regex below)
+_GROUPED = r"\d{{1,3}}(?:{sep}\d{{3}})+"
+_PRICE_FORMATS = (
+    (re.compile(r"^\d+$"), None, None),
+    (re.compile(r"^\d*\.\d+$"), None, "."),                                   # 1234.50
+    (re.compile(r"^\d+,\d{1,2}$"), None, ","),                                 # 1234,50
+    (re.compile("^" + _GROUPED.format(sep=",") + r"(?:\.\d+)?$"), ",", "."),     # 1,234 / 1,234.50
+    (re.compile("^" + _GROUPED.format(sep=r"\.") + r"(?:,\d+)?$"), ".", ","),    # 1.234.567 / 1.234,50
+)
+_XLSX_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+
+
+# --- Row sources (all generators; nothing holds the whole file) ---
+
+def iter_csv_rows(path):
+    with open(path, newline="", encoding="utf-8-sig", errors="replace") as f:
+        yield from csv.DictReader(f)
+
+
+def iter_json_rows(path, chunk_size=1 << 16):
+    """Objects from a top-level JSON array (or JSON Lines), decoded one at a time."""
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8-sig") as f:
+        buf, pos, eof = "", 0, False
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,[":
+                pos += 1
+            if pos < len(buf) and buf[pos] == "]":
+                return
+            try:
+                if pos >= len(buf):
+                    raise ValueError("need more data")
+                obj, pos = decoder.raw_decode(buf, pos)
+            except ValueError:
+                if eof:
+                    if buf[pos:].strip():
+                        raise ValueError("Malformed JSON near end of file")
+                    return
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buf, pos = buf[pos:] + chunk, 0
+                continue
+            if isinstance(obj, dict):
+                yield obj
+            if pos > chunk_size:
+                buf, pos = buf[pos:], 0
+
+
+def _xlsx_column(ref):
+    col = 0
+    for ch in ref:
+        if not ch.isalpha():
+            break
+        col = col * 26 + ord(ch.upper()) - 64
+    return col - 1
+
+
+def iter_xlsx_rows(path):
+    """
+    Rows of the first worksheet as dicts keyed by the header row, via streaming XML.
+
+    Each row is dropped from the parsed tree once read, so the sheet itself
+    costs memory for one row at a time. The shared strings table is the
+    exception: cells refer to it by index, so it is held in memory whole
+    (its distinct strings, typically names and categories, not the rows).
+    """
+    with zipfile.ZipFile(path) as zf:
+        names = zf.namelist()
+        shared = []
+        if "xl/sharedStrings.xml" in names:
+            with zf.open("xl/sharedStrings.xml") as f:
+                root = None
+                for event, el in ET.iterparse(f, events=("start", "end")):
+                    if root is None:
+                        root = el
+                    if event == "end" and el.tag == f"{_XLSX_NS}si":
+                        shared.append("".join(t.text or "" for t in el.iter(f"{_XLSX_NS}t")))
+                        root.clear()
+
+        sheets = sorted(n for n in names if re.match(r"xl/worksheets/sheet\d+\.xml$", n))
+        if not sheets:
+            raise ValueError("Workbook has no worksheets")
+        sheet = "xl/worksheets/sheet1.xml" if "xl/worksheets/sheet1.xml" in sheets else sheets[0]
+
+        header = None
+        with zf.open(sheet) as f:
+            rows = None  # <sheetData>, the parent every <row> must be removed from
+            for event, el in ET.iterparse(f, events=("start", "end")):
+                if event == "start":
+                    if el.tag == f"{_XLSX_NS}sheetData":
+                        rows = el
+                    continue
+                if el.tag != f"{_XLSX_NS}row":
+                    continue
+                values = {}
+                for i, cell in enumerate(el.iter(f"{_XLSX_NS}c")):
+                    kind = cell.get("t")
+                    if kind == "inlineStr":
+                        value = "".join(t.text or "" for t in cell.iter(f"{_XLSX_NS}t"))
+                    else:
+                        v = cell.find(f"{_XLSX_NS}v")
+                        value = v.text if v is not None else ""
+                        if kind == "s" and value:
+                            value = shared[int(value)]
+                    ref = cell.get("r")
+                    values[_xlsx_column(ref) if ref else i] = value
+                if rows is not None:
+                    rows.remove(el)
+                if header is None:
+                    header = {col: str(name) for col, name in values.items() if name}
+                    continue
+                yield {name: values.get(col, "") for col, name in header.items()}
+
+
+def iter_rows(path, filename):
+    ext = filename.lower().rsplit(".", 1)[-1]
+    if ext == "csv":
+        return iter_csv_rows(path)
+    if ext == "json":
+        return iter_json_rows(path)
+    if ext == "xlsx":
+        return iter_xlsx_rows(path)
+    raise ValueError(f"Unsupported file type: .{ext}")
+
+
+# --- Validation ---
+
+def _pick(row, field):
+    lowered = {str(k).strip().lower(): v for k, v in row.items() if k is not None}
+    for alias in FIELD_ALIASES[field]:
+        value = lowered.get(alias)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def normalize_barcode(value):
+    if value is None:
+        return None
+    text = str(value).strip().replace(" ", "")
+    # Spreadsheets turn long numeric codes into 6.15E+12 or 615123.0
+    if re.fullmatch(r"\d+(\.0+)?|\d+(\.\d+)?[eE]\+?\d+", text):
+        try:
+            number = Decimal(text)
+        except InvalidOperation:
+            return None
+        if number != number.to_integral_value():
+            return None
+        text = str(int(number))
+    return text if _BARCODE_RE.match(text) else None
+
+
+def _parse_price_text(text):
+    """
+    Float from "1234.50", "1,234.50", "1.234,50", "1234,50", ... or None.
+
+    Thousands separators must group digits in threes, and a lone comma is
+    a decimal comma only before one or two digits; anything else ("1.2.3",
+    "1,23,4") is refused rather than guessed at.
+    """
+    for pattern, thousands, decimal in _PRICE_FORMATS:
+        if pattern.match(text):
+            if thousands:
+                text = text.replace(thousands, "")
+            if decimal:
+                text = text.replace(decimal, ".")
+            return float(text)
+    return None
+
+
+def normalize_price(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        number = value
+    else:
+        number = _parse_price_text(_PRICE_JUNK_RE.sub("", str(value)))
+        if number is None:
+            return None
+    if number != number or number < 0:  # NaN or negative
+        return None
+    return int(number)
+
+
+def normalize_row(row):
+    """(product, None) for a valid row, (None, reason) otherwise."""
+    barcode = normalize_barcode(_pick(row, "barcode"))
+    if not barcode:
+        return None, "missing/invalid barcode"
+    name = str(_pick(row, "name") or "").strip()
+    if not name:
+        return None, "missing name"
+    price = normalize_price(_pick(row, "price") or 0)
+    if price is None:
+        return None, "invalid price"
+    return {
+        "barcode": barcode,
+        "name": name,
+        "price": price,
+        "category": str(_pick(row, "category") or "Other").strip(),
+        "description": str(_pick(row, "description") or "").strip()
+    }, None
+
+
+# --- Import ---
+
+class ImportProgress:
+    def __init__(self):
+        self.rows = 0
+        self.sent = 0
+        self.added = 0
+        self.updated = 0
+        self.skipped = 0
+        self.failed_batches = 0
+        self.errors = []  # first few (data row number, reason)
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+
+async def import_products(rows, request, batch_size=1000, on_progress=None, headers=None):
+    """
+    Validate `rows` one at a time and send them to /admin/products/bulk in
+    batches of `batch_size`. Only one batch is held in memory at any time.
+    `on_progress(progress)` is awaited after every batch.
+    """
+    progress = ImportProgress()
+    batch = []
+
+    async def flush():
+        try:
+            res = await request("POST", "/admin/products/bulk", json=batch, headers=headers)
+            if res.status_code == 200:
+                result = res.json()
+                progress.added += result.get("added", 0)
+                progress.updated += result.get("updated", 0)
+            else:
+                progress.failed_batches += 1
+        except Exception:
+            progress.failed_batches += 1
+        progress.sent += len(batch)
+        batch.clear()
+        if on_progress:
+            await on_progress(progress)
+
+    for number, row in enumerate(rows, 1):
+        progress.rows += 1
+        product, error = normalize_row(row)
+        if error:
+            progress.skipped += 1
+            if len(progress.errors) < 5:
+                progress.errors.append((number, error))
+            continue
+        batch.append(product)
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+    return progress
@@ -0,0 +1,140 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+
+# IDs of the update being handled, picked up by every log record made while
+# handling it (each update runs in its own task, so this is per-update)
+update_context = contextvars.ContextVar("update_context", default=None)
+
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+def bind_update(update):
+    """Tag log records from here on in this task with the update's IDs."""
+    user = getattr(update, "effective_user", None)
+    update_context.set({
+        "update_id": getattr(update, "update_id", None),
+        "user_id": user.id if user else None
+    })
+
+
+class UpdateContextFilter(logging.Filter):
+    def filter(self, record):
+        ids = update_context.get()
+        if ids:
+            for key, value in ids.items():
+                if not hasattr(record, key):
+                    setattr(record, key, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps one in `rates[logger]` records below WARNING from noisy loggers
+    (matched by name prefix, e.g. "httpx" for its per-request INFO line).
+    Kept records are tagged `sampled: "1/N"` so readers can scale counts.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = {name: rate for name, rate in rates.items() if rate > 1}
+        self.counters = {}
+        self.dropped = 0
+
+    def _rate(self, name):
+        for prefix, rate in self.rates.items():
+            if name == prefix or name.startswith(prefix + "."):
+                return prefix, rate
+        return None, 1
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        prefix, rate = self._rate(record.name)
+        if rate == 1:
+            return True
+        seen = self.counters.get(prefix, 0)
+        self.counters[prefix] = seen + 1
+        if seen % rate:
+            self.dropped += 1
+            return False
+        if seen:
+            record.sampled = f"1/{rate}"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, update IDs and any extras."""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    dropped = 0
+
+    def prepare(self, record):
+        # Merge args now (they may be mutated later) but leave exc_info for
+        # the writer thread to format; the stock prepare() formats everything
+        # on the caller's thread and throws the traceback away
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(path="bot.log", level=logging.INFO, max_bytes=10 * 1024 * 1024, backups=3,
+                      console_level=logging.INFO, sample_rates=None, queue_size=10000):
+    """
+    Route all logging through a queue to a background writer thread.
+
+    Callers (the event loop included) only pay for a non-blocking queue put;
+    the writer thread appends JSON lines to `path`, rotating it at
+    `max_bytes`, and echoes human-readable lines at `console_level` and
+    above to stdout. If the queue fills up, records are dropped rather than
+    stalling the bot. Returns the QueueListener (stopped at exit).
+    """
+    file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+    file_handler.setFormatter(JsonFormatter())
+    console = logging.StreamHandler(sys.stdout)
+    console.setLevel(console_level)
+    console.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    records = queue.Queue(queue_size)
+    handler = _QueueHandler(records)
+    handler.addFilter(SamplingFilter(sample_rates or {}))
+    handler.addFilter(UpdateContextFilter())
+
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(records, file_handler, console, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
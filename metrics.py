@@ -0,0 +1,210 @@
+import functools
+import re
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds; covers a cache hit through a slow checkout
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_ID_SEGMENT_RE = re.compile(r"\d")
+# Routes whose parameter is user-supplied text: a segment without digits
+# would otherwise become a series of its own
+_ROUTE_TEMPLATES = (
+    (re.compile(r"/staff/[^/]+"), "/staff/:username"),
+    (re.compile(r"/products/(?!all$|changes$|lookup$)[^/]+"), "/products/:id"),
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self.values = {}
+
+    def inc(self, labels=(), amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in list(self.values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, labels=(), value=0):
+        self.values[labels] = value
+
+    def dec(self, labels=(), amount=1):
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. observe() bumps one non-cumulative bucket; the
+    cumulative `le` counts Prometheus expects are added up at scrape time.
+    """
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self.buckets = tuple(buckets)
+        self.series = {}  # labels -> [per-bucket counts (+Inf last), sum]
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self):
+        for labels, (counts, total) in list(self.series.items()):
+            running = 0
+            for bound, count in zip(self.buckets + ("+Inf",), list(counts)):
+                running += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {running}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {total}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {running}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []  # called before each scrape to refresh gauges
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self._add(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def render(self):
+        for collect in self.collectors:
+            collect()
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HANDLER_SECONDS = REGISTRY.histogram("bot_handler_duration_seconds", "Time spent in a bot handler.", ("handler",))
+HANDLER_ERRORS = REGISTRY.counter("bot_handler_errors_total", "Handler calls that raised.", ("handler",))
+HANDLER_IN_FLIGHT = REGISTRY.gauge("bot_handler_in_flight", "Handler calls currently running.", ("handler",))
+
+
+def instrumented(name):
+    """
+    Decorator for async handlers: latency histogram, error count and
+    in-flight gauge under `name`. `name` may be a function of the call's
+    arguments, for handlers whose branches deserve their own series.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            labels = (name(*args, **kwargs) if callable(name) else name,)
+            HANDLER_IN_FLIGHT.inc(labels)
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except BaseException:
+                HANDLER_ERRORS.inc(labels)
+                raise
+            finally:
+                HANDLER_SECONDS.observe(labels, time.perf_counter() - started)
+                HANDLER_IN_FLIGHT.dec(labels)
+        return wrapper
+    return decorate
+
+
+@functools.lru_cache(maxsize=4096)
+def endpoint_label(endpoint):
+    """/products/6151234?x=1 -> /products/:id, so IDs don't each get a series."""
+    path = endpoint.split("?", 1)[0]
+    for pattern, template in _ROUTE_TEMPLATES:
+        if pattern.fullmatch(path):
+            return template
+    return "/".join(":id" if _ID_SEGMENT_RE.search(part) else part for part in path.split("/"))
+
+
+class BackendMetrics:
+    """What BackendClient reports about each backend call."""
+
+    def __init__(self, registry=REGISTRY):
+        self.seconds = registry.histogram("bot_backend_request_duration_seconds", "Backend call latency, failover included.", ("method", "endpoint"))
+        self.requests = registry.counter("bot_backend_requests_total", "Backend calls by outcome (2xx/3xx/4xx/5xx/error).", ("method", "endpoint", "outcome"))
+        self.fallbacks = registry.counter("bot_backend_fallbacks_total", "Backend calls answered by a base URL other than the primary.", ("endpoint",))
+        self.in_flight = registry.gauge("bot_backend_in_flight", "Backend calls currently waiting or running.")
+
+    def started(self):
+        self.in_flight.inc()
+
+    def finished(self, method, endpoint, outcome, elapsed, fallback=False):
+        label = endpoint_label(endpoint)
+        self.in_flight.dec()
+        self.seconds.observe((method, label), elapsed)
+        self.requests.inc((method, label, outcome))
+        if fallback:
+            self.fallbacks.inc((label,))
+
+
+class MetricsServer:
+    """Serves REGISTRY in Prometheus text format on GET /metrics from a background thread."""
+
+    def __init__(self, listen, port, registry=REGISTRY):
+        self.registry = registry
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = server.registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((listen, port), Handler)
+        self._server.daemon_threads = True
+        self.address = self._server.server_address
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
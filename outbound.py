@@ -0,0 +1,288 @@
+import asyncio
+import datetime
+import logging
+import time
+from collections import OrderedDict, deque
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from metrics import REGISTRY
+
+# Lanes, most urgent first. Handlers' replies and edits go in the
+# interactive lane by default; pass rate_limit_args=LANE_BACKGROUND for
+# anything nobody is waiting on (admin progress reports, notifications).
+LANE_INTERACTIVE = "interactive"
+LANE_BACKGROUND = "background"
+LANES = (LANE_INTERACTIVE, LANE_BACKGROUND)
+
+# Edits of the same message that may replace one another while queued
+COALESCABLE = {"editMessageText", "editMessageReplyMarkup", "editMessageCaption"}
+
+QUEUE_DEPTH = REGISTRY.gauge("bot_telegram_queue_depth", "Telegram sends waiting for a rate-limit token.", ("lane",))
+SEND_WAIT = REGISTRY.histogram("bot_telegram_send_wait_seconds", "Time a Telegram send waited for a rate-limit token.", ("lane",))
+SENDS = REGISTRY.counter("bot_telegram_sends_total", "Telegram sends by lane and outcome (sent/coalesced).", ("lane", "outcome"))
+FLOOD_WAITS = REGISTRY.counter("bot_telegram_flood_waits_total", "429 RetryAfter answers from Telegram.")
+
+
+def _is_limited(endpoint):
+    """Calls that post into a chat and count against Telegram's flood limits."""
+    return endpoint.startswith(("send", "edit")) or endpoint in ("copyMessage", "forwardMessage")
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate, burst, now):
+        self.rate, self.burst = rate, burst
+        self.tokens = burst
+        self.stamp = now
+
+    def _fill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def ready_in(self, now):
+        """Seconds until a token is available (0 if one is now)."""
+        self._fill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def full(self, now):
+        self._fill(now)
+        return self.tokens >= self.burst
+
+
+class PendingSend:
+    __slots__ = ("lane", "chat_id", "edit_key", "turn", "followers", "enqueued")
+
+    def __init__(self, lane, chat_id, edit_key, turn, enqueued):
+        self.lane = lane
+        self.chat_id = chat_id
+        self.edit_key = edit_key
+        self.turn = turn        # resolved with None when it may send, or a future for a newer edit's result
+        self.followers = []     # futures of superseded edits waiting for this send's result
+        self.enqueued = enqueued
+
+
+class SendScheduler(BaseRateLimiter):
+    """
+    Outbound scheduler for the Bot API: keeps the bot under Telegram's flood
+    limits instead of finding them with 429s.
+
+    Every send or edit takes a token from a global bucket and from its
+    chat's bucket (group chats have a slower one). A bucket lets at most
+    rate + burst sends through in any one second, so the overall defaults
+    stay under Telegram's ~30/s. One dispatcher task hands
+    out tokens: interactive sends before background ones, and chats round
+    robin within a lane so one busy chat can't starve the rest. Another
+    edit of a message whose edit is still queued replaces it; both callers
+    get the newer edit's result. A 429 anyway pauses all sends for the
+    RetryAfter period and retries, at most `max_retries` times.
+
+    Other calls (answerCallbackQuery, getMe, webhook setup) are not
+    throttled.
+    """
+
+    def __init__(self, overall_rate=25.0, overall_burst=5, chat_rate=1.0, chat_burst=10,
+                 group_rate=20 / 60, group_burst=3, max_retries=2, clock=time.monotonic):
+        self.overall_rate, self.overall_burst = overall_rate, overall_burst
+        self.chat_rate, self.chat_burst = chat_rate, chat_burst
+        self.group_rate, self.group_burst = group_rate, group_burst
+        self.max_retries = max_retries
+        self.clock = clock
+        self._overall = None
+        self._chats = {}  # chat id -> TokenBucket, dropped once full again
+        self._queues = {lane: OrderedDict() for lane in LANES}  # lane -> chat id -> deque of PendingSend
+        self._edits = {}  # edit key -> queued PendingSend
+        self._paused_until = 0.0
+        self._wakeup = None
+        self._dispatcher = None
+        self.queued = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.flood_waits = 0
+        self.waited = 0.0
+        self.max_wait = 0.0
+
+    async def initialize(self):
+        self._overall = TokenBucket(self.overall_rate, self.overall_burst, self.clock())
+        self._wakeup = asyncio.Event()
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def shutdown(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        # Anything still queued goes out unthrottled rather than hanging
+        for queue in self._queues.values():
+            for pendings in queue.values():
+                for pending in pendings:
+                    if not pending.turn.done():
+                        pending.turn.set_result(None)
+            queue.clear()
+        self._edits.clear()
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get("chat_id")
+        if self._dispatcher is None or chat_id is None or not _is_limited(endpoint):
+            return await callback(*args, **kwargs)
+
+        lane = rate_limit_args if rate_limit_args in self._queues else LANE_INTERACTIVE
+        pending = self._enqueue(lane, chat_id, endpoint, data)
+        try:
+            newer = await pending.turn
+        except asyncio.CancelledError:
+            if not pending.turn.done() or pending.turn.cancelled():
+                self._drop(pending)
+            raise
+        if newer is not None:
+            return await newer
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = await callback(*args, **kwargs)
+            except RetryAfter as e:
+                self._flood_wait(e)
+                if attempt == self.max_retries:
+                    self._settle(pending, error=e)
+                    raise
+                await asyncio.sleep(max(0.0, self._paused_until - self.clock()))
+            except BaseException as e:
+                self._settle(pending, error=e)
+                raise
+            else:
+                self._settle(pending, result=result)
+                return result
+
+    def _enqueue(self, lane, chat_id, endpoint, data):
+        loop = asyncio.get_running_loop()
+        edit_key = None
+        if endpoint in COALESCABLE and data.get("message_id") is not None:
+            edit_key = (endpoint, chat_id, data["message_id"])
+        pending = PendingSend(lane, chat_id, edit_key, loop.create_future(), self.clock())
+
+        older = self._edits.get(edit_key) if edit_key else None
+        if older is not None and older.turn.done():
+            self._drop(older)
+            older = None
+        if older is not None:
+            self._unqueue(older)
+            follower = loop.create_future()
+            pending.followers = older.followers + [follower]
+            older.followers = []
+            older.turn.set_result(follower)
+            self.coalesced += 1
+            SENDS.inc((older.lane, "coalesced"))
+        if edit_key:
+            self._edits[edit_key] = pending
+
+        self._queues[lane].setdefault(chat_id, deque()).append(pending)
+        self.queued += 1
+        QUEUE_DEPTH.inc((lane,))
+        self._wakeup.set()
+        return pending
+
+    def _drop(self, pending):
+        """A queued send whose caller went away."""
+        if pending.chat_id in self._queues[pending.lane] and pending in self._queues[pending.lane][pending.chat_id]:
+            self._unqueue(pending)
+        if pending.edit_key and self._edits.get(pending.edit_key) is pending:
+            del self._edits[pending.edit_key]
+        for follower in pending.followers:
+            follower.cancel()
+
+    def _unqueue(self, pending):
+        queue = self._queues[pending.lane]
+        pendings = queue[pending.chat_id]
+        pendings.remove(pending)
+        if not pendings:
+            del queue[pending.chat_id]
+        self.queued -= 1
+        QUEUE_DEPTH.dec((pending.lane,))
+
+    def _settle(self, pending, result=None, error=None):
+        for follower in pending.followers:
+            if follower.done():
+                continue
+            if error is not None:
+                follower.set_exception(error)
+            else:
+                follower.set_result(result)
+
+    def _flood_wait(self, error):
+        retry_after = error.retry_after
+        seconds = retry_after.total_seconds() if isinstance(retry_after, datetime.timedelta) else float(retry_after)
+        self._paused_until = max(self._paused_until, self.clock() + seconds)
+        self.flood_waits += 1
+        FLOOD_WAITS.inc()
+        logging.warning(f"[Outbound] Telegram flood limit hit, pausing sends for {seconds:.0f}s")
+
+    def _chat_bucket(self, chat_id, now):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            group = isinstance(chat_id, int) and chat_id < 0
+            bucket = TokenBucket(self.group_rate if group else self.chat_rate, self.group_burst if group else self.chat_burst, now)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _next(self, now):
+        """(pending send that may go now, None) or (None, seconds until one might)."""
+        soonest = None
+        for lane in LANES:
+            queue = self._queues[lane]
+            for chat_id, pendings in queue.items():
+                wait = self._chat_bucket(chat_id, now).ready_in(now)
+                if wait == 0:
+                    queue.move_to_end(chat_id)  # round robin between chats
+                    return pendings[0], None
+                soonest = wait if soonest is None else min(soonest, wait)
+        return None, soonest
+
+    async def _dispatch(self):
+        idle_check = 0.0
+        while True:
+            now = self.clock()
+            wait = max(self._paused_until - now, self._overall.ready_in(now))
+            pending = None
+            if wait <= 0 and self.queued:
+                pending, wait = self._next(now)
+            if pending is not None and pending.turn.done():  # caller cancelled meanwhile
+                self._drop(pending)
+                continue
+            if pending is not None:
+                self._overall.take()
+                self._chat_bucket(pending.chat_id, now).take()
+                self._unqueue(pending)
+                if pending.edit_key and self._edits.get(pending.edit_key) is pending:
+                    del self._edits[pending.edit_key]
+                waited = now - pending.enqueued
+                self.waited += waited
+                self.max_wait = max(self.max_wait, waited)
+                self.sent += 1
+                SEND_WAIT.observe((pending.lane,), waited)
+                SENDS.inc((pending.lane, "sent"))
+                pending.turn.set_result(None)
+                continue
+
+            if now - idle_check > 60:
+                idle_check = now
+                self._chats = {c: b for c, b in self._chats.items() if not b.full(now)}
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait if self.queued else None)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self):
+        return {
+            "queued": {lane: sum(len(p) for p in queue.values()) for lane, queue in self._queues.items()},
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "floodWaits": self.flood_waits,
+            "avgWaitMs": round(self.waited / self.sent * 1000, 1) if self.sent else 0.0,
+            "maxWaitMs": round(self.max_wait * 1000, 1),
+            "pausedFor": round(max(0.0, self._paused_until - self.clock()), 1)
+        }
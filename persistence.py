@@ -0,0 +1,163 @@
+import asyncio
+import json
+import sqlite3
+import time
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_data (id INTEGER PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS chat_data (id INTEGER PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS conversations (name TEXT NOT NULL, key TEXT NOT NULL, state TEXT NOT NULL, PRIMARY KEY (name, key));
+"""
+
+
+class SQLitePersistence(BasePersistence):
+    """
+    user_data, chat_data and ConversationHandler states in an SQLite file
+    (WAL mode), so a restart mid-registration or mid-checkout picks up where
+    the user left off.
+
+    The Application already only hands over what changed since its last
+    persistence run (every `update_interval` seconds) and does so as one
+    burst of update_* calls. Those calls just record the change; the whole
+    burst is then written in a single transaction on a worker thread, so a
+    busy interval costs one fsync rather than one per update, and the event
+    loop never waits on the disk. Values must be JSON-serialisable.
+    """
+
+    def __init__(self, path, update_interval=5.0):
+        super().__init__(store_data=PersistenceInput(bot_data=False, callback_data=False), update_interval=update_interval)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._pending = self._empty_batch()
+        self._flush_task = None
+        self._write_lock = asyncio.Lock()
+        self.flushes = 0
+        self.rows_written = 0
+        self.write_seconds = 0.0
+
+    @staticmethod
+    def _empty_batch():
+        return {"user_data": {}, "chat_data": {}, "conversations": {}}
+
+    # --- Loading ---
+
+    def _load(self, table):
+        return {row_id: json.loads(data) for row_id, data in self._conn.execute(f"SELECT id, data FROM {table}")}
+
+    async def get_user_data(self):
+        return self._load("user_data")
+
+    async def get_chat_data(self):
+        return self._load("chat_data")
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        rows = self._conn.execute("SELECT key, state FROM conversations WHERE name = ?", (name,))
+        return {tuple(json.loads(key)): json.loads(state) for key, state in rows}
+
+    # --- Recording changes ---
+
+    async def _record(self, kind, key, value):
+        self._pending[kind][key] = value
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_soon())
+        await asyncio.shield(self._flush_task)
+
+    async def _flush_soon(self):
+        # Let the rest of this persistence run record its changes first
+        await asyncio.sleep(0)
+        await self.flush()
+
+    async def update_user_data(self, user_id, data):
+        await self._record("user_data", user_id, data)
+
+    async def drop_user_data(self, user_id):
+        await self._record("user_data", user_id, None)
+
+    async def update_chat_data(self, chat_id, data):
+        await self._record("chat_data", chat_id, data)
+
+    async def drop_chat_data(self, chat_id):
+        await self._record("chat_data", chat_id, None)
+
+    async def update_conversation(self, name, key, new_state):
+        await self._record("conversations", (name, json.dumps(list(key))), new_state)
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def refresh_user_data(self, user_id, user_data):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    # --- Writing ---
+
+    def _write(self, batch):
+        started = time.perf_counter()
+        conn = self._conn
+        conn.execute("BEGIN")
+        try:
+            for table in ("user_data", "chat_data"):
+                rows = batch[table]
+                conn.executemany(f"DELETE FROM {table} WHERE id = ?", [(k,) for k, v in rows.items() if v is None])
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO {table} (id, data) VALUES (?, ?)",
+                    [(k, json.dumps(v)) for k, v in rows.items() if v is not None]
+                )
+            states = batch["conversations"]
+            conn.executemany("DELETE FROM conversations WHERE name = ? AND key = ?", [k for k, v in states.items() if v is None])
+            conn.executemany(
+                "INSERT OR REPLACE INTO conversations (name, key, state) VALUES (?, ?, ?)",
+                [(name, key, json.dumps(v)) for (name, key), v in states.items() if v is not None]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.flushes += 1
+        self.rows_written += sum(len(rows) for rows in batch.values())
+        self.write_seconds += time.perf_counter() - started
+
+    async def flush(self):
+        async with self._write_lock:
+            batch, self._pending = self._pending, self._empty_batch()
+            if not any(batch.values()):
+                return
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception:
+                # Keep the batch for the next run, unless newer values arrived meanwhile
+                for kind, rows in batch.items():
+                    for key, value in rows.items():
+                        self._pending[kind].setdefault(key, value)
+                raise
+
+    def close(self):
+        self._conn.close()
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "updateInterval": self.update_interval,
+            "flushes": self.flushes,
+            "rowsWritten": self.rows_written,
+            "avgFlushMs": round(self.write_seconds / self.flushes * 1000, 2) if self.flushes else None
+        }
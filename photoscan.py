@@ -0,0 +1,286 @@
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import struct
+import sys
+import time
+
+from caches import TTLCache
+from metrics import REGISTRY
+
+# OpenCV is optional (see PhotoDecoder.available) and slow to import, so it
+# is only imported where photos are decoded: in the worker processes
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "photoworker.py")
+HAVE_OPENCV = importlib.util.find_spec("cv2") is not None
+cv2 = np = None
+
+DECODE_SECONDS = REGISTRY.histogram("bot_photo_decode_seconds", "Time to download and decode one barcode photo.")
+DECODES = REGISTRY.counter("bot_photo_decodes_total", "Barcode photos by outcome (found/empty/cached/busy/error).", ("outcome",))
+
+
+class PhotoDecoderBusy(Exception):
+    """Too many photos already waiting for a decode slot."""
+
+
+# --- Decoding (runs in the worker processes) ---
+
+_detectors = None
+
+
+def _import_opencv():
+    global cv2, np
+    if cv2 is None:
+        import cv2 as _cv2
+        import numpy as _np
+        cv2, np = _cv2, _np
+
+
+def _valid_gtin(code):
+    """EAN-8/UPC-A/EAN-13 check digit (anything else passes through)."""
+    if not code.isdigit() or len(code) not in (8, 12, 13):
+        return True
+    digits = [int(c) for c in reversed(code[:-1])]
+    total = sum(d * (3 if i % 2 == 0 else 1) for i, d in enumerate(digits))
+    return (10 - total % 10) % 10 == int(code[-1])
+
+
+def _read(gray):
+    global _detectors
+    if _detectors is None:
+        _detectors = (cv2.barcode.BarcodeDetector(), cv2.QRCodeDetector())
+    barcodes, qr = _detectors
+    found = []
+    ok, infos, _, _ = barcodes.detectAndDecodeWithType(gray)
+    if ok:
+        found += [info for info in infos if info and _valid_gtin(info)]
+    if not found:
+        text, _, _ = qr.detectAndDecode(gray)
+        if text:
+            found.append(text)
+    return found
+
+
+def _fit(gray, max_side):
+    h, w = gray.shape[:2]
+    scale = max_side / max(h, w)
+    if scale >= 1:
+        return gray
+    return cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+
+def decode_image(data, max_side=1024):
+    """
+    Barcodes (EAN/UPC, else QR) in an encoded image, most likely first.
+
+    Tries the cheapest views first and stops at the first that reads:
+    the whole frame shrunk to `max_side`; the middle of the frame at full
+    resolution (shoppers centre the code, and shrinking a wide shot loses
+    its thinnest bars); then the frame turned 90 degrees for codes shot
+    upright.
+    """
+    _import_opencv()
+    gray = cv2.imdecode(np.frombuffer(bytes(data), np.uint8), cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        raise ValueError("not an image")
+    h, w = gray.shape
+    frame = _fit(gray, max_side)
+    views = (
+        lambda: frame,
+        lambda: _fit(gray[h // 4:h - h // 4, w // 4:w - w // 4], max_side),
+        lambda: cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE),
+    )
+    for view in views:
+        found = _read(view())
+        if found:
+            return list(dict.fromkeys(found))
+    return []
+
+
+# --- The bot's side ---
+
+class _Worker:
+    """One photoworker.py process: a request is a length-prefixed image, the reply one JSON line."""
+
+    def __init__(self, proc):
+        self.proc = proc
+
+    @classmethod
+    async def spawn(cls):
+        # A fresh interpreter on photoworker.py, not a multiprocessing fork:
+        # forking the threaded bot risks deadlocked children, and spawn or
+        # forkserver workers would re-import bot.py as __mp_main__
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, WORKER_SCRIPT, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE
+        )
+        return cls(proc)
+
+    @property
+    def alive(self):
+        return self.proc.returncode is None
+
+    async def decode(self, data, max_side):
+        self.proc.stdin.write(struct.pack(">II", len(data), max_side) + bytes(data))
+        await self.proc.stdin.drain()
+        line = await self.proc.stdout.readline()
+        try:
+            reply = json.loads(line)
+        except ValueError:
+            raise RuntimeError(f"photo worker exited or garbled its reply: {line[:80]!r}")
+        if "error" in reply:
+            raise ValueError(reply["error"])
+        return reply["codes"]
+
+    async def close(self):
+        if self.alive:
+            self.proc.kill()
+        await self.proc.wait()
+
+
+class PhotoDecoder:
+    """
+    Decodes barcode photos in worker processes, off the event loop.
+
+    Each of the `workers` processes (photoworker.py, started on first use)
+    decodes one photo at a time, so at most that many are downloaded and
+    decoded at once; up to `max_waiting` more wait for a worker and
+    anything beyond that raises PhotoDecoderBusy rather than queueing for
+    seconds. A worker that dies or takes longer than `timeout` is killed
+    and replaced. Results, including "no barcode", are cached by Telegram's
+    file_unique_id, which is the same for every copy of a photo, and a
+    photo already being decoded is not decoded twice.
+
+    Needs OpenCV (opencv-python-headless); without it `available` is False
+    and the bot tells shoppers to use the scanner instead.
+    """
+
+    def __init__(self, workers=None, max_waiting=16, max_side=1024, timeout=20.0,
+                 cache_size=5000, cache_ttl=3600.0, clock=time.monotonic):
+        self.workers = workers or min(2, os.cpu_count() or 1)
+        self.max_waiting = max_waiting
+        self.max_side = max_side
+        self.timeout = timeout
+        self.clock = clock
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl, clock=clock)
+        self._idle = None  # asyncio.Queue of idle _Workers; None is a slot with no process yet
+        self._procs = set()
+        self._waiting = 0
+        self._decoding = {}  # file_unique_id -> task decoding it
+        self.decoded = 0
+        self.found = 0
+        self.shared = 0
+        self.rejected = 0
+        self.errors = 0
+        self.restarts = 0
+        self.busy_seconds = 0.0
+
+    @property
+    def available(self):
+        return HAVE_OPENCV
+
+    async def decode(self, key, download):
+        """Barcodes in the photo `key` (file_unique_id); `download()` returns its bytes."""
+        codes = self.cache.get(key)
+        if codes is not None:
+            DECODES.inc(("cached",))
+            return codes
+        task = self._decoding.get(key)
+        if task is not None:
+            self.shared += 1
+            return await asyncio.shield(task)
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for _ in range(self.workers):
+                self._idle.put_nowait(None)
+        if self._idle.empty() and self._waiting >= self.max_waiting:
+            self.rejected += 1
+            DECODES.inc(("busy",))
+            raise PhotoDecoderBusy()
+
+        task = asyncio.create_task(self._decode(key, download))
+        self._decoding[key] = task
+        task.add_done_callback(lambda t: self._decoding.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _acquire(self):
+        self._waiting += 1
+        try:
+            worker = await self._idle.get()
+        finally:
+            self._waiting -= 1
+        if worker is not None:
+            if worker.alive:
+                return worker
+            self.restarts += 1  # died while idle
+            self._procs.discard(worker)
+            await worker.close()
+        try:
+            worker = await _Worker.spawn()
+        except BaseException:
+            self._idle.put_nowait(None)
+            raise
+        self._procs.add(worker)
+        return worker
+
+    async def _release(self, worker, healthy):
+        if healthy:
+            self._idle.put_nowait(worker)
+            return
+        self.restarts += 1
+        self._procs.discard(worker)
+        self._idle.put_nowait(None)  # the next decode starts a replacement
+        await worker.close()
+
+    async def _decode(self, key, download):
+        worker = await self._acquire()
+        started = self.clock()
+        healthy = True
+        try:
+            data = await download()
+            healthy = False  # until the worker answers; a cancelled or timed-out request leaves it mid-image
+            codes = await asyncio.wait_for(worker.decode(data, self.max_side), self.timeout)
+            healthy = True
+        except ValueError as e:  # the worker answered: not an image
+            healthy = True
+            self._failed(key, e)
+            raise
+        except Exception as e:
+            self._failed(key, e)
+            raise
+        finally:
+            await self._release(worker, healthy)
+            elapsed = self.clock() - started
+            self.busy_seconds += elapsed
+            DECODE_SECONDS.observe((), elapsed)
+        self.decoded += 1
+        self.found += bool(codes)
+        DECODES.inc(("found" if codes else "empty",))
+        self.cache.set(key, codes)
+        return codes
+
+    def _failed(self, key, error):
+        self.errors += 1
+        DECODES.inc(("error",))
+        logging.warning(f"[Photo] Decoding {key} failed: {error!r}")
+
+    async def aclose(self):
+        procs, self._procs, self._idle = self._procs, set(), None
+        for worker in procs:
+            await worker.close()
+
+    def stats(self):
+        return {
+            "available": self.available,
+            "workers": self.workers,
+            "running": len(self._procs),
+            "decoded": self.decoded,
+            "found": self.found,
+            "cached": self.cache.hits,
+            "shared": self.shared,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "restarts": self.restarts,
+            "avgDecodeMs": round(self.busy_seconds / self.decoded * 1000, 1) if self.decoded else 0.0,
+            "waiting": self._waiting
+        }
@@ -0,0 +1,40 @@
+"""
+Barcode decoding worker for photoscan.PhotoDecoder.
+
+    python photoworker.py
+
+Reads requests from stdin, each a big-endian (length, max_side) pair of
+uint32s followed by `length` bytes of encoded image, and answers each with
+one JSON line on stdout: {"codes": [...]} or {"error": "..."}. Imports
+only photoscan (and OpenCV), never bot.py.
+"""
+import json
+import signal
+import struct
+import sys
+
+import photoscan
+
+
+def main():
+    # The bot owns Ctrl-C and shutdown; OpenCV gets one thread per process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    photoscan._import_opencv()
+    photoscan.cv2.setNumThreads(1)
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+    while True:
+        header = stdin.read(8)
+        if len(header) < 8:
+            return
+        length, max_side = struct.unpack(">II", header)
+        data = stdin.read(length)
+        try:
+            reply = {"codes": photoscan.decode_image(data, max_side)}
+        except Exception as e:
+            reply = {"error": f"{type(e).__name__}: {e}"}
+        stdout.write(json.dumps(reply).encode() + b"\n")
+        stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+import asyncio
+import heapq
+import logging
+from array import array
+from operator import itemgetter
+
+
+class RecommendationIndex:
+    """
+    "Bought together" index built from order line items.
+
+    Barcodes are interned to small ints. For each item we count how often
+    every other item appeared in the same basket, and after each batch of
+    baskets the top-k neighbours of the touched items are recomputed into a
+    compact array, so a lookup is O(k) no matter how big the history is.
+    Items with no purchase history fall back to the most-bought items of the
+    same category, then to the catalog's category index.
+
+    Per-item neighbour counts are pruned back to `max_neighbors` once they
+    grow past twice that, which keeps memory bounded on large catalogs at the
+    cost of forgetting rare pairs.
+
+    Subscribe it to the catalog mirror (`catalog.subscribe(index)`): an item
+    is categorized when it is bought and again whenever the mirror reports
+    a change to its product.
+    """
+
+    def __init__(self, catalog, k=5, max_basket=40, max_neighbors=32):
+        self.catalog = catalog
+        self.k = k
+        self.max_basket = max_basket
+        self.max_neighbors = max_neighbors
+        self.reset()
+
+    def reset(self):
+        self.ids = {}                      # barcode -> id
+        self.barcodes = []                 # id -> barcode
+        self.item_counts = array('l')      # id -> times bought
+        self.pair_counts = []              # id -> {other_id: count}
+        self.top = []                      # id -> array('l') of neighbour ids, best first
+        self.category_top = {}             # category -> array('l') of ids, most bought first
+        self.category_counts = {}          # category -> {id: times bought}
+        self.item_category = {}            # id -> category it was last counted under
+        self.baskets = 0
+        self.cursor = 0
+        self._dirty = set()
+        self._unresolved = set()           # bought ids not (yet) in the catalog mirror, so of unknown category
+        self._changed = set()              # ids whose product the catalog mirror changed since the last commit
+
+    def _intern(self, barcode):
+        item = self.ids.get(barcode)
+        if item is None:
+            item = len(self.barcodes)
+            self.ids[barcode] = item
+            self.barcodes.append(barcode)
+            self.item_counts.append(0)
+            self.pair_counts.append({})
+            self.top.append(array('l'))
+        return item
+
+    # --- Building ---
+
+    def add_basket(self, barcodes):
+        items = list(dict.fromkeys(self._intern(str(b).strip()) for b in barcodes if b))[:self.max_basket]
+        if not items:
+            return
+        self.baskets += 1
+        for a in items:
+            self.item_counts[a] += 1
+            counts = self.pair_counts[a]
+            for b in items:
+                if b != a:
+                    counts[b] = counts.get(b, 0) + 1
+            if len(counts) > 2 * self.max_neighbors:
+                self.pair_counts[a] = dict(heapq.nlargest(self.max_neighbors, counts.items(), key=itemgetter(1)))
+        self._dirty.update(items)
+
+    def commit(self):
+        """
+        Recompute top-k arrays for every item touched since the last commit.
+
+        An item the catalog mirror doesn't know yet (it may still be loading)
+        has no category; it is categorized once the mirror adds it.
+        """
+        dirty_categories = set()
+        for item in self._dirty:
+            best = heapq.nlargest(self.k, self.pair_counts[item].items(), key=itemgetter(1))
+            self.top[item] = array('l', (other for other, _ in best))
+
+        for item in self._dirty | self._changed:
+            product = self.catalog.get(self.barcodes[item])
+            if product is None:
+                self._unresolved.add(item)
+                continue
+            self._unresolved.discard(item)
+            category = product.get('category')
+            previous = self.item_category.get(item)
+            if previous is not None and previous != category:
+                self.category_counts[previous].pop(item, None)
+                dirty_categories.add(previous)
+            if category is not None:
+                self.category_counts.setdefault(category, {})[item] = self.item_counts[item]
+                self.item_category[item] = category
+                dirty_categories.add(category)
+        self._dirty.clear()
+        self._changed.clear()
+
+        # Keep one spare per category so excluding the scanned item still leaves k
+        for category in dirty_categories:
+            best = heapq.nlargest(self.k + 1, self.category_counts[category].items(), key=itemgetter(1))
+            self.category_top[category] = array('l', (item for item, _ in best))
+
+    # --- Catalog listener ---
+
+    def add(self, product):
+        item = self.ids.get(str(product.get('barcode', '')).strip())
+        if item is not None:
+            self._changed.add(item)
+
+    def discard(self, barcode):
+        item = self.ids.get(barcode)
+        if item is not None:
+            self._unresolved.discard(item)
+            self._changed.discard(item)
+
+    def clear(self):
+        pass  # a full sync re-adds every product, which marks them changed
+
+    # --- Lookups ---
+
+    def recommend(self, product, limit=3):
+        barcode = str(product.get('barcode')).strip()
+        picked = {}
+
+        def take(code):
+            if code != barcode and code not in picked:
+                p = self.catalog.get(code)
+                if p is not None:
+                    picked[code] = p
+            return len(picked) >= limit
+
+        item = self.ids.get(barcode)
+        if item is not None:
+            for other in self.top[item]:
+                if take(self.barcodes[other]): return list(picked.values())
+
+        category = product.get('category')
+        for other in self.category_top.get(category, ()):
+            if take(self.barcodes[other]): return list(picked.values())
+
+        for code in self.catalog.in_category(category):
+            if take(code): return list(picked.values())
+        return list(picked.values())
+
+    # --- Sync ---
+
+    async def refresh(self, request, page_size=2000):
+        """Pull new order baskets from the backend until caught up."""
+        while True:
+            res = await request("GET", "/orders/baskets", params={"after": self.cursor, "limit": page_size})
+            if res.status_code != 200:
+                raise RuntimeError(f"basket sync returned {res.status_code}")
+            data = res.json()
+            if data.get('reset'):
+                # Backend history is shorter than our cursor (db was reset): rebuild
+                self.reset()
+            for basket in data.get('baskets', []):
+                self.add_basket(basket)
+            self.cursor = data.get('next', self.cursor)
+            self.commit()
+            if data.get('done', True):
+                return
+
+    async def run(self, request, interval):
+        while True:
+            try:
+                await self.refresh(request)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"[Recommendations] Refresh failed: {e!r}")
+            await asyncio.sleep(interval)
+
+    def stats(self):
+        return {
+            "items": len(self.barcodes),
+            "baskets": self.baskets,
+            "categories": len(self.category_top),
+            "unresolved": len(self._unresolved),
+            "cursor": self.cursor
+        }
@@ -0,0 +1,189 @@
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from itertools import chain, islice
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Match scores per query token
+EXACT, PREFIX, FUZZY = 3.0, 2.0, 1.0
+
+
+def tokenize(text):
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode().lower()
+    return _TOKEN_RE.findall(text)
+
+
+def trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def within_distance(a, b, limit):
+    """
+    True if a and b are at most `limit` edits apart, where an edit is an
+    insert, delete, substitution or swap of two adjacent letters ("nestel"
+    -> "nestle" is one).
+    """
+    if abs(len(a) - len(b)) > limit:
+        return False
+    before, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if before is not None and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit and (before is None or min(previous) > limit):
+            return False
+        before, previous = previous, current
+    return previous[-1] <= limit
+
+
+class ProductSearchIndex:
+    """
+    Inverted index over product names and barcodes for the staff stock search.
+
+    Each distinct token maps to the barcodes containing it, both as a set
+    (for intersections) and as a list kept in display order (shortest name
+    first), so a one-word query pages straight off the front of the lists
+    instead of ranking every match. A sorted token list answers prefix
+    queries ("mil" -> "milo", "milk") and a trigram index over the vocabulary
+    finds near-misses ("nestel" -> "nestle"). It subscribes to the
+    CatalogMirror and is updated product by product as the mirror changes.
+    """
+
+    def __init__(self, max_prefix_expansions=50):
+        self.max_prefix_expansions = max_prefix_expansions
+        self.clear()
+
+    def clear(self):
+        self.products = {}          # barcode -> product
+        self.sort_keys = {}         # barcode -> its (sort key, barcode) entry in `ordered`
+        self.product_tokens = {}    # barcode -> set of tokens
+        self.postings = {}          # token -> set of barcodes
+        self.ordered = {}           # token -> sorted list of (sort key, barcode)
+        self.vocabulary = []        # sorted distinct tokens
+        self.trigram_tokens = {}    # trigram -> set of tokens
+
+    # --- Maintenance (CatalogMirror listener API) ---
+
+    def add(self, product):
+        barcode = str(product.get('barcode', '')).strip()
+        if not barcode:
+            return
+        self.discard(barcode)
+        tokens = set(tokenize(product.get('name', ''))) | {barcode.lower()}
+        self.products[barcode] = product
+        name = product.get('name', '')
+        entry = ((len(name), name, barcode), barcode)
+        self.sort_keys[barcode] = entry
+        self.product_tokens[barcode] = tokens
+        for token in tokens:
+            barcodes = self.postings.get(token)
+            if barcodes is None:
+                self.postings[token] = barcodes = set()
+                self.ordered[token] = []
+                insort(self.vocabulary, token)
+                for gram in trigrams(token):
+                    self.trigram_tokens.setdefault(gram, set()).add(token)
+            barcodes.add(barcode)
+            insort(self.ordered[token], entry)
+
+    def discard(self, barcode):
+        if self.products.pop(barcode, None) is None:
+            return
+        entry = self.sort_keys.pop(barcode)
+        for token in self.product_tokens.pop(barcode):
+            barcodes = self.postings[token]
+            barcodes.discard(barcode)
+            ordered = self.ordered[token]
+            del ordered[bisect_left(ordered, entry)]
+            if not barcodes:
+                del self.postings[token]
+                del self.ordered[token]
+                del self.vocabulary[bisect_left(self.vocabulary, token)]
+                for gram in trigrams(token):
+                    tokens = self.trigram_tokens[gram]
+                    tokens.discard(token)
+                    if not tokens:
+                        del self.trigram_tokens[gram]
+
+    # --- Querying ---
+
+    def _prefix_matches(self, prefix):
+        start = bisect_left(self.vocabulary, prefix)
+        matches = []
+        for token in self.vocabulary[start:start + self.max_prefix_expansions]:
+            if not token.startswith(prefix):
+                break
+            matches.append(token)
+        return matches
+
+    def _fuzzy_matches(self, token):
+        if len(token) < 4:
+            return []
+        limit = 1 if len(token) < 7 else 2
+        grams = trigrams(token)
+        shared = {}
+        for gram in grams:
+            for candidate in self.trigram_tokens.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        # Each edit can destroy at most four trigrams (a swap; three otherwise)
+        needed = max(1, len(grams) - 4 * limit)
+        return [c for c, n in shared.items() if n >= needed and within_distance(token, c, limit)]
+
+    def _expand(self, token):
+        """Vocabulary tokens a query token matches: (exact, prefix, fuzzy)."""
+        exact = [token] if token in self.postings else []
+        prefix = [c for c in self._prefix_matches(token) if c != token]
+        fuzzy = [] if exact or prefix else self._fuzzy_matches(token)
+        return exact, prefix, fuzzy
+
+    def _union(self, tokens):
+        return set().union(*(self.postings[t] for t in tokens))
+
+    def _in_order(self, tokens, exclude):
+        """Barcodes from the tokens' postings in display order, lazily, without repeats."""
+        seen = set()
+        for _, barcode in heapq.merge(*(self.ordered[t] for t in tokens)):
+            if barcode not in seen and barcode not in exclude:
+                seen.add(barcode)
+                yield barcode
+
+    def search(self, query, offset=0, limit=5):
+        """
+        One page of matching products, best first, plus the total match count.
+        Every query token must match; if no product matches them all, any may.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return [], 0
+
+        expanded = [self._expand(t) for t in tokens]
+        if len(expanded) == 1:
+            exact, prefix, fuzzy = expanded[0]
+            exact_set = self._union(exact)
+            total = len(exact_set | self._union(prefix + fuzzy))
+            ranked = chain(self._in_order(exact, ()), self._in_order(prefix + fuzzy, exact_set))
+            return [self.products[b] for b in islice(ranked, offset, offset + limit)], total
+
+        # Multi-word: intersect candidate sets in C, then score the (usually
+        # small) survivors per token: exact 3, prefix 2, fuzzy 1.
+        tiers = [(self._union(e), self._union(p), self._union(f)) for e, p, f in expanded]
+        per_token = [e | p | f for e, p, f in tiers]
+        matched = set.intersection(*per_token) or set().union(*per_token)
+
+        def rank(barcode):
+            score = 0
+            for e, p, f in tiers:
+                score += EXACT if barcode in e else PREFIX if barcode in p else FUZZY if barcode in f else 0
+            return (-score, self.sort_keys[barcode])
+
+        best = heapq.nsmallest(offset + limit, matched, key=rank)
+        return [self.products[b] for b in best[offset:]], len(matched)
+
+    def __len__(self):
+        return len(self.products)
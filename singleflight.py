@@ -0,0 +1,130 @@
+import asyncio
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from caches import TTLCache
+from metrics import REGISTRY, endpoint_label
+
+COALESCED = REGISTRY.counter(
+    "bot_backend_coalesced_total",
+    "Backend GETs by how they were served: flights (sent), shared (joined an identical call in flight) or cached (micro-cache).",
+    ("endpoint", "served")
+)
+
+
+class KeyStats:
+    __slots__ = ("requests", "flights", "shared", "cached")
+
+    def __init__(self):
+        self.requests = self.flights = self.shared = self.cached = 0
+
+
+class SingleFlight:
+    """
+    Collapses identical concurrent backend GETs into one call.
+
+    The first GET for a key (endpoint, query params, headers) starts the
+    call; every identical GET made while it is in flight waits for the same
+    response instead of sending its own, so a burst of shoppers scanning the
+    same item costs one backend round trip. Responses from endpoints under a
+    `cacheable` prefix are also reused for `window` seconds after they
+    arrive (never 5xx); other endpoints are only shared while in flight.
+    Errors reach every waiter and are never cached. A waiter that is
+    cancelled leaves the call running for the others.
+
+    Anything but a plain GET (a body, another method) passes straight
+    through. Per-key counts are kept for the `max_keys` most recent keys.
+    """
+
+    def __init__(self, request, window=0.5, cacheable=(), max_keys=1000, clock=time.monotonic):
+        self.send = request
+        self.cacheable = tuple(cacheable)
+        self.recent = TTLCache(maxsize=max_keys, ttl=window, clock=clock) if window > 0 else None
+        self.max_keys = max_keys
+        self._flights = {}  # key -> task for the call in flight
+        self._keys = OrderedDict()  # key -> KeyStats, least recently used first
+        self.totals = KeyStats()
+        self.passed_through = 0
+
+    @staticmethod
+    def _key(endpoint, params, headers):
+        key = endpoint
+        if params:
+            key += "?" + urlencode(sorted(params.items()))
+        if headers:
+            key += " " + urlencode(sorted((k.lower(), v) for k, v in headers.items()))
+        return key
+
+    def _stats_for(self, key):
+        stats = self._keys.get(key)
+        if stats is None:
+            stats = self._keys[key] = KeyStats()
+            while len(self._keys) > self.max_keys:
+                self._keys.popitem(last=False)
+        else:
+            self._keys.move_to_end(key)
+        return stats
+
+    def _count(self, stats, label, served):
+        for counts in (stats, self.totals):
+            counts.requests += 1
+            setattr(counts, served, getattr(counts, served) + 1)
+        COALESCED.inc((label, served))
+
+    async def request(self, method, endpoint, params=None, headers=None, timeout=None, **kwargs):
+        if method != "GET" or kwargs:
+            self.passed_through += 1
+            return await self.send(method, endpoint, params=params, headers=headers, timeout=timeout, **kwargs)
+
+        key = self._key(endpoint, params, headers)
+        stats = self._stats_for(key)
+        label = endpoint_label(endpoint)
+        if self.recent is not None:
+            res = self.recent.get(key)
+            if res is not None:
+                self._count(stats, label, "cached")
+                return res
+
+        flight = self._flights.get(key)
+        if flight is None:
+            self._count(stats, label, "flights")
+            flight = asyncio.create_task(self.send(method, endpoint, params=params, headers=headers, timeout=timeout))
+            self._flights[key] = flight
+            flight.add_done_callback(lambda task: self._landed(key, endpoint, task))
+        else:
+            self._count(stats, label, "shared")
+        return await asyncio.shield(flight)
+
+    def _landed(self, key, endpoint, task):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        if task.cancelled():
+            return
+        if task.exception() is not None:  # also marks it retrieved if every waiter left
+            return
+        res = task.result()
+        if self.recent is not None and res.status_code < 500 and endpoint.startswith(self.cacheable):
+            self.recent.set(key, res)
+
+    def clear(self):
+        """Forget the micro-cache (calls in flight still complete)."""
+        if self.recent is not None:
+            self.recent.clear()
+
+    def stats(self, top=5):
+        t = self.totals
+        busiest = sorted(self._keys.items(), key=lambda kv: kv[1].requests - kv[1].flights, reverse=True)[:top]
+        return {
+            "requests": t.requests,
+            "flights": t.flights,
+            "shared": t.shared,
+            "cached": t.cached,
+            "savedRate": round(1 - t.flights / t.requests, 3) if t.requests else 0.0,
+            "inFlight": len(self._flights),
+            "passedThrough": self.passed_through,
+            "topKeys": [
+                {"key": key, "requests": s.requests, "flights": s.flights, "shared": s.shared, "cached": s.cached}
+                for key, s in busiest if s.requests > s.flights
+            ]
+        }
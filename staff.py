@@ -0,0 +1,109 @@
+import time
+
+from caches import TTLCache
+
+
+def _ordinal(version):
+    """'<epoch>:<n>' -> (epoch, n) for comparing versions, or None if garbled."""
+    try:
+        epoch, n = str(version).rsplit(":", 1)
+        return int(epoch), int(n)
+    except (TypeError, ValueError):
+        return None
+
+
+class RoleEntry:
+    __slots__ = ("version", "member", "validated_at")
+
+    def __init__(self, version, member, validated_at):
+        self.version = version
+        self.member = member  # {username, role, name}, or None if not staff
+        self.validated_at = validated_at
+
+
+class StaffRoster:
+    """
+    Per-username copy of staff roles, looked up one user at a time.
+
+    `/staff/{username}` answers with that user's role (404 if they are not
+    staff) and the roster version as its ETag; the version changes whenever
+    anyone is added or removed, on every restart too. An answer read within
+    `fresh_for` seconds costs no round trip, negative answers included, so
+    a shopper poking at /staff is as cheap as a staff member. Older entries
+    are revalidated with If-None-Match, a bodiless 304 until the roster
+    changes. Any answer carrying a newer version is the change notice: every
+    entry from an older version is stale from then on, whatever its age.
+
+    The route is not public: lookups carry the bot's `service_token`.
+    """
+
+    def __init__(self, request, service_token, fresh_for=60.0, maxsize=10000, retention=3600.0, clock=time.monotonic):
+        self.request = request
+        self.service_token = service_token
+        self.fresh_for = fresh_for
+        self.clock = clock
+        self.entries = TTLCache(maxsize=maxsize, ttl=retention, clock=clock)
+        self.version = None  # newest roster version seen
+        self.fresh_hits = 0
+        self.revalidated = 0
+        self.fetched = 0
+        self.changes = 0
+
+    async def member(self, username):
+        """The staff record for `username`, or None if they are not staff."""
+        if not username:
+            return None
+        entry = self.entries.get(username)
+        now = self.clock()
+        if entry is not None and entry.version == self.version and now - entry.validated_at <= self.fresh_for:
+            self.fresh_hits += 1
+            return entry.member
+
+        headers = {"x-service-token": self.service_token}
+        if entry is not None and entry.version:
+            headers["If-None-Match"] = f'"{entry.version}"'
+        res = await self.request("GET", f"/staff/{username}", headers=headers)
+        if res.status_code == 304 and entry is not None:
+            entry.validated_at = self.clock()
+            self.revalidated += 1
+            self._seen(entry.version)
+            return entry.member
+        if res.status_code not in (200, 404):
+            raise RuntimeError(f"staff lookup returned {res.status_code}")
+        member = res.json() if res.status_code == 200 else None
+        version = res.headers.get("ETag", "").strip('"') or None
+        self.fetched += 1
+        self.entries.set(username, RoleEntry(version, member, self.clock()))
+        self._seen(version)
+        return member
+
+    async def role(self, username):
+        member = await self.member(username)
+        return member.get("role") if member else None
+
+    def _seen(self, version):
+        """Track the newest version; a late answer from before a change must not roll it back."""
+        new, old = _ordinal(version), _ordinal(self.version)
+        if new is None or (old is not None and new <= old):
+            return
+        if old is not None:
+            self.changes += 1
+        self.version = version
+
+    def invalidate(self, username=None):
+        if username is None:
+            self.entries.clear()
+        else:
+            self.entries.invalidate(username)
+
+    def stats(self):
+        reads = self.fresh_hits + self.revalidated + self.fetched
+        return {
+            "users": len(self.entries),
+            "version": self.version,
+            "freshHits": self.fresh_hits,
+            "revalidated": self.revalidated,
+            "fetched": self.fetched,
+            "zeroTripRate": round(self.fresh_hits / reads, 3) if reads else 0.0,
+            "changes": self.changes
+        }
@@ -1,26 +1,20 @@
 const { spawn } = require('child_process');
 const path = require('path');
 const fs = require('fs');
+const crypto = require('crypto');
 
-const logPath = path.join(__dirname, 'bot.log');
-const logStream = fs.createWriteStream(logPath, { flags: 'w' });
-
+// bot.log belongs to the bot (rotated JSON lines); this script and the
+// bot's stdout/stderr go to the platform's console log only
 function log(msg) {
-    const text = `[Unified Start] ${new Date().toISOString()} - ${msg}\n`;
-    logStream.write(text);
-    process.stdout.write(text);
-}
-
-log("Listing directory contents for debugging...");
-try {
-    const files = fs.readdirSync(__dirname);
-    log(`Contents of ${__dirname}: ${files.join(', ')}`);
-} catch (e) {
-    log(`Error listing dir: ${e.message}`);
+    process.stdout.write(`[Unified Start] ${new Date().toISOString()} - ${msg}\n`);
 }
 
 log("--- Starting Unified Service (Backend + Bot) ---");
 
+// The bot authenticates to the backend with this; unless the platform sets
+// one, both children get a fresh random token per start
+process.env.BOT_SERVICE_TOKEN = process.env.BOT_SERVICE_TOKEN || crypto.randomBytes(32).toString('hex');
+
 // 1. Start Express Backend
 log("Spawning Backend (Node.js)...");
 const backend = spawn('node', ['index.js'], {
@@ -43,45 +37,34 @@ log("Spawning Bot (Python)...");
 let bot;
 
 function spawnBot() {
-    // Try venv paths first (Render/Docker/Nixpacks), then python3, then python
-    const cmds = ['/opt/venv/bin/python', './.venv/bin/python', 'python3', 'python'];
-    let currentCmdIndex = 0;
+    // Prefer a venv interpreter that exists (Render/Docker/Nixpacks) over
+    // guessing; bare names are only tried if the previous one isn't on PATH
+    const venvs = ['/opt/venv/bin/python', './.venv/bin/python'].filter(p => fs.existsSync(path.resolve(__dirname, p)));
+    const cmds = [...venvs, 'python3', 'python'];
 
     function trySpawn(index) {
         const cmd = cmds[index];
-        log(`Attempting to spawn bot with: ${cmd}...`);
+        log(`Spawning bot with: ${cmd}...`);
 
         const p = spawn(cmd, ['-u', 'bot.py'], {
             cwd: __dirname,
-            stdio: ['ignore', 'pipe', 'pipe'],
+            stdio: ['ignore', 'inherit', 'inherit'],
             env: process.env
         });
 
-        p.stdout.on('data', (data) => {
-            logStream.write(data);
-            process.stdout.write(data);
-        });
-
-        p.stderr.on('data', (data) => {
-            logStream.write(data);
-            process.stderr.write(data);
-        });
-
         p.on('error', (err) => {
             if (err.code === 'ENOENT' && index < cmds.length - 1) {
                 log(`${cmd} not found, trying ${cmds[index + 1]}...`);
-                // Note: trySpawn will be called after this error if we structure it right
+                // The retry is the bot from now on (signals go to `bot`)
+                bot = trySpawn(index + 1);
             } else {
                 log(`BOT CRITICAL ERROR (${cmd}): ${err.message}`);
             }
         });
 
         p.on('exit', (code) => {
-            log(`Bot process (${cmd}) exited with code ${code}`);
-            if (code !== 0 && index < cmds.length - 1) {
-                log(`Retrying with next command: ${cmds[index + 1]}...`);
-                trySpawn(index + 1);
-            }
+            // A crash is the bot's problem, not the interpreter's; don't rerun it elsewhere
+            if (code !== null) log(`Bot process (${cmd}) exited with code ${code}`);
         });
 
         return p;
@@ -92,4 +75,15 @@ function spawnBot() {
 
 bot = spawnBot();
 
+// Pass shutdown on so the bot can flush its state and the backend its journal
+for (const signal of ['SIGTERM', 'SIGINT']) {
+    process.on(signal, () => {
+        log(`${signal} received, stopping children...`);
+        for (const child of [bot, backend]) {
+            if (child && child.exitCode === null && child.signalCode === null) child.kill(signal);
+        }
+        process.exitCode = 0;
+    });
+}
+
 log("Both processes initiated. Monitoring...");
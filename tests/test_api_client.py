@@ -0,0 +1,185 @@
+import asyncio
+import os
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import httpx
+
+from api_client import CLOSED, HALF_OPEN, OPEN, BackendClient, EndpointRouter, wait_until_ready
+
+PRIMARY, FALLBACK = "http://primary", "http://fallback"
+
+
+def client_for(handler, base_urls=(PRIMARY, FALLBACK), **kwargs):
+    client = BackendClient(list(base_urls), **kwargs)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+class BackendClientTest(unittest.TestCase):
+    def test_duplicate_base_urls_are_tried_once(self):
+        client = BackendClient([PRIMARY, PRIMARY, FALLBACK])
+        self.assertEqual(client.base_urls, [PRIMARY, FALLBACK])
+
+    def test_longest_matching_prefix_sets_the_timeout(self):
+        client = BackendClient([PRIMARY], timeouts={"/cart/": 5.0, "/cart/bulk": 9.0}, default_timeout=8.0)
+        self.assertEqual(client.timeout_for("/cart/7"), 5.0)
+        self.assertEqual(client.timeout_for("/cart/bulk-add"), 9.0)
+        self.assertEqual(client.timeout_for("/products/1"), 8.0)
+
+    def test_concurrent_calls_are_bounded(self):
+        running = peak = 0
+
+        async def handler(request):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return httpx.Response(200, json={})
+
+        async def main():
+            client = client_for(handler, base_urls=[PRIMARY], max_concurrency=3)
+            await asyncio.gather(*(client.request("GET", f"/products/{n}") for n in range(12)))
+            await client.aclose()
+
+        asyncio.run(main())
+        self.assertEqual(peak, 3)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class RouterTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.router = EndpointRouter([PRIMARY, FALLBACK], failure_threshold=2, reset_timeout=30.0, clock=self.clock)
+        self.primary, self.fallback = self.router.endpoints
+
+    def test_breaker_opens_after_threshold(self):
+        self.router.record_failure(self.primary, "boom")
+        self.assertEqual(self.router.route(), [self.primary, self.fallback])
+        self.router.record_failure(self.primary, "boom")
+        self.assertEqual(self.primary.state, OPEN)
+        self.assertEqual(self.router.route(), [self.fallback])
+
+    def test_success_resets_the_failure_count(self):
+        self.router.record_failure(self.primary, "boom")
+        self.router.record_success(self.primary, 0.01)
+        self.router.record_failure(self.primary, "boom")
+        self.assertEqual(self.primary.state, CLOSED)
+
+    def test_probe_is_due_after_the_cooldown(self):
+        for _ in range(2):
+            self.router.record_failure(self.primary, "boom")
+        self.clock.now = 29.0
+        self.assertEqual(self.router.due_probes(), [])
+        self.clock.now = 30.0
+        self.assertEqual(self.router.due_probes(), [self.primary])
+        self.assertEqual(self.primary.state, HALF_OPEN)
+        self.router.record_failure(self.primary, "probe failed")
+        self.assertEqual(self.primary.state, OPEN)
+        self.assertEqual(self.primary.opened_at, 30.0)
+
+    def test_all_open_still_tries_everything(self):
+        for health in self.router.endpoints:
+            for _ in range(2):
+                self.router.record_failure(health, "boom")
+        self.assertEqual(self.router.route(), [self.primary, self.fallback])
+
+
+class FailoverTest(unittest.TestCase):
+    def run_calls(self, handler, calls=1, **kwargs):
+        async def main():
+            client = client_for(handler, **kwargs)
+            try:
+                return client, [await client.request("GET", "/health") for _ in range(calls)]
+            finally:
+                await client.aclose()
+        return asyncio.run(main())
+
+    def test_network_error_fails_over(self):
+        seen = []
+
+        def handler(request):
+            seen.append(request.url.host)
+            if request.url.host == "primary":
+                raise httpx.ConnectError("refused", request=request)
+            return httpx.Response(200, json={"ok": True})
+
+        client, (res,) = self.run_calls(handler)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(seen, ["primary", "fallback"])
+
+    def test_open_breaker_skips_the_dead_endpoint(self):
+        seen = []
+
+        def handler(request):
+            seen.append(request.url.host)
+            if request.url.host == "primary":
+                return httpx.Response(503)
+            return httpx.Response(200)
+
+        client, responses = self.run_calls(handler, calls=4, failure_threshold=2)
+        self.assertEqual([r.status_code for r in responses], [200] * 4)
+        self.assertEqual(seen.count("primary"), 2)
+        self.assertEqual(client.router.endpoints[0].state, OPEN)
+
+    def test_last_5xx_is_returned(self):
+        client, (res,) = self.run_calls(lambda request: httpx.Response(502))
+        self.assertEqual(res.status_code, 502)
+
+    def test_all_unreachable_raises(self):
+        def handler(request):
+            raise httpx.ConnectError("refused", request=request)
+
+        with self.assertRaises(httpx.ConnectError):
+            self.run_calls(handler)
+
+
+class WaitUntilReadyTest(unittest.TestCase):
+    def test_returns_once_health_answers(self):
+        class Health(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200 if self.path == "/health" else 404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Health)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        ready, attempts, _ = wait_until_ready(["http://127.0.0.1:1", f"http://127.0.0.1:{server.server_address[1]}"])
+        self.assertTrue(ready)
+        self.assertEqual(attempts, 1)
+
+    def test_backs_off_until_the_deadline(self):
+        clock = FakeClock()
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            clock.now += seconds
+
+        ready, attempts, waited = wait_until_ready(["http://127.0.0.1:1"], deadline=2.0, initial_delay=0.1, max_delay=0.5,
+                                                   clock=clock, sleep=sleep)
+        self.assertFalse(ready)
+        self.assertEqual(sleeps[:4], [0.1, 0.2, 0.4, 0.5])
+        self.assertAlmostEqual(sum(sleeps), 2.0)
+        self.assertEqual(attempts, len(sleeps) + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
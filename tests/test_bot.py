@@ -0,0 +1,161 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# bot.py configures logging on import; keep the log file out of the tree
+os.environ.setdefault("LOG_FILE", os.path.join(tempfile.mkdtemp(), "bot.log"))
+os.environ.setdefault("LOG_CONSOLE_LEVEL", "CRITICAL")
+
+import httpx
+
+import bot
+from api_client import EndpointRouter
+from benchmarks._common import StubBackend
+
+PRODUCTS = [
+    {"barcode": str(6000000000000 + i), "name": f"Item {i}", "price": 100 + i, "category": f"Cat {i % 3}"}
+    for i in range(10)
+]
+SHOPPER = 101
+STRANGER = 202
+
+
+class Shopper:
+    """The parts of a Telegram update the handlers touch; keeps every reply."""
+
+    def __init__(self, user_id, web_app_data=None):
+        self.replies = []
+        self.effective_user = SimpleNamespace(id=user_id, username=None)
+        self.message = self.effective_message = SimpleNamespace(
+            reply_text=self.reply_text, web_app_data=SimpleNamespace(data=web_app_data)
+        )
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+class BotTestCase(unittest.TestCase):
+    def setUp(self):
+        self.backend = StubBackend(PRODUCTS, latency=0, jitter=0)
+        self.backend.seed_user(SHOPPER, "Ada")
+        bot.session_cache.clear()
+        bot.carts.entries.clear()
+        bot.singleflight.clear()
+        bot.catalog.replace_all(PRODUCTS)
+        bot.catalog.last_sync = bot.catalog.clock()
+        # Breakers start closed whatever an earlier test did to them
+        bot.backend.router = EndpointRouter(bot.backend.base_urls, failure_threshold=bot.BREAKER_FAILURE_THRESHOLD,
+                                            reset_timeout=bot.BREAKER_RESET_TIMEOUT)
+
+    def send(self, user_id, data):
+        """Hand `data` to the web app handler as `user_id`; returns the replies."""
+        update = Shopper(user_id, data)
+
+        async def scenario():
+            bot.backend._client = httpx.AsyncClient(transport=httpx.MockTransport(self.backend))
+            try:
+                await bot.handle_web_app_data(update, None)
+            finally:
+                await bot.backend._client.aclose()
+
+        asyncio.run(scenario())
+        return update.replies
+
+
+class ScanTest(BotTestCase):
+    def test_logged_out_scan_costs_only_the_session_check(self):
+        replies = self.send(STRANGER, PRODUCTS[0]["barcode"])
+        self.assertIn("run /start", replies[0])
+        self.assertEqual(sum(self.backend.calls.values()), 1)
+        self.assertEqual(self.backend.calls["GET /users/check/:id"], 1)
+
+    def test_scan_shows_product_and_cart_state(self):
+        barcode = PRODUCTS[2]["barcode"]
+        replies = self.send(SHOPPER, barcode)
+        self.assertIn("Item 2", replies[0])
+        self.assertEqual(self.backend.calls["GET /cart/:id"], 1)
+        # Served from the fresh catalog mirror
+        self.assertEqual(self.backend.calls["GET /products/:id"], 0)
+
+    def test_unknown_barcode(self):
+        replies = self.send(SHOPPER, "999")
+        self.assertIn("Item not in database", replies[0])
+
+    def test_missed_deadline_asks_to_scan_again(self):
+        self.backend.latency = 100
+        deadline, bot.SCAN_DEADLINE = bot.SCAN_DEADLINE, 0.05
+        try:
+            replies = self.send(SHOPPER, PRODUCTS[0]["barcode"])
+        finally:
+            bot.SCAN_DEADLINE = deadline
+        self.assertIn("Service is busy", replies[0])
+
+
+class ParseBatchTest(unittest.TestCase):
+    def test_accepted_shapes(self):
+        payload = json.dumps(["111", {"barcode": "222", "quantity": 3}, ["333", 2], ["444"], {"barcode": " 555 "}])
+        self.assertEqual(bot.parse_batch(payload), [("111", 1), ("222", 3), ("333", 2), ("444", 1), ("555", 1)])
+
+    def test_bad_entries_are_dropped_or_defaulted(self):
+        payload = json.dumps(["", None, {"quantity": 2}, ["666", 0], ["777", -1], ["888", "x"]])
+        self.assertEqual(bot.parse_batch(payload), [("888", 1)])
+
+    def test_not_a_batch(self):
+        self.assertIsNone(bot.parse_batch("6000000000001"))
+        self.assertIsNone(bot.parse_batch("VIEW_CART"))
+        self.assertIsNone(bot.parse_batch("[not json"))
+
+
+class ProcessBatchTest(BotTestCase):
+    def test_basket_is_added_with_one_call_and_one_reply(self):
+        basket = [{"barcode": PRODUCTS[0]["barcode"], "quantity": 2}, {"barcode": PRODUCTS[1]["barcode"]}, {"barcode": "999"}]
+        replies = self.send(SHOPPER, json.dumps(basket))
+        self.assertEqual(self.backend.calls["POST /cart/bulk-add"], 1)
+        self.assertEqual(self.backend.calls["POST /cart/add"], 0)
+        self.assertEqual(len(replies), 1)
+        self.assertIn("BASKET ADDED* (3 item(s))", replies[0])
+        self.assertIn("`999`", replies[0])
+        self.assertEqual({i["barcode"]: i["quantity"] for i in self.backend.carts[SHOPPER]},
+                         {PRODUCTS[0]["barcode"]: 2, PRODUCTS[1]["barcode"]: 1})
+
+    def test_cart_cache_takes_the_snapshot_from_the_answer(self):
+        self.send(SHOPPER, json.dumps([PRODUCTS[0]["barcode"]]))
+        self.backend.reset_counts()
+
+        cart = asyncio.run(bot.carts.load(SHOPPER))
+        self.assertEqual([i["barcode"] for i in cart], [PRODUCTS[0]["barcode"]])
+        self.assertEqual(self.backend.calls["GET /cart/:id"], 0)
+
+    def test_oversized_basket_is_refused_without_a_backend_write(self):
+        replies = self.send(SHOPPER, json.dumps([PRODUCTS[0]["barcode"]] * (bot.BATCH_MAX_ITEMS + 1)))
+        self.assertIn("send the basket in parts", replies[0])
+        self.assertEqual(self.backend.calls["POST /cart/bulk-add"], 0)
+
+    def test_empty_basket(self):
+        replies = self.send(SHOPPER, "[]")
+        self.assertIn("basket was empty", replies[0])
+        self.assertEqual(self.backend.calls["POST /cart/bulk-add"], 0)
+
+    def test_logged_out_shopper_is_sent_to_login(self):
+        replies = self.send(STRANGER, json.dumps([PRODUCTS[0]["barcode"]]))
+        self.assertIn("run /start", replies[0])
+        self.assertEqual(self.backend.calls["POST /cart/bulk-add"], 0)
+
+    def test_failed_write_drops_the_cached_cart(self):
+        bot.carts.apply_snapshot(SHOPPER, [], "bench:0")
+        self.backend.failure_rate = 1.0
+        bot.session_cache.set(SHOPPER, {"registered": True, "loggedIn": True})
+
+        replies = self.send(SHOPPER, json.dumps([PRODUCTS[0]["barcode"]]))
+        self.assertIn("Service error", replies[0])
+        self.assertIsNone(bot.carts.entries.get(SHOPPER))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from caches import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TTLCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TTLCache(maxsize=2, ttl=60.0, clock=self.clock)
+
+    def test_entries_expire(self):
+        self.cache.set(1, "a")
+        self.clock.now = 59.0
+        self.assertEqual(self.cache.get(1), "a")
+        self.clock.now = 60.0
+        self.assertIsNone(self.cache.get(1))
+        self.assertEqual(self.cache.stats()["expirations"], 1)
+
+    def test_per_entry_ttl(self):
+        self.cache.set(1, "a", ttl=5.0)
+        self.clock.now = 5.0
+        self.assertIsNone(self.cache.get(1))
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.set(1, "a")
+        self.cache.set(2, "b")
+        self.cache.get(1)
+        self.cache.set(3, "c")
+        self.assertIsNone(self.cache.get(2))
+        self.assertEqual(self.cache.get(1), "a")
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_invalidate_and_hit_rate(self):
+        self.cache.set(1, "a")
+        self.cache.invalidate(1)
+        self.cache.invalidate(1)
+        self.assertIsNone(self.cache.get(1))
+        self.cache.set(2, "b")
+        self.cache.get(2)
+        stats = self.cache.stats()
+        self.assertEqual((stats["invalidations"], stats["hits"], stats["misses"], stats["hitRate"]), (1, 1, 1, 0.5))
+
+
+if __name__ == '__main__':
+    unittest.main()
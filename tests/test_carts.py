@@ -0,0 +1,97 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import httpx
+
+from carts import CartCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CartBackend:
+    """GET /cart/{id} with ETag / If-None-Match, like backend/index.js."""
+
+    def __init__(self):
+        self.items = []
+        self.version = "e:1"
+        self.gets = []  # If-None-Match sent with each GET
+
+    async def request(self, method, endpoint, headers=None, **kwargs):
+        sent = (headers or {}).get("If-None-Match")
+        self.gets.append(sent)
+        etag = f'"{self.version}"'
+        if sent == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        return httpx.Response(200, json=self.items, headers={"ETag": etag})
+
+    def change(self, items, version):
+        self.items, self.version = items, version
+
+
+def item(barcode, quantity=1):
+    return {"barcode": barcode, "name": f"Item {barcode}", "price": 100, "quantity": quantity}
+
+
+class CartCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.backend = CartBackend()
+        self.clock = FakeClock()
+        self.carts = CartCache(self.backend.request, fresh_for=15.0, clock=self.clock)
+
+    def load(self, **kwargs):
+        return asyncio.run(self.carts.load(7, **kwargs))
+
+    def test_fresh_entry_costs_no_round_trip(self):
+        self.load()
+        self.load()
+        self.assertEqual(len(self.backend.gets), 1)
+        self.assertEqual(self.carts.stats()["freshHits"], 1)
+
+    def test_stale_entry_revalidates_with_a_304(self):
+        self.load()
+        self.clock.now = 20.0
+        self.assertEqual(self.load(), [])
+        self.assertEqual(self.backend.gets, [None, '"e:1"'])
+        self.assertEqual(self.carts.stats()["revalidated"], 1)
+
+    def test_revalidate_sees_a_change_made_elsewhere(self):
+        self.load()
+        self.backend.change([item("1")], "e:2")  # e.g. the scanner's own /cart/add
+        self.assertEqual(self.load(), [])  # still fresh
+        self.assertEqual(self.load(revalidate=True), [item("1")])
+
+    def test_add_following_the_cached_version_is_applied(self):
+        self.load()
+        self.carts.apply_add(7, {"cartVersion": "e:2", "item": item("1")})
+        self.assertEqual(self.load(), [item("1")])
+        self.assertEqual(len(self.backend.gets), 1)
+
+    def test_add_after_a_gap_drops_the_entry(self):
+        self.load()
+        self.carts.apply_add(7, {"cartVersion": "e:3", "item": item("1")})
+        self.assertEqual(self.carts.stats()["conflicts"], 1)
+        self.backend.change([item("2"), item("1")], "e:3")
+        self.assertEqual(self.load(), [item("2"), item("1")])
+
+    def test_clear_and_snapshot(self):
+        self.load()
+        self.carts.apply_snapshot(7, [item("1", 3)], "e:5")
+        self.assertEqual(self.load(), [item("1", 3)])
+        self.carts.apply_clear(7, "e:6")
+        self.assertEqual(self.load(), [])
+        self.carts.apply_snapshot(7, [item("1")], None)  # no version: can't trust it
+        self.assertIsNone(self.carts.entries.get(7))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import httpx
+
+from catalog import CatalogMirror
+
+
+def product(barcode, category="Rice", price=100):
+    return {"barcode": barcode, "name": f"Item {barcode}", "price": price, "category": category}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ChangeFeed:
+    """/products/changes answers queued in order; records the cursor each call sent."""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.sent = []
+
+    async def request(self, method, endpoint, params=None, **kwargs):
+        self.sent.append((params or {}).get("since"))
+        return self.answers.pop(0)
+
+
+class Listener:
+    def __init__(self):
+        self.events = []
+
+    def add(self, product):
+        self.events.append(("add", product["barcode"]))
+
+    def discard(self, barcode):
+        self.events.append(("discard", barcode))
+
+    def clear(self):
+        self.events.append(("clear",))
+
+
+class CatalogMirrorTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def mirror(self, *answers):
+        self.feed = ChangeFeed(*answers)
+        return CatalogMirror(self.feed.request, max_staleness=300.0, clock=self.clock)
+
+    def test_full_then_incremental_sync(self):
+        catalog = self.mirror(
+            httpx.Response(200, json={"full": True, "cursor": "c1", "products": [product("1"), product("2", "Oil")]}),
+            httpx.Response(200, json={"cursor": "c2", "products": [product("1", "Grains")], "deleted": ["2"]}),
+        )
+        asyncio.run(catalog.refresh())
+        self.assertEqual(len(catalog), 2)
+        self.assertEqual(list(catalog.in_category("Oil")), ["2"])
+        asyncio.run(catalog.refresh())
+        self.assertEqual(self.feed.sent, [None, "c1"])
+        self.assertIsNone(catalog.get("2"))
+        self.assertEqual(catalog.get(" 1 ")["category"], "Grains")
+        self.assertEqual(catalog.in_category("Rice"), {})
+        self.assertEqual(catalog.in_category("Oil"), {})
+
+    def test_not_modified_keeps_the_mirror_fresh(self):
+        catalog = self.mirror(
+            httpx.Response(200, json={"full": True, "cursor": "c1", "products": [product("1")]}),
+            httpx.Response(304),
+        )
+        self.assertFalse(catalog.is_fresh())
+        asyncio.run(catalog.refresh())
+        self.clock.now = 299.0
+        asyncio.run(catalog.refresh())
+        self.clock.now = 500.0
+        self.assertTrue(catalog.is_fresh())
+        self.assertEqual(catalog.cursor, "c1")
+        self.clock.now = 600.0
+        self.assertFalse(catalog.is_fresh())
+
+    def test_failed_sync_raises_and_stays_stale(self):
+        catalog = self.mirror(httpx.Response(500))
+        with self.assertRaises(RuntimeError):
+            asyncio.run(catalog.refresh())
+        self.assertFalse(catalog.is_fresh())
+
+    def test_listeners_follow_every_change(self):
+        catalog = self.mirror(
+            httpx.Response(200, json={"full": True, "cursor": "c1", "products": [product("1")]}),
+            httpx.Response(200, json={"cursor": "c2", "products": [product("2")], "deleted": ["1"]}),
+        )
+        listener = Listener()
+        catalog.upsert(product("0"))
+        catalog.subscribe(listener)
+        asyncio.run(catalog.refresh())
+        asyncio.run(catalog.refresh())
+        self.assertEqual(listener.events, [("add", "0"), ("clear",), ("add", "1"), ("add", "2"), ("discard", "1")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import httpx
+
+from checkout import CheckoutQueue
+
+
+class CheckoutBackend:
+    """POST /checkout honouring Idempotency-Key, like backend/index.js."""
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)  # statuses or exceptions answered before succeeding
+        self.orders = {}  # key -> order id
+        self.keys = []  # Idempotency-Key sent with each call
+
+    async def request(self, method, endpoint, json=None, headers=None, **kwargs):
+        key = headers["Idempotency-Key"]
+        self.keys.append(key)
+        if self.failures:
+            failure = self.failures.pop(0)
+            if isinstance(failure, Exception):
+                raise failure
+            return httpx.Response(failure, json={"error": "Unavailable"})
+        if not json.get("items"):
+            return httpx.Response(400, json={"error": "Cart is empty"})
+        if key in self.orders:
+            return httpx.Response(200, json={"orderId": self.orders[key]})
+        self.orders[key] = len(self.orders) + 1
+        return httpx.Response(201, json={"orderId": self.orders[key]})
+
+
+class CheckoutQueueTest(unittest.TestCase):
+    def run_queue(self, backend, submissions, **options):
+        """Submit (key, order) pairs, let the workers answer them all; returns (queue, results, accepted)."""
+        results = []
+
+        async def on_result(res, error):
+            results.append((res.status_code if res is not None else None, error))
+
+        async def scenario():
+            queue = CheckoutQueue(backend.request, backoff=0, **options)
+            accepted = [queue.submit(key, order, on_result) for key, order in submissions]
+            workers = asyncio.create_task(queue.run())
+            await queue.join()
+            workers.cancel()
+            return queue, accepted
+
+        queue, accepted = asyncio.run(scenario())
+        return queue, results, accepted
+
+    def test_duplicate_submit_while_pending_adds_nothing(self):
+        backend = CheckoutBackend()
+        order = {"items": [{"barcode": "1", "quantity": 2}]}
+        queue, results, accepted = self.run_queue(backend, [("k1", order), ("k1", order), ("k2", order)])
+        self.assertEqual(accepted, [True, False, True])
+        self.assertEqual(backend.keys, ["k1", "k2"])
+        self.assertEqual(results, [(201, None), (201, None)])
+        stats = queue.stats()
+        self.assertEqual((stats["duplicates"], stats["placed"], stats["pending"]), (1, 2, 0))
+
+    def test_server_errors_and_network_errors_are_retried_with_the_same_key(self):
+        backend = CheckoutBackend(failures=[503, httpx.ConnectError("down")])
+        with self.assertLogs(level="WARNING") as logs:
+            queue, results, _ = self.run_queue(backend, [("k1", {"items": [1]})])
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual(backend.keys, ["k1", "k1", "k1"])
+        self.assertEqual(results, [(201, None)])
+        self.assertEqual(queue.stats()["retries"], 2)
+
+    def test_answer_for_a_key_already_placed_counts_as_replayed(self):
+        backend = CheckoutBackend()
+        backend.orders["k1"] = 7
+        queue, results, _ = self.run_queue(backend, [("k1", {"items": [1]})])
+        self.assertEqual(results, [(200, None)])
+        self.assertEqual(queue.stats()["replayed"], 1)
+
+    def test_client_errors_are_not_retried(self):
+        backend = CheckoutBackend()
+        queue, results, _ = self.run_queue(backend, [("k1", {"items": []})])
+        self.assertEqual(backend.keys, ["k1"])
+        self.assertEqual(results, [(400, None)])
+        self.assertEqual(queue.stats()["rejected"], 1)
+
+    def test_gives_up_after_max_attempts_with_the_last_error(self):
+        backend = CheckoutBackend(failures=[502, 502, 502])
+        with self.assertLogs(level="WARNING"):
+            queue, results, _ = self.run_queue(backend, [("k1", {"items": [1]})], max_attempts=3)
+        self.assertEqual(len(backend.keys), 3)
+        (status, error), = results
+        self.assertIsNone(status)
+        self.assertIn("502", str(error))
+        self.assertEqual(queue.stats()["failed"], 1)
+
+    def test_key_can_be_submitted_again_once_answered(self):
+        backend = CheckoutBackend()
+        order = {"items": [1]}
+        self.run_queue(backend, [("k1", order)])
+        _, results, accepted = self.run_queue(backend, [("k1", order)])
+        self.assertEqual(accepted, [True])
+        self.assertEqual(results, [(200, None)])
+
+    def test_full_queue_raises(self):
+        async def scenario():
+            queue = CheckoutQueue(CheckoutBackend().request, maxsize=1)
+            queue.submit("k1", {}, None)
+            queue.submit("k2", {}, None)
+
+        with self.assertRaises(asyncio.QueueFull):
+            asyncio.run(scenario())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from diagnose_bot import SCENARIOS, compare
+
+
+def result(**overrides):
+    r = {"p95Ms": 10.0, "runsPerSec": 100.0, "backendCallsPerRun": 2.0, "telegramCallsPerRun": 4.0,
+         "failedRuns": 0, "handlerErrors": 0, "errorReplies": 0}
+    r.update(overrides)
+    return r
+
+
+class CompareTest(unittest.TestCase):
+    def test_within_tolerance_is_fine(self):
+        baseline = {"shop": result()}
+        self.assertEqual(compare({"shop": result(p95Ms=12.0, runsPerSec=85.0)}, baseline, 0.25), [])
+
+    def test_regressions_are_reported(self):
+        baseline = {"shop": result()}
+        problems = compare({"shop": result(p95Ms=20.0, backendCallsPerRun=3.0, failedRuns=1)}, baseline, 0.25)
+        self.assertEqual(len(problems), 3)
+        self.assertTrue(all(p.startswith("shop: ") for p in problems))
+
+    def test_scenarios_missing_from_the_baseline_are_skipped(self):
+        self.assertEqual(compare({"admin": result(p95Ms=1000.0)}, {"shop": result()}, 0.25), [])
+
+
+class BenchSmokeTest(unittest.TestCase):
+    def test_every_scenario_runs_clean_against_the_stub(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.json")
+            args = [sys.executable, os.path.join(ROOT, "diagnose_bot.py"), "bench", "--shoppers", "3", "--rounds", "1",
+                    "--latency", "0", "--jitter", "0", "--telegram", "0", "--products", "50", "--json", path]
+            run = subprocess.run(args, capture_output=True, text=True, timeout=120)
+            self.assertEqual(run.returncode, 0, run.stderr)
+            with open(path, encoding="utf-8") as f:
+                scenarios = json.load(f)["scenarios"]
+
+            self.assertEqual(list(scenarios), list(SCENARIOS))
+            for name, r in scenarios.items():
+                self.assertEqual((r["failedRuns"], r["handlerErrors"], r["errorReplies"]), (0, 0, 0), name)
+
+            # A run compared with itself (generous tolerance for timing noise)
+            again = subprocess.run(args[:-2] + ["--compare", path, "--tolerance", "100"], capture_output=True, text=True, timeout=120)
+            self.assertEqual(again.returncode, 0, again.stdout)
+            self.assertIn("[OK] No regressions", again.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
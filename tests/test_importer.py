@@ -0,0 +1,81 @@
+import os
+import sys
+import tempfile
+import tracemalloc
+import unittest
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from importer import iter_xlsx_rows, normalize_price, normalize_row
+
+XLSX_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+
+
+class NormalizePriceTest(unittest.TestCase):
+    def test_decimal_comma_with_dot_thousands(self):
+        self.assertEqual(normalize_price("1.234,50"), 1234)
+
+    def test_decimal_point_with_comma_thousands(self):
+        self.assertEqual(normalize_price("1,234.50"), 1234)
+
+    def test_currency_and_grouping(self):
+        self.assertEqual(normalize_price("₦1,200"), 1200)
+        self.assertEqual(normalize_price("NGN 2,500"), 2500)
+        self.assertEqual(normalize_price("1.234.567"), 1234567)
+        self.assertEqual(normalize_price("12,50"), 12)
+        self.assertEqual(normalize_price(1500.7), 1500)
+
+    def test_ambiguous_separators_are_rejected(self):
+        for value in ("1,2345", "1.2.3", "1,23,4", "abc", "-5"):
+            self.assertIsNone(normalize_price(value), value)
+
+    def test_rejected_price_is_a_row_error(self):
+        product, error = normalize_row({"barcode": "6001234567893", "name": "Rice", "price": "1.2.3"})
+        self.assertIsNone(product)
+        self.assertEqual(error, "invalid price")
+
+
+class XlsxRowsTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def workbook(self, rows):
+        """A minimal .xlsx: header of shared and inline strings, then `rows` products."""
+        cells = ['<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>1</v></c>'
+                 '<c r="C1" t="inlineStr"><is><t>price</t></is></c></row>']
+        for i in range(2, rows + 2):
+            cells.append(f'<row r="{i}"><c r="A{i}"><v>{6000000000000 + i}</v></c>'
+                         f'<c r="B{i}" t="s"><v>2</v></c><c r="C{i}"><v>{i}</v></c></row>')
+        path = os.path.join(self.dir.name, f"{rows}.xlsx")
+        with zipfile.ZipFile(path, "w") as zf:
+            zf.writestr("xl/sharedStrings.xml", f'<sst xmlns="{XLSX_NS}"><si><t>barcode</t></si>'
+                                                f'<si><t>name</t></si><si><t>Rice</t></si></sst>')
+            zf.writestr("xl/worksheets/sheet1.xml", f'<worksheet xmlns="{XLSX_NS}"><sheetData>{"".join(cells)}</sheetData></worksheet>')
+        return path
+
+    def peak_memory(self, path):
+        tracemalloc.start()
+        try:
+            for _ in iter_xlsx_rows(path):
+                pass
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def test_rows_keyed_by_header(self):
+        rows = list(iter_xlsx_rows(self.workbook(2)))
+        self.assertEqual(rows, [
+            {"barcode": "6000000000002", "name": "Rice", "price": "2"},
+            {"barcode": "6000000000003", "name": "Rice", "price": "3"},
+        ])
+
+    def test_memory_does_not_grow_with_rows(self):
+        small = self.peak_memory(self.workbook(4000))
+        large = self.peak_memory(self.workbook(40000))
+        self.assertLess(large, small * 1.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from logsetup import JsonFormatter, SamplingFilter, UpdateContextFilter, bind_update, configure_logging
+
+
+def record(name="bot", level=logging.INFO, msg="hello", **extra):
+    rec = logging.LogRecord(name, level, __file__, 1, msg, None, None)
+    rec.__dict__.update(extra)
+    return rec
+
+
+class SamplingFilterTest(unittest.TestCase):
+    def test_keeps_one_in_n_and_tags_it(self):
+        sampler = SamplingFilter({"httpx": 3})
+        records = [record("httpx._client") for _ in range(7)]
+        kept = [r for r in records if sampler.filter(r)]
+        self.assertEqual(kept, [records[0], records[3], records[6]])
+        self.assertFalse(hasattr(records[0], "sampled"))
+        self.assertEqual(records[3].sampled, "1/3")
+        self.assertEqual(sampler.dropped, 4)
+
+    def test_warnings_and_other_loggers_always_pass(self):
+        sampler = SamplingFilter({"httpx": 100, "quiet": 1})
+        self.assertTrue(all(sampler.filter(record("httpx", logging.WARNING)) for _ in range(5)))
+        self.assertTrue(all(sampler.filter(record("httpxtra")) for _ in range(5)))
+        self.assertTrue(all(sampler.filter(record("quiet")) for _ in range(5)))
+        self.assertEqual(sampler.dropped, 0)
+
+
+class JsonFormatterTest(unittest.TestCase):
+    def test_update_ids_and_extras_become_fields(self):
+        async def handle():
+            bind_update(SimpleNamespace(update_id=55, effective_user=SimpleNamespace(id=7)))
+            rec = record(barcode="6001")
+            UpdateContextFilter().filter(rec)
+            return rec
+
+        entry = json.loads(JsonFormatter().format(asyncio.run(handle())))
+        self.assertEqual((entry["msg"], entry["level"], entry["logger"]), ("hello", "INFO", "bot"))
+        self.assertEqual((entry["update_id"], entry["user_id"], entry["barcode"]), (55, 7, "6001"))
+        self.assertTrue(entry["ts"].endswith("Z"))
+
+    def test_update_ids_stay_in_their_task(self):
+        rec = record()
+        UpdateContextFilter().filter(rec)
+        self.assertFalse(hasattr(rec, "update_id"))
+
+
+class ConfigureLoggingTest(unittest.TestCase):
+    def setUp(self):
+        root = logging.getLogger()
+        self.saved = root.handlers[:], root.level
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "bot.log")
+
+    def tearDown(self):
+        root = logging.getLogger()
+        root.handlers[:], level = self.saved
+        root.setLevel(level)
+        self.dir.cleanup()
+
+    def test_writes_json_lines_from_a_background_thread(self):
+        listener = configure_logging(self.path, console_level=logging.CRITICAL, sample_rates={"noisy": 2})
+        mutable = ["before"]
+        logging.getLogger("bot").info("cart %s", mutable)
+        mutable[0] = "after"
+        for _ in range(4):
+            logging.getLogger("noisy").info("tick")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logging.getLogger("bot").exception("failed")
+        listener.stop()
+
+        with open(self.path, encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual([e["msg"] for e in entries], ["cart ['before']", "tick", "tick", "failed"])
+        self.assertIn("ValueError: boom", entries[-1]["exc"])
+
+
+if __name__ == '__main__':
+    unittest.main()
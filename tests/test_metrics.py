@@ -0,0 +1,95 @@
+import asyncio
+import os
+import sys
+import unittest
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from metrics import (HANDLER_ERRORS, HANDLER_IN_FLIGHT, BackendMetrics, Histogram, MetricsServer, Registry,
+                     endpoint_label, instrumented)
+
+
+class EndpointLabelTest(unittest.TestCase):
+    def test_ids_and_query_strings_collapse(self):
+        self.assertEqual(endpoint_label("/products/6151234567890?x=1"), "/products/:id")
+        self.assertEqual(endpoint_label("/cart/12345"), "/cart/:id")
+        self.assertEqual(endpoint_label("/users/check/987"), "/users/check/:id")
+        self.assertEqual(endpoint_label("/orders/feed?after=3"), "/orders/feed")
+
+    def test_text_parameters_collapse(self):
+        self.assertEqual(endpoint_label("/staff/origichidiah"), "/staff/:username")
+        self.assertEqual(endpoint_label("/staff/someone_else"), "/staff/:username")
+        self.assertEqual(endpoint_label("/products/abc-def"), "/products/:id")
+
+    def test_fixed_product_routes_keep_their_names(self):
+        for route in ("/products/all", "/products/changes", "/products/lookup"):
+            self.assertEqual(endpoint_label(route), route)
+
+
+class HistogramTest(unittest.TestCase):
+    def test_buckets_are_cumulative_at_scrape_time(self):
+        histogram = Histogram("h", "help", ("handler",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(("scan",), value)
+        self.assertEqual(list(histogram.samples()), [
+            'h_bucket{handler="scan",le="0.1"} 2',
+            'h_bucket{handler="scan",le="1.0"} 3',
+            'h_bucket{handler="scan",le="+Inf"} 4',
+            'h_sum{handler="scan"} 2.65',
+            'h_count{handler="scan"} 4',
+        ])
+
+
+class RegistryTest(unittest.TestCase):
+    def test_render_runs_collectors_and_escapes_labels(self):
+        registry = Registry()
+        gauge = registry.gauge("queue_depth", "Jobs waiting.", ("queue",))
+        registry.collectors.append(lambda: gauge.set(('say "hi"\n',), 3))
+        text = registry.render()
+        self.assertIn("# TYPE queue_depth gauge", text)
+        self.assertIn('queue_depth{queue="say \\"hi\\"\\n"} 3', text)
+
+    def test_backend_metrics_use_endpoint_labels(self):
+        metrics = BackendMetrics(Registry())
+        metrics.started()
+        metrics.finished("GET", "/staff/ada", "2xx", 0.01, fallback=True)
+        self.assertEqual(metrics.requests.values, {("GET", "/staff/:username", "2xx"): 1})
+        self.assertEqual(metrics.fallbacks.values, {("/staff/:username",): 1})
+        self.assertEqual(metrics.in_flight.values, {(): 0})
+
+
+class InstrumentedTest(unittest.TestCase):
+    def test_errors_and_in_flight_are_counted_per_label(self):
+        @instrumented(lambda kind: f"test_{kind}")
+        async def handler(kind):
+            if kind == "bad":
+                raise ValueError(kind)
+
+        errors = HANDLER_ERRORS.values.get(("test_bad",), 0)
+        asyncio.run(handler("ok"))
+        with self.assertRaises(ValueError):
+            asyncio.run(handler("bad"))
+        self.assertEqual(HANDLER_ERRORS.values.get(("test_bad",), 0), errors + 1)
+        self.assertEqual(HANDLER_IN_FLIGHT.values[("test_ok",)], 0)
+
+
+class MetricsServerTest(unittest.TestCase):
+    def test_serves_metrics_only(self):
+        registry = Registry()
+        registry.counter("hits_total", "Hits.").inc()
+        server = MetricsServer("127.0.0.1", 0, registry)
+        server.start()
+        try:
+            base = f"http://127.0.0.1:{server.address[1]}"
+            with urllib.request.urlopen(base + "/metrics") as res:
+                self.assertIn("hits_total 1", res.read().decode())
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(base + "/other")
+        finally:
+            server.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
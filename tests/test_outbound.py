@@ -0,0 +1,145 @@
+import asyncio
+import datetime
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from telegram.error import RetryAfter
+
+from outbound import LANE_BACKGROUND, SendScheduler, TokenBucket
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=2.0, burst=2, now=0.0)
+        for _ in range(2):
+            self.assertEqual(bucket.ready_in(0.0), 0.0)
+            bucket.take()
+        self.assertAlmostEqual(bucket.ready_in(0.0), 0.5)
+        self.assertEqual(bucket.ready_in(0.5), 0.0)
+        self.assertFalse(bucket.full(0.5))
+        self.assertTrue(bucket.full(10.0))
+
+
+class SendSchedulerTest(unittest.TestCase):
+    def run_scheduler(self, scenario, **options):
+        async def wrapper():
+            scheduler = SendScheduler(**options)
+            await scheduler.initialize()
+            try:
+                return scheduler, await scenario(scheduler)
+            finally:
+                await scheduler.shutdown()
+
+        return asyncio.run(wrapper())
+
+    @staticmethod
+    def send(scheduler, log, chat_id, text, endpoint="sendMessage", message_id=None, lane=None):
+        async def callback():
+            log.append(text)
+            return text
+
+        data = {"chat_id": chat_id, "text": text}
+        if message_id is not None:
+            data["message_id"] = message_id
+        return scheduler.process_request(callback, (), {}, endpoint, data, lane)
+
+    def test_unthrottled_calls_pass_straight_through(self):
+        log = []
+
+        async def scenario(scheduler):
+            return await self.send(scheduler, log, None, "ok", endpoint="answerCallbackQuery")
+
+        scheduler, result = self.run_scheduler(scenario)
+        self.assertEqual(result, "ok")
+        self.assertEqual(scheduler.sent, 0)
+
+    def test_chat_is_held_to_its_rate_after_the_burst(self):
+        log = []
+
+        async def scenario(scheduler):
+            started = time.monotonic()
+            await asyncio.gather(*(self.send(scheduler, log, 1, str(i)) for i in range(4)))
+            return time.monotonic() - started
+
+        scheduler, elapsed = self.run_scheduler(scenario, overall_rate=1000, chat_rate=20, chat_burst=2)
+        self.assertEqual(log, ["0", "1", "2", "3"])
+        self.assertGreaterEqual(elapsed, 0.09)
+        self.assertEqual(scheduler.sent, 4)
+
+    def test_interactive_sends_go_before_background_ones(self):
+        log = []
+
+        async def scenario(scheduler):
+            sends = [self.send(scheduler, log, chat, f"bg{chat}", lane=LANE_BACKGROUND) for chat in (1, 2, 3)]
+            sends += [self.send(scheduler, log, chat, f"fg{chat}") for chat in (4, 5, 6)]
+            await asyncio.gather(*sends)
+
+        self.run_scheduler(scenario, overall_rate=100, overall_burst=1)
+        self.assertEqual(log, ["fg4", "fg5", "fg6", "bg1", "bg2", "bg3"])
+
+    def test_queued_edit_is_replaced_by_a_newer_one(self):
+        log = []
+
+        async def scenario(scheduler):
+            await self.send(scheduler, log, 1, "first")
+            # The chat's only token is spent: both edits wait, the newer replaces the older
+            return await asyncio.gather(
+                self.send(scheduler, log, 1, "edit 1", endpoint="editMessageText", message_id=9),
+                self.send(scheduler, log, 1, "edit 2", endpoint="editMessageText", message_id=9),
+            )
+
+        scheduler, results = self.run_scheduler(scenario, chat_rate=20, chat_burst=1)
+        self.assertEqual(log, ["first", "edit 2"])
+        self.assertEqual(results, ["edit 2", "edit 2"])
+        self.assertEqual(scheduler.coalesced, 1)
+
+    def test_flood_wait_pauses_and_retries(self):
+        calls = []
+
+        async def flaky():
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                raise RetryAfter(datetime.timedelta(milliseconds=50))
+            return "sent"
+
+        async def scenario(scheduler):
+            return await scheduler.process_request(flaky, (), {}, "sendMessage", {"chat_id": 1}, None)
+
+        with self.assertLogs(level="WARNING"):
+            scheduler, result = self.run_scheduler(scenario)
+        self.assertEqual(result, "sent")
+        self.assertEqual(scheduler.flood_waits, 1)
+        self.assertGreaterEqual(calls[1] - calls[0], 0.04)
+
+    def test_gives_up_after_max_retries(self):
+        async def flooded():
+            raise RetryAfter(datetime.timedelta(milliseconds=1))
+
+        async def scenario(scheduler):
+            return await scheduler.process_request(flooded, (), {}, "sendMessage", {"chat_id": 1}, None)
+
+        with self.assertLogs(level="WARNING"), self.assertRaises(RetryAfter):
+            self.run_scheduler(scenario, max_retries=1)
+
+    def test_shutdown_releases_queued_sends(self):
+        log = []
+
+        async def scenario(scheduler):
+            await self.send(scheduler, log, 1, "first")
+            waiting = asyncio.ensure_future(self.send(scheduler, log, 1, "second"))
+            await asyncio.sleep(0.01)
+            self.assertEqual(scheduler.stats()["queued"]["interactive"], 1)
+            await scheduler.shutdown()
+            return await waiting
+
+        scheduler, result = self.run_scheduler(scenario, chat_rate=0.01, chat_burst=1)
+        self.assertEqual(result, "second")
+        self.assertEqual(log, ["first", "second"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from persistence import SQLitePersistence
+
+
+class SQLitePersistenceTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "bot.sqlite3")
+        self.stores = []
+
+    def tearDown(self):
+        for store in self.stores:
+            store.close()
+        self.dir.cleanup()
+
+    def open(self):
+        store = SQLitePersistence(self.path)
+        self.stores.append(store)
+        return store
+
+    def test_round_trip_across_restart(self):
+        async def scenario():
+            store = self.open()
+            await store.update_user_data(1, {"step": "phone", "name": "Ada"})
+            await store.update_chat_data(10, {"lang": "en"})
+            await store.update_conversation("register", (10, 1), 2)
+            store.close()
+            self.stores.remove(store)
+
+            reopened = self.open()
+            return (await reopened.get_user_data(), await reopened.get_chat_data(),
+                    await reopened.get_conversations("register"))
+
+        user_data, chat_data, states = asyncio.run(scenario())
+        self.assertEqual(user_data, {1: {"step": "phone", "name": "Ada"}})
+        self.assertEqual(chat_data, {10: {"lang": "en"}})
+        self.assertEqual(states, {(10, 1): 2})
+
+    def test_burst_is_written_in_one_transaction(self):
+        async def scenario():
+            store = self.open()
+            await asyncio.gather(*(store.update_user_data(i, {"n": i}) for i in range(50)))
+            return store
+
+        store = asyncio.run(scenario())
+        self.assertEqual(store.flushes, 1)
+        self.assertEqual(store.rows_written, 50)
+
+    def test_drop_and_ended_conversation_delete_rows(self):
+        async def scenario():
+            store = self.open()
+            await store.update_user_data(1, {"a": 1})
+            await store.update_chat_data(2, {"b": 2})
+            await store.update_conversation("checkout", (2, 1), 0)
+            await store.drop_user_data(1)
+            await store.drop_chat_data(2)
+            await store.update_conversation("checkout", (2, 1), None)
+            return (await store.get_user_data(), await store.get_chat_data(),
+                    await store.get_conversations("checkout"))
+
+        self.assertEqual(asyncio.run(scenario()), ({}, {}, {}))
+
+    def test_failed_write_keeps_the_batch_without_clobbering_newer_values(self):
+        async def scenario():
+            store = self.open()
+            write = store._write
+
+            def failing(batch):
+                store._write = write
+                # A newer value recorded while the first write was failing
+                store._pending["user_data"][1] = {"v": 2}
+                raise OSError("disk full")
+
+            store._write = failing
+            with self.assertRaises(OSError):
+                await store.update_user_data(1, {"v": 1})
+            await store.update_user_data(3, {"v": 3})
+            return await store.get_user_data()
+
+        self.assertEqual(asyncio.run(scenario()), {1: {"v": 2}, 3: {"v": 3}})
+
+    def test_stats_report_average_flush_time(self):
+        store = self.open()
+        self.assertIsNone(store.stats()["avgFlushMs"])
+        asyncio.run(store.update_user_data(1, {}))
+        self.assertEqual(store.stats()["flushes"], 1)
+        self.assertIsNotNone(store.stats()["avgFlushMs"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from photoscan import HAVE_OPENCV, PhotoDecoder, PhotoDecoderBusy, _valid_gtin, decode_image
+
+QR_TEXT = "https://pricelessshopper.example/p/6001234567890"
+
+
+def qr_png(text):
+    import cv2
+    label = cv2.QRCodeEncoder.create().encode(text)
+    label = cv2.resize(label, None, fx=8, fy=8, interpolation=cv2.INTER_NEAREST)
+    label = cv2.copyMakeBorder(label, 64, 64, 64, 64, cv2.BORDER_CONSTANT, value=255)
+    return cv2.imencode(".png", label)[1].tobytes()
+
+
+def blank_png():
+    import cv2
+    import numpy as np
+    return cv2.imencode(".png", np.full((200, 300), 255, np.uint8))[1].tobytes()
+
+
+class ValidGtinTest(unittest.TestCase):
+    def test_check_digits(self):
+        self.assertTrue(_valid_gtin("4006381333931"))   # EAN-13
+        self.assertFalse(_valid_gtin("4006381333932"))
+        self.assertTrue(_valid_gtin("036000291452"))    # UPC-A
+        self.assertFalse(_valid_gtin("036000291453"))
+        self.assertTrue(_valid_gtin("96385074"))        # EAN-8
+        self.assertFalse(_valid_gtin("96385075"))
+
+    def test_other_codes_pass_through(self):
+        self.assertTrue(_valid_gtin("12345"))
+        self.assertTrue(_valid_gtin("ABC-123"))
+
+
+@unittest.skipUnless(HAVE_OPENCV, "needs opencv-python-headless")
+class DecodeImageTest(unittest.TestCase):
+    def test_reads_a_qr_code(self):
+        self.assertEqual(decode_image(qr_png(QR_TEXT)), [QR_TEXT])
+
+    def test_nothing_to_read(self):
+        self.assertEqual(decode_image(blank_png()), [])
+
+    def test_not_an_image(self):
+        with self.assertRaises(ValueError):
+            decode_image(b"definitely not a photo")
+
+
+@unittest.skipUnless(HAVE_OPENCV, "needs opencv-python-headless")
+class PhotoDecoderTest(unittest.TestCase):
+    def run_decoder(self, scenario, **options):
+        async def wrapper():
+            decoder = PhotoDecoder(workers=1, **options)
+            try:
+                return decoder, await scenario(decoder)
+            finally:
+                await decoder.aclose()
+
+        return asyncio.run(wrapper())
+
+    def test_same_photo_is_decoded_once_then_cached(self):
+        downloads = []
+
+        async def download():
+            downloads.append(1)
+            return qr_png(QR_TEXT)
+
+        async def scenario(decoder):
+            first = await asyncio.gather(decoder.decode("photo-1", download), decoder.decode("photo-1", download))
+            again = await decoder.decode("photo-1", download)
+            return first + [again]
+
+        decoder, results = self.run_decoder(scenario)
+        self.assertEqual(results, [[QR_TEXT]] * 3)
+        self.assertEqual(len(downloads), 1)
+        self.assertEqual((decoder.decoded, decoder.shared, decoder.cache.hits), (1, 1, 1))
+
+    def test_bad_image_fails_without_losing_the_worker(self):
+        async def garbage():
+            return b"not a photo"
+
+        async def blank():
+            return blank_png()
+
+        async def scenario(decoder):
+            with self.assertRaises(ValueError):
+                await decoder.decode("photo-1", garbage)
+            return await decoder.decode("photo-2", blank)
+
+        with self.assertLogs(level="WARNING"):
+            decoder, codes = self.run_decoder(scenario)
+        self.assertEqual(codes, [])
+        self.assertEqual((decoder.errors, decoder.restarts), (1, 0))
+
+    def test_too_many_waiting_is_refused(self):
+        async def scenario(decoder):
+            release = asyncio.Event()
+
+            async def slow_download():
+                await release.wait()
+                return blank_png()
+
+            first = asyncio.create_task(decoder.decode("photo-1", slow_download))
+            await asyncio.sleep(0.01)
+            with self.assertRaises(PhotoDecoderBusy):
+                await decoder.decode("photo-2", slow_download)
+            release.set()
+            return await first
+
+        decoder, codes = self.run_decoder(scenario, max_waiting=0)
+        self.assertEqual(codes, [])
+        self.assertEqual(decoder.rejected, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
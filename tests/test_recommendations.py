@@ -0,0 +1,80 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from catalog import CatalogMirror
+from recommendations import RecommendationIndex
+
+
+def product(barcode, category="Rice"):
+    return {"barcode": barcode, "name": f"Item {barcode}", "price": 100, "category": category}
+
+
+class CountingCatalog(CatalogMirror):
+    def __init__(self):
+        super().__init__(request=None)
+        self.gets = 0
+
+    def get(self, barcode):
+        self.gets += 1
+        return super().get(barcode)
+
+
+class RecommendationIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.catalog = CountingCatalog()
+        self.index = RecommendationIndex(self.catalog)
+        self.catalog.subscribe(self.index)
+
+    def test_bought_together_first(self):
+        self.catalog.replace_all([product("1"), product("2"), product("3", "Oil")])
+        self.index.add_basket(["1", "3"])
+        self.index.add_basket(["1", "3"])
+        self.index.add_basket(["1", "2"])
+        self.index.commit()
+        picks = [p["barcode"] for p in self.index.recommend(product("1"))]
+        self.assertEqual(picks[:2], ["3", "2"])
+
+    def test_item_is_categorized_once_the_catalog_adds_it(self):
+        self.index.add_basket(["1"])
+        self.index.commit()
+        self.assertEqual(self.index.stats()["unresolved"], 1)
+
+        self.catalog.upsert(product("1"))
+        self.index.commit()
+        self.assertEqual(self.index.stats()["unresolved"], 0)
+        self.assertEqual([p["barcode"] for p in self.index.recommend(product("9"))], ["1"])
+
+    def test_unresolved_items_are_not_rescanned_every_commit(self):
+        self.index.add_basket(["1", "2"])
+        self.index.commit()
+        gets = self.catalog.gets
+        for _ in range(5):
+            self.index.commit()
+        self.assertEqual(self.catalog.gets, gets)
+
+    def test_deleted_barcodes_leave_the_unresolved_set(self):
+        self.catalog.upsert(product("1"))
+        self.index.add_basket(["1"])
+        self.catalog.remove("1")
+        self.index.commit()
+        self.assertEqual(self.index.stats()["unresolved"], 1)
+        self.catalog.upsert(product("1"))
+        self.catalog.remove("1")
+        self.index.commit()
+        self.assertEqual(self.index.stats()["unresolved"], 0)
+
+    def test_category_change_moves_the_item(self):
+        self.catalog.upsert(product("1", "Rice"))
+        self.index.add_basket(["1"])
+        self.index.commit()
+        self.catalog.upsert(product("1", "Grains"))
+        self.index.commit()
+        self.assertEqual(self.index.recommend(product("9", "Rice")), [])
+        self.assertEqual([p["barcode"] for p in self.index.recommend(product("9", "Grains"))], ["1"])
+
+
+if __name__ == '__main__':
+    unittest.main()
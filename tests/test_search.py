@@ -0,0 +1,55 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from search import ProductSearchIndex, within_distance
+
+
+def names(results):
+    return [p["name"] for p in results[0]]
+
+
+class ProductSearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = ProductSearchIndex()
+        for n, name in enumerate(["Milo 400g", "Milk Powder", "Nestle Milo Refill", "Peak Milk", "Golden Penny Semovita"]):
+            self.index.add({"barcode": f"600{n}", "name": name, "price": 100})
+
+    def test_exact_matches_come_first_shortest_name_first(self):
+        self.assertEqual(names(self.index.search("milo")), ["Milo 400g", "Nestle Milo Refill"])
+
+    def test_prefix_and_barcode(self):
+        self.assertEqual(set(names(self.index.search("mil"))), {"Milo 400g", "Milk Powder", "Peak Milk", "Nestle Milo Refill"})
+        self.assertEqual(names(self.index.search("6004")), ["Golden Penny Semovita"])
+
+    def test_typo_falls_back_to_fuzzy(self):
+        self.assertEqual(names(self.index.search("nestel")), ["Nestle Milo Refill"])
+
+    def test_every_word_must_match(self):
+        results, total = self.index.search("peak milk")
+        self.assertEqual((names((results, total)), total), (["Peak Milk"], 1))
+
+    def test_pages_and_totals(self):
+        first, total = self.index.search("mil", offset=0, limit=2)
+        rest, _ = self.index.search("mil", offset=2, limit=2)
+        self.assertEqual(total, 4)
+        self.assertEqual(len({p["barcode"] for p in first + rest}), 4)
+
+    def test_discard_and_rename(self):
+        self.index.discard("6000")
+        self.assertEqual(names(self.index.search("milo")), ["Nestle Milo Refill"])
+        self.index.add({"barcode": "6003", "name": "Peak Evaporated", "price": 100})
+        self.assertEqual(names(self.index.search("peak evap")), ["Peak Evaporated"])
+        self.assertNotIn("6003", self.index.postings.get("milk", ()))
+
+    def test_within_distance(self):
+        self.assertTrue(within_distance("nestel", "nestle", 1))
+        self.assertTrue(within_distance("semovta", "semovita", 1))
+        self.assertFalse(within_distance("nesetl", "nestle", 1))
+        self.assertFalse(within_distance("milo", "semovita", 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import httpx
+
+from singleflight import SingleFlight
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class SlowBackend:
+    """Answers every call once `release` is set; records what was sent."""
+
+    def __init__(self, status=200, error=None):
+        self.status = status
+        self.error = error
+        self.calls = []
+        self.release = asyncio.Event()
+
+    async def request(self, method, endpoint, params=None, headers=None, timeout=None, **kwargs):
+        self.calls.append((method, endpoint, params, headers, kwargs))
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return httpx.Response(self.status, json={"endpoint": endpoint})
+
+
+async def settle():
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_identical_gets_in_flight_share_one_call(self):
+        async def scenario():
+            backend = SlowBackend()
+            flight = SingleFlight(backend.request, window=0)
+            waiters = [asyncio.create_task(flight.request("GET", "/products/123")) for _ in range(10)]
+            await settle()
+            backend.release.set()
+            responses = await asyncio.gather(*waiters)
+            return backend, flight, responses
+
+        backend, flight, responses = asyncio.run(scenario())
+        self.assertEqual(len(backend.calls), 1)
+        self.assertTrue(all(res is responses[0] for res in responses))
+        stats = flight.stats()
+        self.assertEqual((stats["requests"], stats["flights"], stats["shared"]), (10, 1, 9))
+        self.assertEqual(stats["inFlight"], 0)
+        self.assertEqual(stats["topKeys"][0]["key"], "/products/123")
+
+    def test_params_and_headers_are_part_of_the_key(self):
+        async def scenario():
+            backend = SlowBackend()
+            flight = SingleFlight(backend.request, window=0)
+            waiters = [
+                asyncio.create_task(flight.request("GET", "/products/all", params={"a": 1, "b": 2})),
+                asyncio.create_task(flight.request("GET", "/products/all", params={"b": 2, "a": 1})),
+                asyncio.create_task(flight.request("GET", "/products/all", params={"a": 2})),
+                asyncio.create_task(flight.request("GET", "/products/all", headers={"If-None-Match": '"1"'})),
+            ]
+            await settle()
+            backend.release.set()
+            await asyncio.gather(*waiters)
+            return backend
+
+        self.assertEqual(len(asyncio.run(scenario()).calls), 3)
+
+    def test_writes_and_bodies_pass_through(self):
+        async def scenario():
+            backend = SlowBackend()
+            backend.release.set()
+            flight = SingleFlight(backend.request, window=0)
+            await asyncio.gather(
+                flight.request("POST", "/cart/add", json={"barcode": "1"}),
+                flight.request("POST", "/cart/add", json={"barcode": "1"}),
+                flight.request("GET", "/cart/1", json={}),
+            )
+            return backend, flight
+
+        backend, flight = asyncio.run(scenario())
+        self.assertEqual(len(backend.calls), 3)
+        self.assertEqual(flight.passed_through, 3)
+        self.assertEqual(flight.stats()["requests"], 0)
+
+    def test_micro_cache_only_for_cacheable_prefixes_within_window(self):
+        clock = FakeClock()
+
+        async def scenario():
+            backend = SlowBackend()
+            backend.release.set()
+            flight = SingleFlight(backend.request, window=0.5, cacheable=("/products/",), clock=clock)
+            await flight.request("GET", "/products/1")
+            await flight.request("GET", "/products/1")
+            await flight.request("GET", "/cart/1")
+            await flight.request("GET", "/cart/1")
+            clock.now = 1.0
+            await flight.request("GET", "/products/1")
+            return backend, flight
+
+        backend, flight = asyncio.run(scenario())
+        self.assertEqual([call[1] for call in backend.calls], ["/products/1", "/cart/1", "/cart/1", "/products/1"])
+        self.assertEqual(flight.stats()["cached"], 1)
+
+    def test_server_errors_are_not_cached(self):
+        async def scenario():
+            backend = SlowBackend(status=503)
+            backend.release.set()
+            flight = SingleFlight(backend.request, window=10, cacheable=("/",))
+            await flight.request("GET", "/products/1")
+            await flight.request("GET", "/products/1")
+            return backend
+
+        self.assertEqual(len(asyncio.run(scenario()).calls), 2)
+
+    def test_errors_reach_every_waiter_and_are_not_kept(self):
+        async def scenario():
+            backend = SlowBackend(error=httpx.ConnectError("down"))
+            flight = SingleFlight(backend.request, window=10, cacheable=("/",))
+            waiters = [asyncio.create_task(flight.request("GET", "/products/1")) for _ in range(3)]
+            await settle()
+            backend.release.set()
+            results = await asyncio.gather(*waiters, return_exceptions=True)
+            backend.error = None
+            again = await flight.request("GET", "/products/1")
+            return backend, results, again
+
+        backend, results, again = asyncio.run(scenario())
+        self.assertTrue(all(isinstance(r, httpx.ConnectError) for r in results))
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(len(backend.calls), 2)
+
+    def test_cancelled_waiter_leaves_the_call_running_for_others(self):
+        async def scenario():
+            backend = SlowBackend()
+            flight = SingleFlight(backend.request, window=0)
+            first = asyncio.create_task(flight.request("GET", "/products/1"))
+            second = asyncio.create_task(flight.request("GET", "/products/1"))
+            await settle()
+            first.cancel()
+            await settle()
+            backend.release.set()
+            return backend, await second, first.cancelled()
+
+        backend, res, cancelled = asyncio.run(scenario())
+        self.assertTrue(cancelled)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(backend.calls), 1)
+
+    def test_per_key_stats_are_bounded(self):
+        async def scenario():
+            backend = SlowBackend()
+            backend.release.set()
+            flight = SingleFlight(backend.request, window=0, max_keys=3)
+            for i in range(10):
+                await flight.request("GET", f"/products/{i}")
+            return flight
+
+        self.assertEqual(len(asyncio.run(scenario())._keys), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import httpx
+
+from staff import StaffRoster
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class StaffBackend:
+    """GET /staff/{username} with the roster version as ETag, like backend/index.js."""
+
+    def __init__(self, token="svc"):
+        self.token = token
+        self.staff = {"ada": {"username": "ada", "role": "STAFF", "name": "Ada"}}
+        self.version = "100:1"
+        self.sent = []  # (username, If-None-Match) per call
+
+    async def request(self, method, endpoint, headers=None, **kwargs):
+        headers = headers or {}
+        username = endpoint.rsplit("/", 1)[1]
+        self.sent.append((username, headers.get("If-None-Match")))
+        if headers.get("x-service-token") != self.token:
+            return httpx.Response(403, json={"error": "Forbidden"})
+        etag = f'"{self.version}"'
+        if headers.get("If-None-Match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        member = self.staff.get(username)
+        if member is None:
+            return httpx.Response(404, json={"error": "Not staff"}, headers={"ETag": etag})
+        return httpx.Response(200, json=member, headers={"ETag": etag})
+
+
+class StaffRosterTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.backend = StaffBackend()
+        self.roster = StaffRoster(self.backend.request, "svc", fresh_for=60, clock=self.clock)
+
+    def test_fresh_answers_cost_no_round_trip(self):
+        async def scenario():
+            return [await self.roster.role("ada"), await self.roster.role("ada"),
+                    await self.roster.role("bob"), await self.roster.role("bob")]
+
+        self.assertEqual(asyncio.run(scenario()), ["STAFF", "STAFF", None, None])
+        self.assertEqual([name for name, _ in self.backend.sent], ["ada", "bob"])
+        self.assertEqual(self.roster.stats()["freshHits"], 2)
+
+    def test_old_entry_is_revalidated_with_its_version(self):
+        async def scenario():
+            await self.roster.role("ada")
+            self.clock.now = 61
+            return await self.roster.role("ada")
+
+        self.assertEqual(asyncio.run(scenario()), "STAFF")
+        self.assertEqual(self.backend.sent, [("ada", None), ("ada", '"100:1"')])
+        self.assertEqual(self.roster.stats()["revalidated"], 1)
+
+    def test_newer_version_makes_every_older_entry_stale(self):
+        async def scenario():
+            await self.roster.role("ada")
+            await self.roster.role("bob")
+            self.backend.staff["bob"] = {"username": "bob", "role": "SUPER_ADMIN", "name": "Bob"}
+            del self.backend.staff["ada"]
+            self.backend.version = "100:2"
+            self.roster.invalidate("bob")
+            bob = await self.roster.role("bob")
+            # Still inside fresh_for, but from before the change
+            ada = await self.roster.role("ada")
+            return bob, ada
+
+        self.assertEqual(asyncio.run(scenario()), ("SUPER_ADMIN", None))
+        self.assertEqual(self.backend.sent[-1], ("ada", '"100:1"'))
+        self.assertEqual(self.roster.stats()["changes"], 1)
+
+    def test_late_answer_does_not_roll_the_version_back(self):
+        self.roster._seen("100:5")
+        self.roster._seen("100:3")
+        self.roster._seen("garbled")
+        self.assertEqual(self.roster.version, "100:5")
+        self.roster._seen("101:1")
+        self.assertEqual(self.roster.version, "101:1")
+
+    def test_lookups_carry_the_service_token(self):
+        stranger = StaffRoster(self.backend.request, "wrong", clock=self.clock)
+        with self.assertRaises(RuntimeError):
+            asyncio.run(stranger.role("ada"))
+        self.assertEqual(asyncio.run(self.roster.role("ada")), "STAFF")
+
+    def test_no_username_is_not_staff(self):
+        self.assertIsNone(asyncio.run(self.roster.member(None)))
+        self.assertEqual(self.backend.sent, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from webhook import OrderedUpdateProcessor, WebhookServer, run_webhook
+
+
+class StubApplication:
+    update_queue = asyncio.Queue()
+    bot = None
+
+
+class WebhookServerStopTest(unittest.TestCase):
+    def _stop_in_thread(self, server):
+        stopper = threading.Thread(target=server.stop, daemon=True)
+        stopper.start()
+        stopper.join(timeout=5)
+        return not stopper.is_alive()
+
+    def test_stop_without_start_returns(self):
+        server = WebhookServer(StubApplication(), None, "127.0.0.1", 0, "/hook")
+        self.assertTrue(self._stop_in_thread(server), "stop() hung on a server that was never started")
+
+    def test_stop_after_start_returns(self):
+        server = WebhookServer(StubApplication(), None, "127.0.0.1", 0, "/hook")
+        server.start()
+        self.assertTrue(self._stop_in_thread(server))
+
+
+class WebhookBacklogTest(unittest.TestCase):
+    def test_queued_updates_count_once(self):
+        application = StubApplication()
+        application.update_queue = asyncio.Queue()
+        processor = OrderedUpdateProcessor(4)
+        server = WebhookServer(application, None, "127.0.0.1", 0, "/hook", processor=processor)
+        try:
+            for n in range(3):  # what _enqueue does: track, then put
+                processor.track()
+                application.update_queue.put_nowait(n)
+            self.assertEqual(server.backlog(), 3)
+        finally:
+            server.stop()
+
+    def test_without_processor_counts_the_queue(self):
+        application = StubApplication()
+        application.update_queue = asyncio.Queue()
+        server = WebhookServer(application, None, "127.0.0.1", 0, "/hook")
+        try:
+            application.update_queue.put_nowait(1)
+            self.assertEqual(server.backlog(), 1)
+        finally:
+            server.stop()
+
+
+class RecordingApplication:
+    """Just enough of telegram.ext.Application for run_webhook, noting each step."""
+
+    def __init__(self):
+        self.calls = []
+        self.update_queue = asyncio.Queue()
+        self.update_processor = None
+        self.running = False
+        self.bot = self
+        self.post_init = self._hook("post_init")
+        self.post_shutdown = self._hook("post_shutdown")
+
+    def _hook(self, name):
+        async def hook(application):
+            self.calls.append(name)
+        return hook
+
+    async def initialize(self):
+        self.calls.append("initialize")
+
+    async def set_webhook(self, **kwargs):
+        self.calls.append("set_webhook")
+
+    async def start(self):
+        self.running = True
+        self.calls.append("start")
+
+    async def stop(self):
+        self.running = False
+        self.calls.append("stop")
+
+    async def shutdown(self):
+        self.calls.append("shutdown")
+
+
+class RunWebhookTest(unittest.TestCase):
+    def test_shutdown_runs_before_post_shutdown(self):
+        application = RecordingApplication()
+
+        async def main():
+            stop_signal = asyncio.Event()
+            stop_signal.set()
+            await run_webhook(application, "https://example.invalid/hook", "127.0.0.1", 0, "/hook", stop_signal=stop_signal)
+
+        asyncio.run(main())
+        self.assertEqual(application.calls, ["initialize", "post_init", "set_webhook", "start", "stop", "shutdown", "post_shutdown"])
+
+
+if __name__ == '__main__':
+    unittest.main()
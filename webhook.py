@@ -0,0 +1,195 @@
+import asyncio
+import json
+import logging
+import signal
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+def ordering_key(update):
+    """Updates sharing a key are handled strictly in arrival order."""
+    if isinstance(update, Update):
+        if update.effective_user:
+            return ("user", update.effective_user.id)
+        if update.effective_chat:
+            return ("chat", update.effective_chat.id)
+    return None
+
+
+class OrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Processes up to `max_concurrent_updates` updates at once, but never two
+    updates from the same user at the same time, and always in the order
+    they arrived. Different shoppers run in parallel; one shopper's taps
+    can't race each other (which ConversationHandler and the checkout flow
+    rely on).
+
+    PTB's own semaphore bounds everything accepted, including updates still
+    waiting behind an earlier one from the same user (`max_pending`); the
+    work limit is applied only once an update's turn comes, so a user
+    tapping fast can't tie up slots other users could run in.
+    """
+
+    def __init__(self, max_concurrent_updates, max_pending=None):
+        super().__init__(max_pending or max_concurrent_updates * 16)
+        self.max_running = max_concurrent_updates
+        self._running = asyncio.Semaphore(max_concurrent_updates)
+        self._tails = {}  # ordering key -> future resolved when that key's latest update finishes
+        self._counts = threading.Lock()  # accepted moves on the webhook's threads, completed on the loop
+        self.accepted = 0
+        self.completed = 0
+
+    @property
+    def pending(self):
+        with self._counts:
+            return self.accepted - self.completed
+
+    def track(self):
+        with self._counts:
+            self.accepted += 1
+
+    async def do_process_update(self, update, coroutine):
+        key = ordering_key(update)
+        previous = self._tails.get(key) if key is not None else None
+        done = asyncio.get_running_loop().create_future()
+        if key is not None:
+            self._tails[key] = done
+        try:
+            if previous is not None:
+                await asyncio.shield(previous)
+            async with self._running:
+                await coroutine
+        finally:
+            done.set_result(None)
+            if key is not None and self._tails.get(key) is done:
+                del self._tails[key]
+            with self._counts:
+                self.completed += 1
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+
+class _ListenerServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # socketserver's default of 5 drops connections under bursts
+
+
+class WebhookServer:
+    """
+    Tiny HTTP listener for Telegram webhook POSTs.
+
+    Runs http.server in a background thread; each valid update is decoded and
+    handed to the application's update queue on the event loop, and Telegram
+    gets its 200 straight away. When more than `max_backlog` updates are
+    queued or in flight it answers 503 so Telegram backs off and redelivers
+    later instead of us buffering without limit.
+    """
+
+    def __init__(self, application, loop, listen, port, path, secret=None, max_backlog=1000, processor=None):
+        self.application = application
+        self.loop = loop
+        self.path = path
+        self.secret = secret
+        self.max_backlog = max_backlog
+        self.processor = processor
+        self.received = 0
+        self.rejected = 0
+        self._server = _ListenerServer((listen, port), self._handler_class())
+        self.address = self._server.server_address
+        self._thread = None
+
+    def backlog(self):
+        # Tracked updates count as pending from before they are queued, so
+        # the queue must not be added on top
+        if self.processor:
+            return self.processor.pending
+        return self.application.update_queue.qsize()
+
+    def _enqueue(self, data):
+        update = Update.de_json(data, self.application.bot)
+        if self.processor:
+            self.processor.track()
+        asyncio.run_coroutine_threadsafe(self.application.update_queue.put(update), self.loop)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != server.path:
+                    return self._reply(404)
+                if server.secret and self.headers.get("X-Telegram-Bot-Api-Secret-Token") != server.secret:
+                    return self._reply(403)
+                if server.backlog() >= server.max_backlog:
+                    server.rejected += 1
+                    return self._reply(503)
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    data = json.loads(self.rfile.read(length))
+                    server._enqueue(data)
+                except Exception as e:
+                    logging.warning(f"[Webhook] Bad update payload: {e!r}")
+                    return self._reply(400)
+                server.received += 1
+                self._reply(200)
+
+            def _reply(self, status):
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass  # one line per update would drown bot.log
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="webhook-server", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        # shutdown() waits for serve_forever to notice; never started, it would wait forever
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+
+async def run_webhook(application, url, listen, port, path, secret=None, max_backlog=1000, stop_signal=None):
+    """
+    Serve the application from a webhook until `stop_signal` (an asyncio.Event)
+    is set, or until SIGINT/SIGTERM when none is given. Mirrors what run_polling does around startup and shutdown,
+    including the post_init / post_shutdown hooks.
+    """
+    loop = asyncio.get_running_loop()
+    if stop_signal is None:
+        stop_signal = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_signal.set)
+    processor = application.update_processor if isinstance(application.update_processor, OrderedUpdateProcessor) else None
+    server = WebhookServer(application, loop, listen, port, path, secret=secret, max_backlog=max_backlog, processor=processor)
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    try:
+        await application.bot.set_webhook(url=url, secret_token=secret, allowed_updates=Update.ALL_TYPES)
+        await application.start()
+        server.start()
+        logging.info(f"[Webhook] Listening on {listen}:{port}{path} for {url}")
+        await stop_signal.wait()
+    finally:
+        server.stop()
+        if application.running:
+            await application.stop()
+        # PTB's order: shutdown (which flushes persistence) before post_shutdown
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)